@@ -0,0 +1,242 @@
+"""Инкрементальные итоги тренировок по пользователям и периодам.
+
+Каждый результат (InfoMessage с id пользователя и временем) попадает
+в итоги за день, ISO-неделю и месяц - отдельно по своему виду
+тренировки и в общие итоги пользователя (вид ALL). Добавление
+обновляет суммы за O(1). Поздние или исправленные записи сначала
+отзываются через retract(), затем добавляются заново.
+
+Минимум и максимум скорости поддерживаются точно и при отзыве: для
+этого в каждом итоге хранится мультимножество скоростей. Суммы при
+отзыве уменьшаются вычитанием и могут отличаться от пересчёта с нуля
+в последних знаках.
+"""
+from __future__ import annotations
+
+import json
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Hashable, Iterator
+
+from caloriescounter import InfoMessage
+
+ALL: str = '*'
+PERIODS: tuple[str, ...] = ('day', 'week', 'month')
+SNAPSHOT_VERSION: int = 1
+
+Timestamp = datetime | float | int
+
+
+def _to_date(timestamp: Timestamp) -> date:
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc)
+        return timestamp.date()
+    return datetime.fromtimestamp(timestamp, timezone.utc).date()
+
+
+def bucket_of(timestamp: Timestamp, period: str) -> str:
+    """Ключ периода: дата дня, дата понедельника недели или 'ГГГГ-ММ'.
+
+    Числовое время - секунды Unix; даты считаются в UTC.
+    """
+    return _bucket_of_day(_to_date(timestamp), period)
+
+
+def buckets_of(timestamp: Timestamp) -> tuple[str, ...]:
+    """Ключи всех периодов PERIODS для одного момента времени."""
+    day = _to_date(timestamp)
+    return tuple(_bucket_of_day(day, period) for period in PERIODS)
+
+
+def _bucket_of_day(day: date, period: str) -> str:
+    if period == 'day':
+        return day.isoformat()
+    if period == 'week':
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if period == 'month':
+        return f'{day.year:04d}-{day.month:02d}'
+    raise ValueError(f'Неизвестный период: {period}.')
+
+
+class Totals:
+    """Итоги набора тренировок."""
+    __slots__ = ('count', 'duration', 'distance', 'calories', 'speed_sum',
+                 'speed_min', 'speed_max', '_speeds')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.distance = 0.0
+        self.calories = 0.0
+        self.speed_sum = 0.0
+        self.speed_min: float | None = None
+        self.speed_max: float | None = None
+        self._speeds: Counter = Counter()
+
+    @property
+    def mean_speed(self) -> float | None:
+        """Средняя из скоростей тренировок."""
+        return self.speed_sum / self.count if self.count else None
+
+    def add(self, info: InfoMessage) -> None:
+        self.count += 1
+        self.duration += info.duration
+        self.distance += info.distance
+        self.calories += info.calories
+        speed = info.speed
+        self.speed_sum += speed
+        self._speeds[speed] += 1
+        if self.speed_min is None or speed < self.speed_min:
+            self.speed_min = speed
+        if self.speed_max is None or speed > self.speed_max:
+            self.speed_max = speed
+
+    def retract(self, info: InfoMessage) -> None:
+        speed = info.speed
+        if speed not in self._speeds:
+            raise ValueError('Отзываемой тренировки нет в итогах.')
+        self._speeds[speed] -= 1
+        if not self._speeds[speed]:
+            del self._speeds[speed]
+        self.count -= 1
+        self.duration -= info.duration
+        self.distance -= info.distance
+        self.calories -= info.calories
+        self.speed_sum -= speed
+        if not self.count:
+            self.speed_min = self.speed_max = None
+            self.duration = self.distance = self.calories = 0.0
+            self.speed_sum = 0.0
+            return
+        if speed == self.speed_min and speed not in self._speeds:
+            self.speed_min = min(self._speeds)
+        if speed == self.speed_max and speed not in self._speeds:
+            self.speed_max = max(self._speeds)
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'duration': self.duration,
+            'distance': self.distance,
+            'calories': self.calories,
+            'speed_sum': self.speed_sum,
+            'speed_min': self.speed_min,
+            'speed_max': self.speed_max,
+            'speeds': [[speed, count]
+                       for speed, count in self._speeds.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> Totals:
+        totals = cls()
+        for name in ('count', 'duration', 'distance', 'calories',
+                     'speed_sum', 'speed_min', 'speed_max'):
+            setattr(totals, name, state[name])
+        totals._speeds = Counter({speed: count
+                                  for speed, count in state['speeds']})
+        return totals
+
+
+Key = tuple[Hashable, str, str, str]
+
+
+class Aggregator:
+    """Итоги по ключу (пользователь, вид тренировки, период, начало
+    периода)."""
+
+    def __init__(self) -> None:
+        self._totals: dict[Key, Totals] = {}
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    def _keys(self,
+              user_id: Hashable,
+              timestamp: Timestamp,
+              training_type: str) -> Iterator[Key]:
+        for period, bucket in zip(PERIODS, buckets_of(timestamp)):
+            yield user_id, training_type, period, bucket
+            yield user_id, ALL, period, bucket
+
+    def add(self,
+            user_id: Hashable,
+            timestamp: Timestamp,
+            info: InfoMessage) -> None:
+        """Учесть тренировку во всех её итогах."""
+        for key in self._keys(user_id, timestamp, info.training_type):
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = Totals()
+            totals.add(info)
+
+    def retract(self,
+                user_id: Hashable,
+                timestamp: Timestamp,
+                info: InfoMessage) -> None:
+        """Отозвать ранее учтённую тренировку."""
+        keys = list(self._keys(user_id, timestamp, info.training_type))
+        if any(key not in self._totals
+               or info.speed not in self._totals[key]._speeds
+               for key in keys):
+            raise ValueError('Отзываемой тренировки нет в итогах.')
+        for key in keys:
+            totals = self._totals[key]
+            totals.retract(info)
+            if not totals.count:
+                del self._totals[key]
+
+    def correct(self,
+                user_id: Hashable,
+                old_timestamp: Timestamp,
+                old: InfoMessage,
+                new_timestamp: Timestamp,
+                new: InfoMessage) -> None:
+        """Заменить учтённую тренировку исправленной."""
+        self.retract(user_id, old_timestamp, old)
+        self.add(user_id, new_timestamp, new)
+
+    def totals(self,
+               user_id: Hashable,
+               period: str,
+               timestamp: Timestamp,
+               training_type: str = ALL) -> Totals | None:
+        """Итоги пользователя за период, содержащий timestamp."""
+        key = (user_id, training_type, period, bucket_of(timestamp, period))
+        return self._totals.get(key)
+
+    def buckets(self,
+                user_id: Hashable,
+                period: str,
+                training_type: str = ALL) -> dict[str, Totals]:
+        """Все итоги пользователя за периоды данного вида."""
+        return {key[3]: totals for key, totals in self._totals.items()
+                if key[:3] == (user_id, training_type, period)}
+
+    def snapshot(self, path: str) -> None:
+        """Атомарно сохранить состояние в JSON-файл."""
+        state = {
+            'version': SNAPSHOT_VERSION,
+            'totals': [[*key, totals.as_dict()]
+                       for key, totals in self._totals.items()],
+        }
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(state, file, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+
+    @classmethod
+    def restore(cls, path: str) -> Aggregator:
+        """Загрузить состояние, сохранённое snapshot()."""
+        with open(path, encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f'{path}: неизвестная версия снимка.')
+        aggregator = cls()
+        for user_id, training_type, period, bucket, totals in state['totals']:
+            aggregator._totals[user_id, training_type, period, bucket] = (
+                Totals.from_dict(totals))
+        return aggregator
@@ -0,0 +1,345 @@
+"""Воспроизводимые замеры скорости горячих путей расчёта.
+
+Каждый замер прогоняется на наборах из 1, 10^4 и 10^6 пакетов со
+смесью видов тренировок, близкой к реальной. Для каждого замера и
+размера сообщаются пропускная способность, p50/p99 времени на пакет и
+пиковый объём памяти, выделенной во время прогона. Результат -
+JSON; с флагом --baseline он сравнивается с сохранённым прогоном, и
+падение пропускной способности больше чем на --tolerance считается
+регрессией (код возврата 1).
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --baseline baseline.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tracemalloc
+from contextlib import redirect_stdout
+from time import perf_counter_ns
+from typing import Callable, Iterable
+
+import caloriescounter
+from caloriescounter import (InfoMessage, Running, SportsWalking, Swimming,
+                             read_package)
+from instrumentation import Recorder
+from resultcache import make_cache
+from streaming import score_packets
+from validation import check_packet
+
+DEFAULT_SIZES: tuple[int, ...] = (1, 10 ** 4, 10 ** 6)
+DEFAULT_TOLERANCE: float = 0.1
+MIN_SECONDS: float = 0.05
+TYPE_MIX: dict[str, float] = {
+    'RUN': 0.5,
+    'WLK': 0.3,
+    'SWM': 0.2,
+}
+
+BASE_DIR: str = os.path.dirname(os.path.abspath(__file__))
+STARTUP_RUNS: int = 5
+# Замеры холодного старта: название -> (аргументы python, stdin).
+STARTUP_COMMANDS: dict[str, tuple[list[str], bytes]] = {
+    'python': (['-c', 'pass'], b''),
+    'import_caloriescounter': (['-c', 'import caloriescounter'], b''),
+    'cli_help': (['cli.py', '--help'], b''),
+    'cli_score': (['cli.py', 'score', '-'], b'RUN,15000,1,75\n'),
+}
+
+# Сколько разных пакетов повторяется в замерах попаданий в кэш.
+CACHE_HIT_POOL: int = 1000
+
+Package = tuple[str, list]
+Prepared = tuple[list, Callable]
+
+
+def generate_package(rnd: random.Random, workout_type: str) -> Package:
+    """Сгенерировать правдоподобный пакет заданного вида."""
+    duration = round(rnd.uniform(0.25, 3), 2)
+    weight = round(rnd.uniform(45, 120), 1)
+    if workout_type == 'SWM':
+        length_pool = rnd.choice([25, 50])
+        count_pool = rnd.randint(10, 80)
+        return 'SWM', [rnd.randint(200, 3000), duration, weight,
+                       length_pool, count_pool]
+    action = rnd.randint(1000, 30000)
+    if workout_type == 'WLK':
+        return 'WLK', [action, duration, weight, rnd.randint(150, 200)]
+    return workout_type, [action, duration, weight]
+
+
+def generate_packages(size: int,
+                      seed: int = 0,
+                      mix: dict[str, float] = TYPE_MIX) -> list[Package]:
+    """Сгенерировать size пакетов со смесью видов mix."""
+    rnd = random.Random(seed)
+    types = rnd.choices(list(mix), weights=list(mix.values()), k=size)
+    return [generate_package(rnd, workout_type) for workout_type in types]
+
+
+def _packages_of(workout_type: str, size: int, seed: int) -> list[Package]:
+    return generate_packages(size, seed, {workout_type: 1})
+
+
+def _prepare_read_package(size: int, seed: int) -> Prepared:
+    return (generate_packages(size, seed),
+            lambda package: read_package(*package))
+
+
+def _prepare_construct(cls: type, workout_type: str):
+    def prepare(size: int, seed: int) -> Prepared:
+        rows = [data for _, data in _packages_of(workout_type, size, seed)]
+        return rows, lambda data: cls(*data)
+    return prepare
+
+
+def _prepare_show_training_info(size: int, seed: int) -> Prepared:
+    trainings = [read_package(*package)
+                 for package in generate_packages(size, seed)]
+    return trainings, lambda training: training.show_training_info()
+
+
+def _prepare_get_message(size: int, seed: int) -> Prepared:
+    infos = [read_package(*package).show_training_info()
+             for package in generate_packages(size, seed)]
+    return infos, InfoMessage.get_message
+
+
+def _prepare_main(size: int, seed: int) -> Prepared:
+    main = caloriescounter.main
+    return (generate_packages(size, seed),
+            lambda package: main(read_package(*package)))
+
+
+def _prepare_score_plain(size: int, seed: int) -> Prepared:
+    return (generate_packages(size, seed),
+            lambda package: [read_package(*package).show_training_info()])
+
+
+def _prepare_score_packets(recorded: bool):
+    def prepare(size: int, seed: int) -> Prepared:
+        recorder = Recorder() if recorded else None
+        return (generate_packages(size, seed),
+                lambda package: score_packets((package,), recorder=recorder))
+    return prepare
+
+
+def _prepare_cache_hit(path: str | None):
+    def prepare(size: int, seed: int) -> Prepared:
+        pool = generate_packages(min(size, CACHE_HIT_POOL), seed)
+        cache = make_cache(path=path)
+        for package in pool:
+            cache.score(*package)
+        return ([pool[i % len(pool)] for i in range(size)],
+                lambda package: cache.score(*package))
+    return prepare
+
+
+def _prepare_cache_miss(size: int, seed: int) -> Prepared:
+    # Полный кэш: каждый пакет - промах, расчёт, запись и вытеснение.
+    cache = make_cache(size=0)
+    return (generate_packages(size, seed),
+            lambda package: cache.score(*package))
+
+
+def _prepare_check_packet(size: int, seed: int) -> Prepared:
+    return (generate_packages(size, seed),
+            lambda package: check_packet(*package))
+
+
+BENCHMARKS: dict[str, Callable[[int, int], Prepared]] = {
+    'read_package': _prepare_read_package,
+    'construct_Running': _prepare_construct(Running, 'RUN'),
+    'construct_SportsWalking': _prepare_construct(SportsWalking, 'WLK'),
+    'construct_Swimming': _prepare_construct(Swimming, 'SWM'),
+    'show_training_info': _prepare_show_training_info,
+    'get_message': _prepare_get_message,
+    'main': _prepare_main,
+    'score_plain': _prepare_score_plain,
+    'score_packets': _prepare_score_packets(recorded=False),
+    'score_packets_recorded': _prepare_score_packets(recorded=True),
+    'result_cache_hit_memory': _prepare_cache_hit(None),
+    'result_cache_hit_sqlite': _prepare_cache_hit(':memory:'),
+    'result_cache_miss_memory': _prepare_cache_miss,
+    'check_packet': _prepare_check_packet,
+}
+
+
+def _quantile(sorted_values: list[int], q: float) -> int:
+    return sorted_values[min(len(sorted_values) - 1,
+                             int(q * len(sorted_values)))]
+
+
+def measure(items: list,
+            op: Callable,
+            memory: bool = True,
+            min_seconds: float = MIN_SECONDS) -> dict:
+    """Замерить op на каждом элементе items.
+
+    Для пропускной способности набор прогоняется повторно, пока общее
+    время не превысит min_seconds, чтобы маленькие наборы не давали
+    шумных цифр.
+    """
+    rounds = 0
+    elapsed = 0
+    while not rounds or elapsed < min_seconds * 1e9:
+        start = perf_counter_ns()
+        for item in items:
+            op(item)
+        elapsed += perf_counter_ns() - start
+        rounds += 1
+
+    latencies = []
+    for item in items:
+        begin = perf_counter_ns()
+        op(item)
+        latencies.append(perf_counter_ns() - begin)
+    latencies.sort()
+
+    result = {
+        'packets': len(items),
+        'rounds': rounds,
+        'seconds': elapsed / 1e9,
+        'throughput': (rounds * len(items) / (elapsed / 1e9)
+                       if elapsed else 0.0),
+        'p50_ns': _quantile(latencies, 0.5),
+        'p99_ns': _quantile(latencies, 0.99),
+    }
+    if memory:
+        tracemalloc.start()
+        for item in items:
+            op(item)
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def measure_startup(runs: int = STARTUP_RUNS) -> dict:
+    """Время запуска короткоживущих процессов, миллисекунды.
+
+    Замер 'python' - пустой интерпретатор, от него отсчитывается
+    цена импорта расчёта и CLI.
+    """
+    results = {}
+    for name, (args, stdin) in STARTUP_COMMANDS.items():
+        times = []
+        for _ in range(runs):
+            start = perf_counter_ns()
+            subprocess.run([sys.executable, *args], input=stdin,
+                           cwd=BASE_DIR, stdout=subprocess.DEVNULL,
+                           check=True)
+            times.append(perf_counter_ns() - start)
+        times.sort()
+        results[name] = {'runs': runs, 'min_ms': times[0] / 1e6,
+                         'p50_ms': _quantile(times, 0.5) / 1e6}
+    return results
+
+
+def run_benchmarks(sizes: Iterable[int] = DEFAULT_SIZES,
+                   names: Iterable[str] | None = None,
+                   seed: int = 0,
+                   memory: bool = True,
+                   min_seconds: float = MIN_SECONDS,
+                   startup_runs: int = 0) -> dict:
+    """Прогнать замеры и вернуть отчёт в виде словаря для JSON.
+
+    С startup_runs в отчёт добавляется время холодного старта.
+    """
+    results: dict[str, dict[str, dict]] = {}
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, \
+            redirect_stdout(devnull):
+        for name in names or BENCHMARKS:
+            results[name] = {}
+            for size in sizes:
+                items, op = BENCHMARKS[name](size, seed)
+                results[name][str(size)] = measure(items, op, memory,
+                                                   min_seconds)
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'seed': seed,
+        'results': results,
+    }
+    if startup_runs:
+        report['startup'] = measure_startup(startup_runs)
+    return report
+
+
+def compare(report: dict,
+            baseline: dict,
+            tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """Найти замеры, пропускная способность которых упала сильнее
+    tolerance относительно baseline, и запуски, ставшие дольше.
+
+    Для старта сравнивается лучшее время: оно меньше всего зависит от
+    фоновой нагрузки.
+    """
+    regressions = []
+    for name, sizes in report['results'].items():
+        for size, result in sizes.items():
+            base = baseline.get('results', {}).get(name, {}).get(size)
+            if not base or not base['throughput']:
+                continue
+            ratio = result['throughput'] / base['throughput']
+            if ratio < 1 - tolerance:
+                regressions.append(
+                    f'{name}[{size}]: {result["throughput"]:.0f} пакетов/с '
+                    f'против {base["throughput"]:.0f} ({ratio:.0%})')
+    for name, result in report.get('startup', {}).items():
+        base = baseline.get('startup', {}).get(name)
+        if base and result['min_ms'] > base['min_ms'] * (1 + tolerance):
+            regressions.append(
+                f'старт {name}: {result["min_ms"]:.1f} мс '
+                f'против {base["min_ms"]:.1f} мс')
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Замеры скорости расчёта тренировок.')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=list(DEFAULT_SIZES))
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS),
+                        help='запустить только эти замеры')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='не замерять память (быстрее)')
+    parser.add_argument('--startup-runs', type=int, default=STARTUP_RUNS,
+                        help='запусков на замер старта; 0 - не замерять')
+    parser.add_argument('--output', help='куда записать JSON-отчёт')
+    parser.add_argument('--baseline', help='JSON-отчёт для сравнения')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='допустимое падение пропускной способности')
+    return parser
+
+
+def run(argv: list[str] | None = None) -> int:
+    """Точка входа командной строки; возвращает код выхода."""
+    args = build_parser().parse_args(argv)
+    report = run_benchmarks(args.sizes, args.only, args.seed,
+                            not args.no_memory,
+                            startup_runs=args.startup_runs)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for line in regressions:
+            print(f'Регрессия: {line}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run())
@@ -1,9 +1,36 @@
 from __future__ import annotations
-from typing import Type
+import ast
+import copy
+import inspect
+import math
+import sys
+from array import array
+from collections import Counter
+from functools import wraps
+from typing import Callable, Iterable, NamedTuple, Sequence, TextIO, Type
+
+_NOT_LOADED = object()
+# NumPy импортируется при первом пакетном расчёте: его импорт дороже
+# загрузки всего остального модуля, а короткому запуску он не нужен.
+np = _NOT_LOADED
+
+
+def _numpy():
+    """Модуль numpy или None, если он не установлен."""
+    global np
+    if np is _NOT_LOADED:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np
 
 
 class InfoMessage:
     """Информационное сообщение о тренировке."""
+    __slots__ = ('training_type', 'duration', 'distance', 'speed',
+                 'calories')
 
     def __init__(self,
                  training_type: str,
@@ -26,11 +53,228 @@ class InfoMessage:
                 f'Потрачено ккал: {self.calories:.3f}.')
 
 
+class InfoMessageBatch:
+    """Набор сообщений о тренировках в плотных типизированных колонках.
+
+    Название тренировки хранится индексом в общей таблице названий,
+    числовые поля - в массивах float64.
+    """
+    __slots__ = ('training_types', '_type_ids', 'type_index',
+                 'duration', 'distance', 'speed', 'calories')
+
+    def __init__(self) -> None:
+        self.training_types: list[str] = []
+        self._type_ids: dict[str, int] = {}
+        self.type_index = array('H')
+        self.duration = array('d')
+        self.distance = array('d')
+        self.speed = array('d')
+        self.calories = array('d')
+
+    def __len__(self) -> int:
+        return len(self.type_index)
+
+    def append(self,
+               training_type: str,
+               duration: float,
+               distance: float,
+               speed: float,
+               calories: float
+               ) -> None:
+        type_id = self._type_ids.get(training_type)
+        if type_id is None:
+            type_id = self._type_ids[training_type] = len(self.training_types)
+            self.training_types.append(training_type)
+        self.type_index.append(type_id)
+        self.duration.append(duration)
+        self.distance.append(distance)
+        self.speed.append(speed)
+        self.calories.append(calories)
+
+    def append_info(self, info: InfoMessage) -> None:
+        self.append(info.training_type, info.duration, info.distance,
+                    info.speed, info.calories)
+
+    def __getitem__(self, index: int) -> InfoMessage:
+        return InfoMessage(self.training_types[self.type_index[index]],
+                           self.duration[index], self.distance[index],
+                           self.speed[index], self.calories[index])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def get_message(self, index: int) -> str:
+        """Сообщение для строки с номером index."""
+        return self[index].get_message()
+
+
+KERNELS: dict[str, Callable] = {}
+
+_FORMULAS: tuple[tuple[str, str], ...] = (
+    ('distance', 'DISTANCE_FORMULA'),
+    ('speed', 'SPEED_FORMULA'),
+    ('calories', 'CALORIES_FORMULA'),
+)
+_FORMULA_METHODS: dict[str, str] = {
+    'DISTANCE_FORMULA': 'get_distance',
+    'SPEED_FORMULA': 'get_mean_speed',
+    'CALORIES_FORMULA': 'get_spent_calories',
+}
+
+
+class _FoldConstants(ast.NodeTransformer):
+    """Подставить значения констант класса вместо их имён."""
+
+    def __init__(self, cls: type, names: set[str]) -> None:
+        self.cls = cls
+        self.names = names
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id in self.names:
+            return node
+        if not node.id.isupper() or not hasattr(self.cls, node.id):
+            raise NameError(f'{self.cls.__name__}: неизвестное имя '
+                            f'{node.id} в формуле.')
+        return ast.copy_location(
+            ast.Constant(getattr(self.cls, node.id)), node)
+
+
+class _CallPow(ast.NodeTransformer):
+    """Заменить a ** b на _pow(a, b)."""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        if not isinstance(node.op, ast.Pow):
+            return node
+        return ast.copy_location(
+            ast.Call(ast.Name('_pow', ast.Load()), [node.left, node.right],
+                     []), node)
+
+
+_array_pow = None
+
+
+def _pow(base, exponent):
+    """base ** exponent; для массивов NumPy - поэлементно через libm pow.
+
+    NumPy считает x ** 2 как x * x, а float ** 2 в Python - через pow,
+    и результаты иногда расходятся в младшем разряде.
+    """
+    global _array_pow
+    if (isinstance(base, (int, float))
+            and isinstance(exponent, (int, float))):
+        return base ** exponent
+    if _array_pow is None:
+        _array_pow = _numpy().frompyfunc(math.pow, 2, 1)
+    return _array_pow(base, exponent).astype(float)
+
+
+def _formulas_match_methods(cls: type) -> bool:
+    """Формулы не должны быть старше методов, которые они заменяют.
+
+    Конструктор тоже: параметры kernel берутся из него, и наследник,
+    сменивший конструктор, должен сам объявить хотя бы одну формулу.
+    """
+    mro = cls.__mro__
+    formula_owners = []
+    for formula, method in _FORMULA_METHODS.items():
+        formula_owner = next(k for k in mro if formula in vars(k))
+        method_owner = next(k for k in mro if method in vars(k))
+        if mro.index(formula_owner) > mro.index(method_owner):
+            return False
+        formula_owners.append(mro.index(formula_owner))
+    init_owner = next(k for k in mro if '__init__' in vars(k))
+    return min(formula_owners) <= mro.index(init_owner)
+
+
+def compile_kernel(cls: type) -> tuple[Callable, Callable] | None:
+    """Собрать из формул класса слитые функции расчёта.
+
+    Формулы - выражения Python в атрибутах DISTANCE_FORMULA,
+    SPEED_FORMULA и CALORIES_FORMULA. В них доступны параметры
+    конструктора, уже посчитанные distance и speed и константы класса
+    (имена в верхнем регистре), которые подставляются как литералы.
+    Возвращает пару: kernel(*параметры конструктора) -> (distance,
+    speed, calories), работающую и со скалярами, и с массивами NumPy
+    (** в ней считается через _pow, бит в бит как у float), и
+    show_training_info(self) -> InfoMessage. Если формул нет,
+    наследник переопределил метод или конструктор, не переопределив
+    формулу, или формула использует имя, которого нет среди параметров
+    конструктора, - возвращает None.
+    """
+    if getattr(cls, 'CALORIES_FORMULA', None) is None:
+        return None
+    if not _formulas_match_methods(cls):
+        return None
+    parameters = list(inspect.signature(cls.__init__).parameters.values())
+    if any(parameter.kind is not parameter.POSITIONAL_OR_KEYWORD
+           for parameter in parameters):
+        return None
+    params = [parameter.name for parameter in parameters[1:]]
+    if 'duration' not in params:
+        return None
+    names = set(params)
+    body = []
+    for target, attribute in _FORMULAS:
+        expression = ast.parse(getattr(cls, attribute), mode='eval').body
+        if any(isinstance(node, ast.Name) and not node.id.isupper()
+               and node.id not in names for node in ast.walk(expression)):
+            return None
+        expression = _FoldConstants(cls, names).visit(expression)
+        body.append(ast.Assign([ast.Name(target, ast.Store())], expression))
+        names.add(target)
+    used = {node.id for statement in body for node in ast.walk(statement)
+            if isinstance(node, ast.Name)}
+    loads = [ast.parse(f'{name} = self.{name}').body[0]
+             for name in params if name in used or name == 'duration']
+    results = ast.parse('distance, speed, calories', mode='eval').body
+    info = ast.parse(f'InfoMessage({cls.__name__!r}, duration, '
+                     f'distance, speed, calories)', mode='eval').body
+    kernel_body = [_CallPow().visit(copy.deepcopy(statement))
+                   for statement in body]
+    module = ast.Module([
+        ast.FunctionDef(
+            'kernel',
+            ast.arguments([], [ast.arg(name) for name in params],
+                          None, [], [], None, []),
+            [*kernel_body, ast.Return(results)], [], None),
+        ast.FunctionDef(
+            'show_training_info',
+            ast.arguments([], [ast.arg('self')], None, [], [], None, []),
+            [*loads, *body, ast.Return(info)], [], None),
+    ], [])
+    namespace = {'InfoMessage': InfoMessage, '_pow': _pow}
+    exec(compile(ast.fix_missing_locations(module),
+                 f'<kernel {cls.__name__}>', 'exec'), namespace)
+    return namespace['kernel'], namespace['show_training_info']
+
+
 class Training:
     """Базовый класс тренировки."""
+    # '__dict__' оставлен, чтобы методы можно было подменять на
+    # экземпляре; сам словарь создаётся только при первом таком обращении.
+    __slots__ = ('action', 'duration', 'weight', '__dict__')
     LEN_STEP: float = 0.65
     M_IN_KM: int = 1000
     MIN_IN_H: int = 60
+    DISTANCE_FORMULA: str = 'action * LEN_STEP / M_IN_KM'
+    SPEED_FORMULA: str = 'distance / duration'
+    CALORIES_FORMULA: str | None = None
+    # Поля пакета, которые складываются из отсчётов датчика.
+    SAMPLE_FIELDS: tuple[str, ...] = ('action',)
+    kernel: Callable | None = None
+    _info_kernel: Callable | None = None
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        compiled = compile_kernel(cls)
+        if compiled is None:
+            cls.kernel = cls._info_kernel = None
+        else:
+            cls.kernel = staticmethod(compiled[0])
+            cls._info_kernel = compiled[1]
+            KERNELS[cls.__name__] = compiled[0]
 
     def __init__(self,
                  action: int,
@@ -41,6 +285,33 @@ class Training:
         self.duration = duration
         self.weight = weight
 
+    def enable_metric_cache(self) -> Training:
+        """Включить кэш дистанции, скорости и калорий на этом объекте.
+
+        Нужен долгоживущим тренировкам, которые выводятся много раз.
+        Присваивание любому публичному атрибуту (action, duration, weight,
+        поля наследников) сбрасывает кэш. Копии (copy, deepcopy, pickle)
+        получают свой пустой кэш.
+        """
+        if getattr(self, '_metrics', None) is None:
+            self.__dict__.update(_metrics={}, _cache_stats=[0, 0])
+            self.__class__ = _cached_class(self.__class__)
+        return self
+
+    def cache_info(self) -> CacheInfo:
+        """Число попаданий и промахов кэша метрик."""
+        metrics = getattr(self, '_metrics', None)
+        if metrics is None:
+            return CacheInfo(0, 0, 0)
+        hits, misses = self._cache_stats
+        return CacheInfo(hits, misses, len(metrics))
+
+    def cache_clear(self) -> None:
+        """Сбросить кэш метрик и его статистику."""
+        if getattr(self, '_metrics', None) is not None:
+            self._metrics.clear()
+            self._cache_stats[:] = [0, 0]
+
     def get_distance(self) -> float:
         """Получить дистанцию в км."""
         return self.action * self.LEN_STEP / self.M_IN_KM
@@ -54,7 +325,20 @@ class Training:
         pass
 
     def show_training_info(self) -> InfoMessage:
-        """Вернуть информационное сообщение о выполненной тренировке."""
+        """Вернуть информационное сообщение о выполненной тренировке.
+
+        Если для класса собраны слитые формулы, расчёт идёт через них,
+        кроме объектов, на которых подменён один из методов метрик.
+        """
+        info_kernel = self._info_kernel
+        if info_kernel is not None:
+            overrides = self.__dict__
+            if not overrides:
+                # Чтение __dict__ создало пустой словарь - не держать его.
+                del self.__dict__
+                return info_kernel()
+            if overrides.keys().isdisjoint(METRIC_METHODS):
+                return info_kernel()
         return (InfoMessage(self.__class__.__name__,
                 self.duration, self.get_distance(),
                 self.get_mean_speed(), self.get_spent_calories()))
@@ -62,8 +346,13 @@ class Training:
 
 class Running(Training):
     """Тренировка: бег."""
+    __slots__ = ()
     CALORIES_MEAN_SPEED_MULTIPLIER: int = 18
     CALORIES_MEAN_SPEED_SHIFT: float = 1.79
+    CALORIES_FORMULA = ('(CALORIES_MEAN_SPEED_MULTIPLIER * speed'
+                        ' + CALORIES_MEAN_SPEED_SHIFT)'
+                        ' * weight / M_IN_KM'
+                        ' * (duration * MIN_IN_H)')
 
     def get_spent_calories(self) -> float:
         """Количество калорий во время бега."""
@@ -75,10 +364,16 @@ class Running(Training):
 
 class SportsWalking(Training):
     """Тренировка: спортивная ходьба."""
+    __slots__ = ('height',)
     KMH_TO_MPS: float = 0.278
     CM_IN_METER: int = 100
     COEFF_CAL_WEIGHT1: float = 0.035
     COEFF_CAL_WEIGHT2: float = 0.029
+    CALORIES_FORMULA = ('(COEFF_CAL_WEIGHT1 * weight'
+                        ' + (((speed * KMH_TO_MPS) ** 2)'
+                        ' / (height / CM_IN_METER))'
+                        ' * COEFF_CAL_WEIGHT2 * weight)'
+                        ' * (duration * MIN_IN_H)')
 
     def __init__(self,
                  action: int,
@@ -100,9 +395,14 @@ class SportsWalking(Training):
 
 class Swimming(Training):
     """Тренировка: плавание."""
+    __slots__ = ('length_pool', 'count_pool')
     LEN_STEP: float = 1.38
     COEFF_CAL_SWM1: float = 1.1
     COEFF_CAL_SWM2: int = 2
+    SPEED_FORMULA = 'length_pool * count_pool / M_IN_KM / duration'
+    SAMPLE_FIELDS = ('action', 'count_pool')
+    CALORIES_FORMULA = ('(speed + COEFF_CAL_SWM1)'
+                        ' * COEFF_CAL_SWM2 * weight * duration')
 
     def __init__(self,
                  action: int,
@@ -126,18 +426,442 @@ class Swimming(Training):
                 * self.COEFF_CAL_SWM2 * self.weight * self.duration)
 
 
+class CacheInfo(NamedTuple):
+    """Статистика кэша метрик тренировки."""
+    hits: int
+    misses: int
+    currsize: int
+
+
+METRIC_METHODS: tuple[str, ...] = ('get_distance',
+                                   'get_mean_speed',
+                                   'get_spent_calories')
+
+_CACHED_CLASSES: dict[Type[Training], Type[Training]] = {}
+
+
+def _cached_metric(method: Callable) -> Callable:
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self):
+        cache = self._metrics
+        if name in cache:
+            self._cache_stats[0] += 1
+            return cache[name]
+        self._cache_stats[1] += 1
+        value = cache[name] = method(self)
+        return value
+    return wrapper
+
+
+def _invalidating_setattr(self, name: str, value) -> None:
+    object.__setattr__(self, name, value)
+    if name[0] != '_':
+        self._metrics.clear()
+
+
+def _restore_cached(cls: Type[Training], state: dict) -> Training:
+    training = cls.__new__(cls)
+    for name, value in state.items():
+        object.__setattr__(training, name, value)
+    return training.enable_metric_cache()
+
+
+def _reduce_cached(self) -> tuple:
+    """Копия и pickle тренировки с кэшем получают свой пустой кэш."""
+    state = {name: getattr(self, name)
+             for klass in self.__class__.__mro__
+             for name in getattr(klass, '__slots__', ())
+             if name != '__dict__' and hasattr(self, name)}
+    state.update((name, value) for name, value in self.__dict__.items()
+                 if name not in ('_metrics', '_cache_stats'))
+    return _restore_cached, (self.__class__.__bases__[0], state)
+
+
+def _cached_class(cls: Type[Training]) -> Type[Training]:
+    """Вариант класса тренировки с кэшем метрик.
+
+    Имя совпадает с исходным, поэтому training_type в InfoMessage не
+    меняется. Обычные объекты кэшем не пользуются и ничего за него не
+    платят.
+    """
+    if cls in _CACHED_CLASSES.values():
+        return cls
+    cached = _CACHED_CLASSES.get(cls)
+    if cached is None:
+        namespace = {name: _cached_metric(getattr(cls, name))
+                     for name in METRIC_METHODS}
+        namespace.update(__slots__=(),
+                         __setattr__=_invalidating_setattr,
+                         __reduce__=_reduce_cached,
+                         __module__=cls.__module__,
+                         __qualname__=cls.__qualname__,
+                         __doc__=cls.__doc__)
+        cached = _CACHED_CLASSES[cls] = type(cls.__name__, (cls,), namespace)
+    return cached
+
+
+class UnknownWorkoutTypeError(ValueError):
+    """Неизвестный код вида тренировки."""
+
+    def __init__(self, workout_type) -> None:
+        self.workout_type = workout_type
+        known = ', '.join(f'{code}({workout.cls.__name__})'
+                          for code, workout in WORKOUT_TYPES.items())
+        super().__init__(f'Неправильный вид тренировки: {workout_type}. '
+                         f'Необходимо выбрать из {known}.')
+
+
+class WorkoutType(NamedTuple):
+    """Зарегистрированный вид тренировки."""
+    code: str
+    cls: Type[Training]
+    arity: int
+    type_id: int
+
+
+ENTRY_POINT_GROUP: str = 'fitness_tracker.workouts'
+
+WORKOUT_TYPES: dict[str, WorkoutType] = {}
+TYPE_CODES: dict[str, int] = {}
+_DISPATCH: dict[str, Type[Training]] = {}
+_BY_TYPE_ID: dict[int, str] = {}
+_LAZY: dict[str, str] = {}
+_entry_points_loaded: bool = False
+
+
+def _arity(cls: Type[Training]) -> int:
+    """Число значений пакета: позиционные параметры конструктора."""
+    if not (isinstance(cls, type) and issubclass(cls, Training)):
+        raise TypeError(f'{cls!r} не наследует Training.')
+    arity = 0
+    for parameter in inspect.signature(cls).parameters.values():
+        if parameter.kind is parameter.VAR_POSITIONAL:
+            raise TypeError(f'{cls.__name__}: у конструктора должно быть '
+                            f'фиксированное число параметров.')
+        if parameter.kind in (parameter.POSITIONAL_ONLY,
+                              parameter.POSITIONAL_OR_KEYWORD):
+            arity += 1
+    return arity
+
+
+def _reserve_type_id(code: str, type_id: int | None) -> int:
+    if code in TYPE_CODES:
+        if type_id is not None and type_id != TYPE_CODES[code]:
+            raise ValueError(f'{code} уже имеет числовой код '
+                             f'{TYPE_CODES[code]}.')
+        return TYPE_CODES[code]
+    if type_id is None:
+        type_id = max(_BY_TYPE_ID, default=-1) + 1
+    elif type_id in _BY_TYPE_ID:
+        raise ValueError(f'Числовой код {type_id} уже занят '
+                         f'{_BY_TYPE_ID[type_id]}.')
+    TYPE_CODES[code] = type_id
+    _BY_TYPE_ID[type_id] = code
+    return type_id
+
+
+def register_workout(code: str,
+                     cls: Type[Training] | None = None,
+                     *,
+                     type_id: int | None = None):
+    """Зарегистрировать класс тренировки под кодом пакета.
+
+    Можно вызвать напрямую или использовать как декоратор. Число
+    значений пакета проверяется здесь один раз, а не при каждом
+    вызове read_package. type_id - числовой код для пакетных путей и
+    двоичного формата; по умолчанию - следующий свободный.
+    """
+    if cls is None:
+        return lambda cls: register_workout(code, cls, type_id=type_id)
+    if code in _DISPATCH and _DISPATCH[code] is not cls:
+        raise ValueError(f'Код {code} уже занят '
+                         f'{_DISPATCH[code].__name__}.')
+    arity = _arity(cls)
+    type_id = _reserve_type_id(code, type_id)
+    WORKOUT_TYPES[code] = WorkoutType(code, cls, arity, type_id)
+    _DISPATCH[code] = cls
+    _LAZY.pop(code, None)
+    return cls
+
+
+def register_lazy_workout(code: str,
+                          target: str,
+                          *,
+                          type_id: int | None = None) -> None:
+    """Зарегистрировать редкий вид тренировки без импорта модуля.
+
+    target - строка 'модуль:Класс'; модуль импортируется при первом
+    пакете с этим кодом. Числовой код резервируется сразу.
+    """
+    if code in _DISPATCH:
+        raise ValueError(f'Код {code} уже занят '
+                         f'{_DISPATCH[code].__name__}.')
+    _reserve_type_id(code, type_id)
+    _LAZY[code] = target
+
+
+def _entry_points() -> list:
+    from importlib.metadata import entry_points
+    return list(entry_points(group=ENTRY_POINT_GROUP))
+
+
+def _load_entry_points() -> None:
+    """Добавить ленивые виды тренировок из entry points пакетов."""
+    global _entry_points_loaded
+    _entry_points_loaded = True
+    for entry_point in _entry_points():
+        if entry_point.name not in _DISPATCH:
+            _LAZY.setdefault(entry_point.name, entry_point.value)
+            _reserve_type_id(entry_point.name, None)
+
+
+def get_workout_type(code: str) -> WorkoutType:
+    """Описание вида тренировки; ленивые виды при этом загружаются."""
+    workout = WORKOUT_TYPES.get(code)
+    if workout is not None:
+        return workout
+    if code not in _LAZY and not _entry_points_loaded:
+        _load_entry_points()
+    target = _LAZY.get(code)
+    if target is None:
+        raise UnknownWorkoutTypeError(code)
+    module_name, _, attribute = target.partition(':')
+    cls = __import__(module_name, fromlist=[attribute])
+    for name in attribute.split('.'):
+        cls = getattr(cls, name)
+    register_workout(code, cls)
+    return WORKOUT_TYPES[code]
+
+
+def get_workout_type_by_id(type_id: int) -> WorkoutType:
+    """Описание вида тренировки по числовому коду."""
+    code = _BY_TYPE_ID.get(type_id)
+    if code is None:
+        raise UnknownWorkoutTypeError(type_id)
+    return get_workout_type(code)
+
+
+register_workout('SWM', Swimming, type_id=0)
+register_workout('RUN', Running, type_id=1)
+register_workout('WLK', SportsWalking, type_id=2)
+
+
 def read_package(workout_type: str, data: list) -> Training:
     """Прочитать данные полученные от датчиков."""
-    training_data: dict[str, Type[Training]] = {
-        'SWM': Swimming,
-        'RUN': Running,
-        'WLK': SportsWalking
-    }
+    try:
+        cls = _DISPATCH[workout_type]
+    except KeyError:
+        cls = get_workout_type(workout_type).cls
+    return cls(*data)
+
+
+class BatchResult(NamedTuple):
+    """Колонки результатов пакетного расчёта."""
+    distance: Sequence[float]
+    speed: Sequence[float]
+    calories: Sequence[float]
+
+
+UNKNOWN_TYPE_ID: int = -1
+
 
-    if workout_type not in training_data:
-        raise Exception('Неправильный вид тренировки. Необходимо выбрать из '
-                        'SWM(Swimming), RUN(Running) или WLK(Sportswalkking).')
-    return training_data[workout_type](*data)
+def _encode_type(workout_type: str, unknown: Counter | None) -> int:
+    try:
+        return get_workout_type(workout_type).type_id
+    except UnknownWorkoutTypeError:
+        if unknown is None:
+            raise
+        unknown[workout_type] += 1
+        return UNKNOWN_TYPE_ID
+
+
+def encode_types(workout_types: Sequence[str],
+                 unknown: Counter | None = None) -> list[int]:
+    """Перевести коды тренировок ('SWM', 'RUN', 'WLK') в числовые.
+
+    Ленивые виды при этом загружаются. С unknown неизвестные коды
+    считаются в нём и переводятся в UNKNOWN_TYPE_ID, без него -
+    прерывают перевод.
+    """
+    try:
+        return [TYPE_CODES[workout_type] for workout_type in workout_types]
+    except KeyError:
+        pass
+    return [_encode_type(workout_type, unknown)
+            for workout_type in workout_types]
+
+
+def _batch_kernel(type_id, columns: dict) -> tuple[Callable, list]:
+    """kernel вида тренировки и колонки для его параметров."""
+    workout = get_workout_type_by_id(int(type_id))
+    kernel = workout.cls.kernel
+    if kernel is None:
+        raise ValueError(f'У {workout.cls.__name__} нет формул для '
+                         f'пакетного расчёта.')
+    params = list(inspect.signature(kernel).parameters)
+    for name in params:
+        if columns.get(name) is None:
+            raise ValueError(f'Для пакетного расчёта нужна колонка {name}.')
+    return kernel, [columns[name] for name in params]
+
+
+def _unknown_kernel(type_id, columns: dict,
+                    unknown: Counter | None) -> tuple[Callable, list] | None:
+    """_batch_kernel; None - вид неизвестен и его строки пропускаются."""
+    try:
+        return _batch_kernel(type_id, columns)
+    except UnknownWorkoutTypeError:
+        if unknown is None:
+            raise
+        return None
+
+
+def _count_unknown(unknown: Counter, type_id: int, count: int) -> None:
+    # Строки UNKNOWN_TYPE_ID уже посчитаны по имени в encode_types.
+    if type_id != UNKNOWN_TYPE_ID:
+        unknown[type_id] += count
+
+
+def _calculate_batch_numpy(type_code, columns: dict,
+                           unknown: Counter | None = None) -> BatchResult:
+    codes = np.asarray(type_code)
+    size = len(codes)
+    distance = np.empty(size)
+    speed = np.empty(size)
+    calories = np.empty(size)
+    for type_id in np.unique(codes):
+        found = _unknown_kernel(type_id, columns, unknown)
+        mask = codes == type_id
+        if found is None:
+            _count_unknown(unknown, int(type_id),
+                           int(np.count_nonzero(mask)))
+            distance[mask] = speed[mask] = calories[mask] = np.nan
+            continue
+        kernel, args = found
+        (distance[mask], speed[mask], calories[mask]) = kernel(
+            *(np.asarray(column, dtype=np.float64)[mask] for column in args))
+    return BatchResult(distance, speed, calories)
+
+
+def _calculate_batch_python(type_code, columns: dict,
+                            unknown: Counter | None = None) -> BatchResult:
+    kernels: dict[int, tuple[Callable, list] | None] = {}
+    distance = array('d')
+    speed = array('d')
+    calories = array('d')
+    nan = float('nan')
+    for i, type_id in enumerate(type_code):
+        try:
+            found = kernels[type_id]
+        except KeyError:
+            found = kernels[type_id] = _unknown_kernel(type_id, columns,
+                                                       unknown)
+        if found is None:
+            _count_unknown(unknown, type_id, 1)
+            distance.append(nan)
+            speed.append(nan)
+            calories.append(nan)
+            continue
+        kernel, args = found
+        row = kernel(*[column[i] for column in args])
+        distance.append(row[0])
+        speed.append(row[1])
+        calories.append(row[2])
+    return BatchResult(distance, speed, calories)
+
+
+def calculate_batch(type_code: Sequence[int],
+                    action: Sequence[float],
+                    duration: Sequence[float],
+                    weight: Sequence[float],
+                    height: Sequence[float] | None = None,
+                    length_pool: Sequence[float] | None = None,
+                    count_pool: Sequence[float] | None = None,
+                    unknown: Counter | None = None
+                    ) -> BatchResult:
+    """Рассчитать дистанцию, скорость и калории для колонок пакетов.
+
+    Код вида тренировки берётся из TYPE_CODES. Каждый вид считается
+    своим kernel, которому передаются колонки с именами параметров его
+    конструктора, поэтому height, length_pool и count_pool нужны только
+    при наличии строк ходьбы или плавания. При установленном NumPy
+    расчёт идёт по маскам для каждого вида, иначе построчно. Результат
+    в обоих случаях совпадает с методами классов бит в бит.
+
+    Без unknown строка неизвестного вида прерывает расчёт. С unknown
+    такие строки получают NaN во всех колонках результата, а их число
+    считается в unknown по числовому коду, как у score_packets. Строки
+    UNKNOWN_TYPE_ID не считаются: их уже посчитал по имени encode_types,
+    так что один Counter можно передать в обе функции.
+    """
+    columns = {'action': action, 'duration': duration, 'weight': weight,
+               'height': height, 'length_pool': length_pool,
+               'count_pool': count_pool}
+    size = len(type_code)
+    for column in columns.values():
+        if column is not None and len(column) != size:
+            raise ValueError('Колонки пакетов должны быть одной длины.')
+    if _numpy() is not None:
+        return _calculate_batch_numpy(type_code, columns, unknown)
+    return _calculate_batch_python(type_code, columns, unknown)
+
+
+MESSAGE_TEMPLATE: str = ('Тип тренировки: %s; '
+                         'Длительность: %.3f ч.; '
+                         'Дистанция: %.3f км; '
+                         'Ср. скорость: %.3f км/ч; '
+                         'Потрачено ккал: %.3f.')
+
+_TYPE_TEMPLATES: dict[str, str] = {}
+
+
+def message_template(training_type: str) -> str:
+    """Шаблон сообщения с подставленным названием тренировки."""
+    template = _TYPE_TEMPLATES.get(training_type)
+    if template is None:
+        template = _TYPE_TEMPLATES[training_type] = (
+            MESSAGE_TEMPLATE.replace(
+                '%s', training_type.replace('%', '%%'), 1))
+    return template
+
+
+def format_messages(infos: Iterable[InfoMessage] | InfoMessageBatch,
+                    per_type_templates: bool = False) -> str:
+    """Отформатировать пачку результатов в одну строку.
+
+    Каждое сообщение совпадает с InfoMessage.get_message() и
+    заканчивается переводом строки.
+    """
+    if isinstance(infos, InfoMessageBatch):
+        templates = [message_template(name) for name in infos.training_types]
+        lines = [templates[type_id] % (duration, distance, speed, calories)
+                 for type_id, duration, distance, speed, calories in zip(
+                     infos.type_index, infos.duration, infos.distance,
+                     infos.speed, infos.calories)]
+    elif per_type_templates:
+        lines = [message_template(info.training_type)
+                 % (info.duration, info.distance, info.speed, info.calories)
+                 for info in infos]
+    else:
+        lines = [MESSAGE_TEMPLATE
+                 % (info.training_type, info.duration, info.distance,
+                    info.speed, info.calories)
+                 for info in infos]
+    if not lines:
+        return ''
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def write_messages(infos: Iterable[InfoMessage] | InfoMessageBatch,
+                   file: TextIO | None = None,
+                   per_type_templates: bool = False) -> None:
+    """Вывести пачку результатов одной записью в file (stdout)."""
+    text = format_messages(infos, per_type_templates)
+    if text:
+        (file or sys.stdout).write(text)
 
 
 def main(training: Training) -> None:
@@ -146,6 +870,11 @@ def main(training: Training) -> None:
     print(info.get_message())
 
 
+def main_batch(trainings: Iterable[Training]) -> None:
+    """Вывести результаты нескольких тренировок одной записью."""
+    write_messages(training.show_training_info() for training in trainings)
+
+
 if __name__ == '__main__':
     packages: list[tuple[str, list[int]]] = [
         ('SWM', [720, 1, 80, 25, 40]),
@@ -153,6 +882,5 @@ if __name__ == '__main__':
         ('WLK', [9000, 1, 75, 180]),
     ]
 
-    for workout_type, data in packages:
-        training = read_package(workout_type, data)
-        main(training)
+    main_batch(read_package(workout_type, data)
+               for workout_type, data in packages)
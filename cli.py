@@ -0,0 +1,235 @@
+"""Единая точка входа командной строки.
+
+    python cli.py score [файл|-] [параметры streaming]
+    python cli.py columnar ВХОД ВЫХОД
+    python cli.py bench [параметры benchmark]
+    python cli.py verify [параметры equivalence]
+    python cli.py serve [параметры server]
+    python cli.py daemon --socket /tmp/fitness.sock
+    python cli.py score файл --daemon /tmp/fitness.sock
+
+Модуль подкоманды импортируется только после её выбора, поэтому
+короткий запуск не платит за импорт ненужного. Подкоманда daemon
+держит интерпретатор с загруженным расчётом и принимает задания
+score через Unix-сокет; на каждое задание порождается fork, так что
+задания не мешают друг другу и не тратят время на импорт.
+"""
+from __future__ import annotations
+
+import os
+import sys
+from importlib import import_module
+
+# typing не импортируется: с отложенными аннотациями он нужен только
+# проверке типов, а его импорт заметен на фоне запуска интерпретатора.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import socket
+    from typing import BinaryIO
+
+# Подкоманда -> (модуль с функцией run, описание).
+COMMANDS: dict[str, tuple[str, str]] = {
+    'score': ('streaming', 'посчитать пакеты из файла или stdin'),
+    'columnar': ('columnar', 'записать результаты колонками'),
+    'bench': ('benchmark', 'замеры скорости'),
+    'verify': ('equivalence', 'сверка движков расчёта с эталоном'),
+    'serve': ('server', 'сервер расчёта по TCP или Unix-сокету'),
+    'daemon': ('cli', 'резидентный процесс для заданий score'),
+}
+# После вывода задания демон шлёт NUL и JSON с кодом завершения и
+# stderr задания; в текстовом выводе NUL не встречается.
+TRAILER: bytes = b'\0'
+NEEDS_INPUT: bytes = b'I'
+NO_INPUT: bytes = b'N'
+BUFFER_SIZE: int = 65536
+
+
+def usage() -> str:
+    lines = ['Использование: cli.py КОМАНДА [ПАРАМЕТРЫ]', '', 'Команды:']
+    lines += [f'  {name:<9} {description}'
+              for name, (_, description) in COMMANDS.items()]
+    return '\n'.join(lines) + '\n'
+
+
+def _pop_option(argv: list[str], name: str) -> str | None:
+    """Убрать из argv параметр name со значением и вернуть значение."""
+    for i, arg in enumerate(argv):
+        if arg == name and i + 1 < len(argv):
+            value = argv[i + 1]
+            del argv[i:i + 2]
+            return value
+        if arg.startswith(name + '='):
+            del argv[i]
+            return arg[len(name) + 1:]
+    return None
+
+
+def submit(socket_path: str,
+           argv: list[str],
+           stdin: BinaryIO | None = None,
+           stdout: BinaryIO | None = None) -> int:
+    """Отправить задание score демону и вывести результат.
+
+    Демон выполняет задание в текущем каталоге клиента и, если ему
+    нужен stdin, просит переслать его. Возвращает код завершения
+    задания.
+    """
+    import json
+    import socket
+
+    stdout = stdout or sys.stdout.buffer
+    job = {'argv': list(argv), 'cwd': os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(job).encode('utf-8') + b'\n')
+        if connection.recv(1) == NEEDS_INPUT:
+            stdin = stdin or sys.stdin.buffer
+            while True:
+                data = stdin.read(BUFFER_SIZE)
+                if not data:
+                    break
+                connection.sendall(data)
+        connection.shutdown(socket.SHUT_WR)
+        trailer = None
+        while True:
+            data = connection.recv(BUFFER_SIZE)
+            if not data:
+                break
+            if trailer is not None:
+                trailer += data
+                continue
+            cut = data.find(TRAILER)
+            if cut < 0:
+                stdout.write(data)
+                continue
+            stdout.write(data[:cut])
+            trailer = data[cut + 1:]
+    stdout.flush()
+    if trailer is None:
+        print('Демон закрыл соединение без результата.', file=sys.stderr)
+        return 1
+    result = json.loads(trailer)
+    sys.stderr.write(result['stderr'])
+    return result['code']
+
+
+def _serve_job(connection: socket.socket) -> int:
+    """Выполнить задание score в порождённом процессе."""
+    import io
+    import json
+
+    import streaming
+
+    reader = connection.makefile('rb')
+    output = connection.makefile('wb')
+    job = json.loads(reader.readline())
+    sys.stdin = io.TextIOWrapper(reader, encoding='utf-8')
+    sys.stdout = io.TextIOWrapper(output, encoding='utf-8')
+    sys.stderr = io.StringIO()
+    code = 0
+    args = None
+    try:
+        os.chdir(job['cwd'])
+        args = streaming.build_parser().parse_args(job['argv'])
+    except SystemExit as exc:
+        code = exc.code if isinstance(exc.code, int) else 1
+    except OSError as exc:
+        print(f'Ошибка задания: {exc}', file=sys.stderr)
+        code = 1
+    connection.sendall(NEEDS_INPUT if args is not None
+                       and args.path in (None, '-') else NO_INPUT)
+    if args is not None:
+        code = _run_job(streaming.run, job['argv'])
+    sys.stdout.flush()
+    result = {'code': code, 'stderr': sys.stderr.getvalue()}
+    output.write(TRAILER + json.dumps(result).encode('utf-8'))
+    output.flush()
+    return code
+
+
+def _run_job(run, argv: list[str]) -> int:
+    try:
+        run(argv)
+    except SystemExit as exc:
+        return exc.code if isinstance(exc.code, int) else 1
+    except Exception as exc:
+        print(f'Ошибка задания: {exc}', file=sys.stderr)
+        return 1
+    return 0
+
+
+def daemon(socket_path: str, max_jobs: int | None = None) -> None:
+    """Принимать задания score на Unix-сокете socket_path.
+
+    Расчёт импортируется один раз; каждое задание выполняется в
+    fork родителя. max_jobs - остановиться после стольких заданий.
+    """
+    import signal
+    import socket
+
+    # Загрузить расчёт до fork, чтобы задания его не импортировали.
+    import_module('streaming')
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    jobs = 0
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(socket_path)
+        listener.listen(128)
+        try:
+            while max_jobs is None or jobs < max_jobs:
+                connection, _ = listener.accept()
+                jobs += 1
+                if os.fork():
+                    connection.close()
+                    continue
+                listener.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                code = 1
+                try:
+                    code = _serve_job(connection)
+                finally:
+                    connection.close()
+                    os._exit(code)
+        finally:
+            os.unlink(socket_path)
+
+
+def _run_daemon(argv: list[str]) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='cli.py daemon',
+        description='Резидентный процесс для заданий score.')
+    parser.add_argument('--socket', required=True, help='путь Unix-сокета')
+    parser.add_argument('--max-jobs', type=int,
+                        help='остановиться после стольких заданий')
+    args = parser.parse_args(argv)
+    daemon(args.socket, args.max_jobs)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Точка входа; возвращает код выхода."""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        sys.stdout.write(usage())
+        return 0 if argv else 2
+    command, argv = argv[0], argv[1:]
+    if command not in COMMANDS:
+        sys.stderr.write(f'Неизвестная команда: {command}.\n\n{usage()}')
+        return 2
+    if command == 'daemon':
+        _run_daemon(argv)
+        return 0
+    if command == 'score':
+        socket_path = _pop_option(argv, '--daemon')
+        if socket_path is not None:
+            return submit(socket_path, argv)
+    module, _ = COMMANDS[command]
+    code = import_module(module).run(argv)
+    return code if isinstance(code, int) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
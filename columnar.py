@@ -0,0 +1,333 @@
+"""Колоночная запись результатов расчёта для аналитики.
+
+Результаты пишутся группами строк (row groups) по row_group_size
+записей: в памяти держится только текущая группа. Колонки группы:
+id записи (строка, пусто - нет id), training_type со словарным
+кодированием и duration, distance, speed, calories во float64.
+
+Файлы *.parquet пишутся через pyarrow, если он установлен. Без него
+используется собственный формат FTRC - та же раскладка в простом
+двоичном виде, little-endian::
+
+    заголовок файла  <4sH: магия b'FTRC', версия
+    группа строк     <4sIHB: магия b'RGRP', число строк n,
+                     размер словаря k, есть ли колонка id
+    словарь          k раз: <H длина + название в utf-8
+    type_index       uint16[n]
+    id               uint32[n + 1] смещений + байты utf-8
+                     (только если колонка id есть)
+    duration, distance, speed, calories   float64[n]
+
+    python columnar.py packets.ndjson results.ftrc
+"""
+from __future__ import annotations
+
+import argparse
+import struct
+import sys
+from array import array
+from collections import Counter
+from typing import (BinaryIO, Hashable, Iterable, Iterator, NamedTuple,
+                    Sequence)
+
+from caloriescounter import (InfoMessage, UnknownWorkoutTypeError,
+                             read_package)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+MAGIC: bytes = b'FTRC'
+VERSION: int = 1
+HEADER = struct.Struct('<4sH')
+GROUP_MAGIC: bytes = b'RGRP'
+GROUP_HEADER = struct.Struct('<4sIHB')
+DEFAULT_ROW_GROUP_SIZE: int = 65536
+VALUE_COLUMNS: tuple[str, ...] = ('duration', 'distance', 'speed',
+                                  'calories')
+
+
+class RowGroup(NamedTuple):
+    """Группа строк, прочитанная из файла результатов."""
+    ids: list[str] | None
+    training_types: tuple[str, ...]
+    type_index: Sequence[int]
+    duration: Sequence[float]
+    distance: Sequence[float]
+    speed: Sequence[float]
+    calories: Sequence[float]
+
+    def __len__(self) -> int:
+        return len(self.type_index)
+
+
+def _little_endian(column: array) -> array:
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+class ResultsWriter:
+    """Потоковая колоночная запись InfoMessage.
+
+    format - 'ftrc' или 'parquet'; по умолчанию выбирается по
+    расширению пути.
+    """
+
+    def __init__(self,
+                 path: str,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 format: str | None = None) -> None:
+        if row_group_size < 1:
+            raise ValueError('Размер группы строк должен быть '
+                             'положительным.')
+        if format is None:
+            format = 'parquet' if path.endswith('.parquet') else 'ftrc'
+        if format not in ('ftrc', 'parquet'):
+            raise ValueError(f'Неизвестный формат: {format}.')
+        if format == 'parquet' and pq is None:
+            raise ImportError('Для записи Parquet нужен pyarrow.')
+        self.path = path
+        self.format = format
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._file: BinaryIO | None = None
+        self._parquet = None
+        if format == 'ftrc':
+            self._file = open(path, 'wb')
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._reset()
+
+    def _reset(self) -> None:
+        self._names: dict[str, int] = {}
+        self._ids: list[str] = []
+        self._has_ids = False
+        self._type_index = array('H')
+        self._values = {name: array('d') for name in VALUE_COLUMNS}
+
+    def write(self, info: InfoMessage, id: Hashable | None = None) -> None:
+        """Добавить результат; группа сбрасывается, когда заполнена."""
+        names = self._names
+        index = names.get(info.training_type)
+        if index is None:
+            index = names[info.training_type] = len(names)
+        self._type_index.append(index)
+        values = self._values
+        values['duration'].append(info.duration)
+        values['distance'].append(info.distance)
+        values['speed'].append(info.speed)
+        values['calories'].append(info.calories)
+        if id is not None:
+            self._has_ids = True
+        self._ids.append('' if id is None else str(id))
+        if len(self._type_index) >= self.row_group_size:
+            self.flush()
+
+    def write_many(self,
+                   infos: Iterable[InfoMessage],
+                   ids: Iterable[Hashable | None] | None = None) -> None:
+        if ids is None:
+            for info in infos:
+                self.write(info)
+            return
+        for info, id in zip(infos, ids):
+            self.write(info, id)
+
+    def flush(self) -> None:
+        """Записать накопленную группу строк."""
+        if not self._type_index:
+            return
+        if self.format == 'parquet':
+            self._flush_parquet()
+        else:
+            self._flush_ftrc()
+        self.rows += len(self._type_index)
+        self._reset()
+
+    def _flush_ftrc(self) -> None:
+        file = self._file
+        file.write(GROUP_HEADER.pack(GROUP_MAGIC, len(self._type_index),
+                                     len(self._names), self._has_ids))
+        for name in self._names:
+            encoded = name.encode('utf-8')
+            file.write(struct.pack('<H', len(encoded)))
+            file.write(encoded)
+        file.write(_little_endian(self._type_index).tobytes())
+        if self._has_ids:
+            encoded_ids = [id.encode('utf-8') for id in self._ids]
+            offsets = array('I', [0])
+            for encoded in encoded_ids:
+                offsets.append(offsets[-1] + len(encoded))
+            file.write(_little_endian(offsets).tobytes())
+            file.write(b''.join(encoded_ids))
+        for name in VALUE_COLUMNS:
+            file.write(_little_endian(self._values[name]).tobytes())
+
+    def _flush_parquet(self) -> None:
+        training_type = pa.DictionaryArray.from_arrays(
+            pa.array(self._type_index, pa.uint16()),
+            pa.array(list(self._names), pa.string()))
+        ids = (pa.array(self._ids, pa.string()) if self._has_ids
+               else pa.nulls(len(self._ids), pa.string()))
+        table = pa.Table.from_arrays(
+            [ids, training_type,
+             *(pa.array(self._values[name], pa.float64())
+               for name in VALUE_COLUMNS)],
+            names=['id', 'training_type', *VALUE_COLUMNS])
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self.path, table.schema)
+        self._parquet.write_table(table)
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+    def __enter__(self) -> ResultsWriter:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def _read_exact(file: BinaryIO, size: int) -> bytes:
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError('Файл результатов обрезан.')
+    return data
+
+
+def _read_column(file: BinaryIO, typecode: str, count: int) -> array:
+    column = array(typecode)
+    column.frombytes(_read_exact(file, column.itemsize * count))
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def _read_group(file: BinaryIO, header: bytes) -> RowGroup:
+    magic, count, size, has_ids = GROUP_HEADER.unpack(header)
+    if magic != GROUP_MAGIC:
+        raise ValueError('Повреждена группа строк файла результатов.')
+    names = []
+    for _ in range(size):
+        length, = struct.unpack('<H', _read_exact(file, 2))
+        names.append(_read_exact(file, length).decode('utf-8'))
+    type_index = _read_column(file, 'H', count)
+    ids = None
+    if has_ids:
+        offsets = _read_column(file, 'I', count + 1)
+        blob = _read_exact(file, offsets[-1])
+        ids = [blob[start:end].decode('utf-8')
+               for start, end in zip(offsets, offsets[1:])]
+    columns = [_read_column(file, 'd', count) for _ in VALUE_COLUMNS]
+    return RowGroup(ids, tuple(names), type_index, *columns)
+
+
+def _read_parquet(path: str) -> Iterator[RowGroup]:
+    file = pq.ParquetFile(path)
+    for i in range(file.num_row_groups):
+        table = file.read_row_group(i)
+        training_type = table.column('training_type').combine_chunks()
+        ids = table.column('id')
+        yield RowGroup(
+            ids.to_pylist() if ids.null_count < len(ids) else None,
+            tuple(training_type.dictionary.to_pylist()),
+            training_type.indices.to_pylist(),
+            *(table.column(name).to_pylist() for name in VALUE_COLUMNS))
+
+
+def read_row_groups(path: str) -> Iterator[RowGroup]:
+    """Читать файл результатов по одной группе строк."""
+    if path.endswith('.parquet'):
+        if pq is None:
+            raise ImportError('Для чтения Parquet нужен pyarrow.')
+        yield from _read_parquet(path)
+        return
+    with open(path, 'rb') as file:
+        magic, version = HEADER.unpack(_read_exact(file, HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path}: неизвестный формат файла '
+                             f'результатов.')
+        while True:
+            header = file.read(GROUP_HEADER.size)
+            if not header:
+                return
+            if len(header) != GROUP_HEADER.size:
+                raise ValueError('Файл результатов обрезан.')
+            yield _read_group(file, header)
+
+
+def iter_results(path: str) -> Iterator[tuple[str | None, InfoMessage]]:
+    """Строки файла результатов в виде (id, InfoMessage)."""
+    for group in read_row_groups(path):
+        names = group.training_types
+        ids = group.ids or [None] * len(group)
+        for id, index, duration, distance, speed, calories in zip(
+                ids, group.type_index, group.duration, group.distance,
+                group.speed, group.calories):
+            yield (id or None,
+                   InfoMessage(names[index], duration, distance, speed,
+                               calories))
+
+
+def write_results(records: Iterable[tuple[Hashable | None, str, list]],
+                  writer: ResultsWriter,
+                  unknown: Counter | None = None) -> None:
+    """Посчитать записи (id, workout_type, data) и записать результаты.
+
+    Пакеты неизвестных видов считаются в unknown, без него - прерывают
+    запись.
+    """
+    for id, workout_type, data in records:
+        try:
+            info = read_package(workout_type, data).show_training_info()
+        except UnknownWorkoutTypeError:
+            if unknown is None:
+                raise
+            unknown[workout_type] += 1
+            continue
+        writer.write(info, id)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Посчитать пакеты и записать результаты колонками.')
+    parser.add_argument('input',
+                        help='файл пакетов (CSV/NDJSON), - для stdin')
+    parser.add_argument('output', help='файл результатов: *.parquet или '
+                                       'FTRC')
+    parser.add_argument('--row-group-size', type=int,
+                        default=DEFAULT_ROW_GROUP_SIZE,
+                        help='сколько строк в одной группе')
+    parser.add_argument('--format', choices=['ftrc', 'parquet'],
+                        help='формат вывода; по умолчанию по расширению')
+    return parser
+
+
+def run(argv: list[str] | None = None) -> None:
+    """Точка входа командной строки."""
+    from streaming import iter_records, open_input
+
+    args = build_parser().parse_args(argv)
+    unknown: Counter = Counter()
+    stream = open_input(args.input)
+    try:
+        with ResultsWriter(args.output, args.row_group_size,
+                           args.format) as writer:
+            write_results(iter_records(stream), writer, unknown)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    for workout_type, count in unknown.items():
+        print(f'Пропущено пакетов неизвестного вида {workout_type}: '
+              f'{count}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,534 @@
+"""Распределённый пересчёт большого файла пакетов.
+
+Координатор режет файл пакетов на диапазоны байтов по границам строк
+и раздаёт их воркерам по TCP. Воркер (``python coordinator.py
+worker``) может работать и на другой машине: диапазон пересылается
+ему целиком, общий диск не нужен. Воркер проверяет и считает пакеты
+диапазона и возвращает текст сообщений и итоги по видам тренировок.
+
+Протокол кадровый, как у server.py: 4 байта длины (big-endian) и
+тело. Запрос - кадр JSON {"index": ...} и кадр с байтами диапазона.
+Ответ - кадр JSON {"ok": true, "count", "totals", "rejected"} и кадр
+с текстом сообщений, либо один кадр {"ok": false, "error"}.
+
+Готовый диапазон сразу записывается в каталог вывода (part-NNNNN.txt)
+и дописывается строкой в журнал checkpoint.jsonl. Прерванный
+пересчёт, запущенный заново с тем же каталогом, считает только
+недостающие диапазоны. Диапазон, на котором воркер вернул ошибку,
+повторяется до max_attempts раз, в том числе на другом воркере.
+Ошибка связи попытку не тратит: диапазон возвращается в очередь, а
+недоступный воркер выбывает.
+
+    python coordinator.py worker --port 9001
+    python coordinator.py run packets.csv out/ --workers host:9001 ...
+    python coordinator.py run packets.csv out/ --spawn 4
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+from collections import Counter, deque
+from typing import Iterator, NamedTuple
+
+from caloriescounter import InfoMessage, format_messages
+from streaming import score_packets
+from validation import Validator
+
+LENGTH = struct.Struct('>I')
+MAX_FRAME_SIZE: int = 1 << 30
+DEFAULT_PARTITION_SIZE: int = 16 * 1024 * 1024
+DEFAULT_MAX_ATTEMPTS: int = 3
+CHECKPOINT_VERSION: int = 2
+CHECKPOINT: str = 'checkpoint.jsonl'
+TOTALS: str = 'totals.json'
+ALL: str = '*'
+
+Address = tuple[str, int]
+
+
+class Partition(NamedTuple):
+    """Диапазон байтов [start, end) файла пакетов."""
+    index: int
+    start: int
+    end: int
+
+
+class CoordinatorError(Exception):
+    """Часть диапазонов так и не удалось посчитать."""
+
+
+def partition_file(path: str, partition_size: int) -> list[Partition]:
+    """Разбить файл на диапазоны примерно по partition_size байт.
+
+    Каждая граница сдвигается вперёд до конца строки, поэтому запись
+    никогда не разрезается.
+    """
+    if partition_size < 1:
+        raise ValueError('Размер диапазона должен быть положительным.')
+    size = os.path.getsize(path)
+    partitions = []
+    start = 0
+    with open(path, 'rb') as file:
+        while start < size:
+            file.seek(min(start + partition_size, size))
+            file.readline()
+            end = min(file.tell(), size)
+            partitions.append(Partition(len(partitions), start, end))
+            start = end
+    return partitions
+
+
+def _send_frame(connection: socket.socket, body: bytes) -> None:
+    connection.sendall(LENGTH.pack(len(body)) + body)
+
+
+def _recv_exactly(connection: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError('Соединение закрыто посреди кадра.')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_frame(connection: socket.socket) -> bytes | None:
+    header = connection.recv(LENGTH.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) != LENGTH.size:
+        raise ConnectionError('Соединение закрыто посреди кадра.')
+    (size,) = LENGTH.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f'Кадр {size} байт больше {MAX_FRAME_SIZE}.')
+    return _recv_exactly(connection, size)
+
+
+def _add_totals(totals: dict, info: InfoMessage) -> None:
+    for key in (info.training_type, ALL):
+        entry = totals.get(key)
+        if entry is None:
+            entry = totals[key] = {
+                'count': 0, 'duration': 0.0, 'distance': 0.0,
+                'calories': 0.0, 'speed_min': info.speed,
+                'speed_max': info.speed}
+        entry['count'] += 1
+        entry['duration'] += info.duration
+        entry['distance'] += info.distance
+        entry['calories'] += info.calories
+        entry['speed_min'] = min(entry['speed_min'], info.speed)
+        entry['speed_max'] = max(entry['speed_max'], info.speed)
+
+
+def merge_totals(totals: dict, other: dict) -> None:
+    """Добавить итоги other к totals."""
+    for key, entry in other.items():
+        current = totals.get(key)
+        if current is None:
+            totals[key] = dict(entry)
+            continue
+        for name in ('count', 'duration', 'distance', 'calories'):
+            current[name] += entry[name]
+        current['speed_min'] = min(current['speed_min'], entry['speed_min'])
+        current['speed_max'] = max(current['speed_max'], entry['speed_max'])
+
+
+def score_partition(data: bytes) -> tuple[str, dict]:
+    """Посчитать байты диапазона: текст сообщений и сводка для ответа."""
+    validator = Validator()
+    lines = data.decode('utf-8').splitlines()
+    infos = score_packets(validator.filter(validator.parse(lines)))
+    totals: dict = {}
+    for info in infos:
+        _add_totals(totals, info)
+    return format_messages(infos), {'count': len(infos), 'totals': totals,
+                                    'rejected': dict(validator.counts)}
+
+
+class _WorkerHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        connection = self.request
+        while True:
+            header = _recv_frame(connection)
+            if header is None:
+                return
+            data = _recv_frame(connection)
+            if data is None:
+                return
+            try:
+                text, summary = score_partition(data)
+            except Exception as exc:
+                _send_frame(connection, json.dumps(
+                    {'ok': False, 'error': str(exc)}).encode('utf-8'))
+                continue
+            reply = {'ok': True, **json.loads(header), **summary}
+            _send_frame(connection, json.dumps(reply).encode('utf-8'))
+            _send_frame(connection, text.encode('utf-8'))
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    """Воркер: считает присланные диапазоны, по потоку на соединение."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address: Address = ('127.0.0.1', 0)) -> None:
+        super().__init__(address, _WorkerHandler)
+
+
+def start_worker(address: Address = ('127.0.0.1', 0)) -> WorkerServer:
+    """Запустить воркер в фоновом потоке этого процесса."""
+    server = WorkerServer(address)
+    threading.Thread(target=server.serve_forever, args=(0.05,),
+                     daemon=True).start()
+    return server
+
+
+class _Schedule:
+    """Очередь диапазонов, общая для потоков координатора."""
+
+    def __init__(self, partitions: list[Partition]) -> None:
+        self.pending = deque(partitions)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def take(self) -> Partition | None:
+        """Следующий диапазон; None - раздавать больше нечего."""
+        with self.condition:
+            while not self.pending and self.in_flight:
+                self.condition.wait()
+            if not self.pending:
+                return None
+            self.in_flight += 1
+            return self.pending.popleft()
+
+    def done(self, partition: Partition, retry: bool = False) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            if retry:
+                self.pending.append(partition)
+            self.condition.notify_all()
+
+
+class Coordinator:
+    """Пересчёт файла пакетов на воркерах с контрольной точкой."""
+
+    def __init__(self,
+                 path: str,
+                 output_dir: str,
+                 workers: list[Address],
+                 partition_size: int = DEFAULT_PARTITION_SIZE,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 timeout: float | None = 300) -> None:
+        if not workers:
+            raise ValueError('Нужен хотя бы один воркер.')
+        self.path = path
+        self.output_dir = output_dir
+        self.workers = workers
+        self.partition_size = partition_size
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.attempts: Counter = Counter()
+        self.failed: dict[int, str] = {}
+        self.retired: dict[Address, str] = {}
+        self._lock = threading.Lock()
+        self._done: dict[str, dict] = {}
+
+    def part_path(self, index: int) -> str:
+        return os.path.join(self.output_dir, f'part-{index:05d}.txt')
+
+    def _source(self) -> dict:
+        return {'path': os.path.abspath(self.path),
+                'size': os.path.getsize(self.path),
+                'partition_size': self.partition_size}
+
+    def _load_checkpoint(self) -> None:
+        """Прочитать журнал готовых диапазонов или начать новый.
+
+        Первая строка журнала - версия и источник, дальше по строке на
+        готовый диапазон. Недописанная последняя строка (обрыв во время
+        записи) отбрасывается.
+        """
+        path = os.path.join(self.output_dir, CHECKPOINT)
+        if not os.path.exists(path):
+            _write_atomic(path, _journal_line(
+                {'version': CHECKPOINT_VERSION, 'source': self._source()}))
+            return
+        with open(path, 'rb') as file:
+            lines = file.readlines()
+        try:
+            state = json.loads(lines[0]) if lines else {}
+            valid = len(lines[0]) if lines else 0
+            done = {}
+            for line in lines[1:]:
+                if not line.endswith(b'\n'):
+                    break
+                record = json.loads(line)
+                done[record.pop('index')] = record
+                valid += len(line)
+        except ValueError as exc:
+            raise CoordinatorError(
+                f'{path}: повреждён журнал: {exc}') from None
+        if (state.get('version') != CHECKPOINT_VERSION
+                or state.get('source') != self._source()):
+            raise CoordinatorError(
+                f'{path}: контрольная точка от другого файла или размера '
+                f'диапазона; укажите другой каталог вывода.')
+        if valid < sum(map(len, lines)):
+            os.truncate(path, valid)
+        self._done.update(done)
+
+    def _complete(self, partition: Partition, reply: dict,
+                  text: bytes) -> None:
+        _write_atomic(self.part_path(partition.index), text)
+        record = {'count': reply['count'], 'totals': reply['totals'],
+                  'rejected': reply['rejected']}
+        line = _journal_line({'index': str(partition.index), **record})
+        with self._lock:
+            with open(os.path.join(self.output_dir, CHECKPOINT),
+                      'ab') as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+            self._done[str(partition.index)] = record
+
+    def _fail(self, partition: Partition, error: str) -> bool:
+        """Учесть неудачу; True - диапазон стоит повторить."""
+        with self._lock:
+            self.attempts[partition.index] += 1
+            if self.attempts[partition.index] < self.max_attempts:
+                return True
+            self.failed[partition.index] = error
+            return False
+
+    def _score_on(self,
+                  connection: socket.socket,
+                  partition: Partition) -> tuple[dict, bytes]:
+        with open(self.path, 'rb') as file:
+            file.seek(partition.start)
+            data = file.read(partition.end - partition.start)
+        _send_frame(connection, json.dumps(
+            {'index': partition.index}).encode('utf-8'))
+        _send_frame(connection, data)
+        header = _recv_frame(connection)
+        if header is None:
+            raise ConnectionError('Воркер закрыл соединение.')
+        reply = json.loads(header)
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        text = _recv_frame(connection)
+        if text is None:
+            raise ConnectionError('Воркер закрыл соединение.')
+        return reply, text
+
+    def _drive(self, address: Address, schedule: _Schedule) -> None:
+        """Раздавать диапазоны одному воркеру, пока они есть.
+
+        Ошибка расчёта (ответ воркера с ok: false), неполный ответ или
+        сбой записи результата засчитываются диапазону как попытка. При
+        ошибке связи диапазон возвращается в очередь без попытки;
+        воркер, к которому не удалось подключиться или связь с которым
+        рвётся max_attempts раз подряд, выбывает. Взятый диапазон
+        освобождается при любой ошибке, иначе остальные потоки ждали
+        бы его вечно.
+        """
+        connection = None
+        failures = 0
+        while True:
+            partition = schedule.take()
+            if partition is None:
+                break
+            retry = True
+            try:
+                try:
+                    if connection is None:
+                        connection = socket.create_connection(
+                            address, self.timeout)
+                    reply, text = self._score_on(connection, partition)
+                except (OSError, ValueError) as exc:
+                    failures += 1
+                    if self._retire(address, connection, failures, exc):
+                        break
+                    _close(connection)
+                    connection = None
+                    continue
+                failures = 0
+                self._complete(partition, reply, text)
+                retry = False
+            except RuntimeError as exc:
+                retry = self._fail(partition, str(exc))
+            except Exception as exc:
+                # Неполный ответ воркера или сбой записи результата.
+                _close(connection)
+                connection = None
+                retry = self._fail(partition, repr(exc))
+            finally:
+                schedule.done(partition, retry=retry)
+        _close(connection)
+
+    def _retire(self, address: Address, connection: socket.socket | None,
+                failures: int, exc: Exception) -> bool:
+        """Учесть ошибку связи; True - воркер выбывает."""
+        if connection is not None and failures < self.max_attempts:
+            return False
+        with self._lock:
+            self.retired[address] = str(exc)
+        return True
+
+    def run(self) -> dict:
+        """Посчитать недостающие диапазоны и вернуть общие итоги.
+
+        Итоги по видам тренировок (и ALL для всех вместе) записываются
+        также в totals.json каталога вывода.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._load_checkpoint()
+        partitions = partition_file(self.path, self.partition_size)
+        pending = [partition for partition in partitions
+                   if str(partition.index) not in self._done]
+        schedule = _Schedule(pending)
+        threads = [threading.Thread(target=self._drive,
+                                    args=(address, schedule))
+                   for address in self.workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        missing = [partition.index for partition in partitions
+                   if str(partition.index) not in self._done]
+        if missing:
+            details = '; '.join(
+                [f'{index}: {self.failed[index]}' for index in missing
+                 if index in self.failed]
+                + [f'воркер {host}:{port} выбыл: {error}'
+                   for (host, port), error in self.retired.items()])
+            raise CoordinatorError(f'Не посчитаны диапазоны {missing}. '
+                                   f'{details}')
+        summary = self.summary()
+        _write_atomic(os.path.join(self.output_dir, TOTALS),
+                      json.dumps(summary, ensure_ascii=False).encode('utf-8'))
+        return summary
+
+    def summary(self) -> dict:
+        """Итоги и отказы по всем готовым диапазонам."""
+        totals: dict = {}
+        rejected: Counter = Counter()
+        count = 0
+        for index in sorted(self._done, key=int):
+            done = self._done[index]
+            count += done['count']
+            merge_totals(totals, done['totals'])
+            rejected.update(done['rejected'])
+        return {'partitions': len(self._done), 'count': count,
+                'totals': totals, 'rejected': dict(rejected)}
+
+    def iter_output(self) -> Iterator[bytes]:
+        """Тексты готовых диапазонов в порядке файла."""
+        for index in sorted(map(int, self._done)):
+            with open(self.part_path(index), 'rb') as file:
+                yield file.read()
+
+
+def _journal_line(record: dict) -> bytes:
+    return json.dumps(record).encode('utf-8') + b'\n'
+
+
+def _close(connection: socket.socket | None) -> None:
+    if connection is not None:
+        connection.close()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def _parse_address(value: str) -> Address:
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def spawn_workers(count: int) -> tuple[list[subprocess.Popen],
+                                       list[Address]]:
+    """Запустить count воркеров-процессов на localhost."""
+    processes = []
+    addresses = []
+    script = os.path.abspath(__file__)
+    for _ in range(count):
+        process = subprocess.Popen(
+            [sys.executable, script, 'worker', '--port', '0'],
+            stdout=subprocess.PIPE, text=True)
+        processes.append(process)
+        addresses.append(_parse_address(process.stdout.readline().strip()))
+    return processes, addresses
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Распределённый пересчёт файла пакетов.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    worker = commands.add_parser('worker', help='запустить воркер')
+    worker.add_argument('--host', default='127.0.0.1')
+    worker.add_argument('--port', type=int, default=0)
+    coordinate = commands.add_parser('run', help='пересчитать файл')
+    coordinate.add_argument('path', help='файл пакетов (CSV/NDJSON)')
+    coordinate.add_argument('output_dir', help='каталог для результатов')
+    coordinate.add_argument('--workers', nargs='+', default=[],
+                            type=_parse_address, metavar='HOST:PORT')
+    coordinate.add_argument('--spawn', type=int, default=0,
+                            help='запустить столько воркеров на localhost')
+    coordinate.add_argument('--partition-size', type=int,
+                            default=DEFAULT_PARTITION_SIZE,
+                            help='примерный размер диапазона, байты')
+    coordinate.add_argument('--max-attempts', type=int,
+                            default=DEFAULT_MAX_ATTEMPTS)
+    coordinate.add_argument('--merge', action='store_true',
+                            help='вывести все сообщения в stdout')
+    return parser
+
+
+def _coordinate(args: argparse.Namespace) -> None:
+    processes, spawned = spawn_workers(args.spawn)
+    try:
+        coordinator = Coordinator(args.path, args.output_dir,
+                                  args.workers + spawned,
+                                  args.partition_size, args.max_attempts)
+        summary = coordinator.run()
+        if args.merge:
+            for text in coordinator.iter_output():
+                sys.stdout.buffer.write(text)
+            sys.stdout.flush()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+    print(f'Посчитано пакетов: {summary["count"]} в '
+          f'{summary["partitions"]} диапазонах.', file=sys.stderr)
+
+
+def run(argv: list[str] | None = None) -> None:
+    """Точка входа командной строки."""
+    args = build_parser().parse_args(argv)
+    if args.command == 'run':
+        _coordinate(args)
+        return
+    with WorkerServer((args.host, args.port)) as server:
+        host, port = server.server_address[:2]
+        print(f'{host}:{port}', flush=True)
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    run()
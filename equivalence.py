@@ -0,0 +1,559 @@
+"""Сверка движков расчёта с эталонными классами и замер их скорости.
+
+Эталон - методы Running, SportsWalking и Swimming: get_distance,
+get_mean_speed и get_spent_calories, собранные в InfoMessage. Каждый
+движок (слитые формулы, пакетный расчёт, потоковый разбор, кэш,
+процессы, сервис, распределённый пересчёт, форматы хранения) считает
+тот же набор случайных пакетов, и его результат сверяется с эталоном:
+длительность, дистанция, скорость, калории и текст get_message().
+
+Допуск по числам - Engine.tolerance. Ноль значит совпадение бит в
+бит; так должны считать все движки, которые вычисляют те же формулы в
+том же порядке. Ненулевой допуск - относительная погрешность (для
+значений около нуля - абсолютная) у движков, которые считают иначе:
+timeseries собирает длительность из секунд отсчётов. Текст у таких
+движков сверяется с текстами эталонных значений на границах допуска.
+
+Пакеты - правдоподобная смесь видов как в benchmark; доля EDGE_SHARE
+из них получает в одно из полей границу validation.RANGES. Зерно
+случайности попадает в отчёт, чтобы расхождение можно было повторить.
+
+Пропускная способность движка - пакеты в секунду на весь прогон,
+включая запуск процессов и соединения. Отчёт совместим с benchmark:
+с --baseline падение скорости больше --tolerance - регрессия.
+
+    python equivalence.py --size 20000 --output baseline.json
+    python equivalence.py --baseline baseline.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import inspect
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+from time import perf_counter_ns
+from typing import Callable, NamedTuple
+
+import caloriescounter
+from benchmark import (DEFAULT_TOLERANCE, MIN_SECONDS, TYPE_MIX, Package,
+                       compare, generate_package)
+from caloriescounter import (InfoMessage, InfoMessageBatch, encode_types,
+                             format_messages, get_workout_type,
+                             read_package)
+from streaming import score_packets, score_stream
+from validation import RANGES
+
+DEFAULT_SIZE: int = 10000
+EDGE_SHARE: float = 0.1
+TIMESERIES_TOLERANCE: float = 1e-9
+TIMESERIES_SAMPLES: int = 3
+PARALLEL_WORKERS: int = 2
+COORDINATOR_WORKERS: int = 2
+# Сколько запросов клиент сервиса отправляет, не читая ответов.
+SERVER_WINDOW: int = 256
+# Сколько расхождений одного движка попадает в отчёт.
+MAX_MISMATCHES: int = 10
+FIELDS: tuple[str, ...] = ('training_type', 'duration', 'distance',
+                           'speed', 'calories')
+
+
+class Engine(NamedTuple):
+    """Движок расчёта для сверки.
+
+    run получает пакеты и возвращает InfoMessage или, для движков с
+    текстовым выводом, строки get_message(). reference_input - какие
+    пакеты на самом деле видит движок, если формат хранения меняет
+    значения; available - можно ли запустить движок здесь.
+    """
+    run: Callable[[list[Package]], list]
+    tolerance: float = 0.0
+    reference_input: Callable[[list[Package]], list[Package]] | None = None
+    available: Callable[[], bool] | None = None
+
+
+class Mismatch(NamedTuple):
+    """Расхождение движка с эталоном."""
+    engine: str
+    index: int
+    field: str
+    expected: object
+    actual: object
+
+
+def _edge_packet(rnd: random.Random, workout_type: str) -> Package:
+    workout_type, data = generate_package(rnd, workout_type)
+    params = list(inspect.signature(
+        get_workout_type(workout_type).cls).parameters)
+    index = rnd.choice([i for i, name in enumerate(params)
+                        if name in RANGES])
+    data[index] = rnd.choice(RANGES[params[index]])
+    return workout_type, data
+
+
+def generate_packets(size: int, seed: int = 0) -> list[Package]:
+    """Случайные пакеты со смесью видов TYPE_MIX и граничными значениями.
+
+    Часть правдоподобных пакетов получает длительность и вес полной
+    точности вместо округлённых.
+    """
+    rnd = random.Random(seed)
+    types = rnd.choices(list(TYPE_MIX), weights=list(TYPE_MIX.values()),
+                        k=size)
+    packets = []
+    for workout_type in types:
+        if rnd.random() < EDGE_SHARE:
+            packets.append(_edge_packet(rnd, workout_type))
+            continue
+        workout_type, data = generate_package(rnd, workout_type)
+        if rnd.random() < 0.5:
+            data[1] = rnd.uniform(0.1, 5)
+            data[2] = rnd.uniform(40, 150)
+        packets.append((workout_type, data))
+    return packets
+
+
+def reference(packets: list[Package]) -> list[InfoMessage]:
+    """Эталон: методы классов тренировок."""
+    infos = []
+    for workout_type, data in packets:
+        training = read_package(workout_type, data)
+        infos.append(InfoMessage(training.__class__.__name__,
+                                 training.duration, training.get_distance(),
+                                 training.get_mean_speed(),
+                                 training.get_spent_calories()))
+    return infos
+
+
+def _lines(packets: list[Package]) -> list[str]:
+    return [','.join([workout_type, *map(repr, data)]) + '\n'
+            for workout_type, data in packets]
+
+
+def _show_training_info(packets: list[Package]) -> list[InfoMessage]:
+    return [read_package(*packet).show_training_info() for packet in packets]
+
+
+def _kernel(packets: list[Package]) -> list[InfoMessage]:
+    infos = []
+    for workout_type, data in packets:
+        cls = get_workout_type(workout_type).cls
+        infos.append(InfoMessage(cls.__name__, data[1], *cls.kernel(*data)))
+    return infos
+
+
+def _metric_cache(packets: list[Package]) -> list[InfoMessage]:
+    infos = []
+    for packet in packets:
+        training = read_package(*packet).enable_metric_cache()
+        training.get_spent_calories()
+        infos.append(InfoMessage(training.__class__.__name__,
+                                 training.duration, training.get_distance(),
+                                 training.get_mean_speed(),
+                                 training.get_spent_calories()))
+    return infos
+
+
+def _columns(packets: list[Package]) -> dict:
+    columns: dict[str, list] = {name: [0] * len(packets)
+                                for name in ('action', 'duration', 'weight',
+                                             'height', 'length_pool',
+                                             'count_pool')}
+    for i, (workout_type, data) in enumerate(packets):
+        params = inspect.signature(get_workout_type(workout_type).cls)
+        for name, value in zip(params.parameters, data):
+            columns[name][i] = value
+    return columns
+
+
+def _batch(calculate: Callable) -> Callable[[list[Package]], list]:
+    def run(packets: list[Package]) -> list[InfoMessage]:
+        type_code = encode_types([workout_type for workout_type, _ in packets])
+        columns = _columns(packets)
+        result = calculate(type_code, columns)
+        return [InfoMessage(get_workout_type(workout_type).cls.__name__,
+                            data[1], distance, speed, calories)
+                for (workout_type, data), distance, speed, calories in zip(
+                    packets, list(result.distance), list(result.speed),
+                    list(result.calories))]
+    return run
+
+
+def _numpy_batch(type_code: list[int], columns: dict):
+    return caloriescounter.calculate_batch(type_code, **columns)
+
+
+def _has_numpy() -> bool:
+    return caloriescounter._numpy() is not None
+
+
+def _format_messages(packets: list[Package]) -> list[str]:
+    return format_messages(_show_training_info(packets)).splitlines()
+
+
+def _format_batch(packets: list[Package]) -> list[str]:
+    batch = InfoMessageBatch()
+    for info in _show_training_info(packets):
+        batch.append_info(info)
+    return format_messages(batch).splitlines()
+
+
+def _streaming(packets: list[Package]) -> list[InfoMessage]:
+    chunks = score_stream(_lines(packets), chunk_size=1000)
+    return [info for chunk in chunks for info in chunk]
+
+
+def _pipeline(packets: list[Package]) -> list[str]:
+    from pipeline import run_pipeline
+
+    output = io.StringIO()
+    run_pipeline(_lines(packets), output, batch_size=1000)
+    return output.getvalue().splitlines()
+
+
+def _result_cache(path: str | None) -> Callable[[list[Package]], list]:
+    def run(packets: list[Package]) -> list[InfoMessage]:
+        """Второй проход по пакетам - из кэша."""
+        from resultcache import make_cache
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = make_cache(
+                path=path and os.path.join(directory, path))
+            try:
+                score_packets(packets, cache=cache)
+                return score_packets(packets, cache=cache)
+            finally:
+                cache.close()
+    return run
+
+
+def _parallel(packets: list[Package]) -> list[InfoMessage]:
+    from parallel import score_parallel
+
+    chunk_size = max(1, len(packets) // (PARALLEL_WORKERS * 4))
+    return [info for chunk in score_parallel(_lines(packets),
+                                             PARALLEL_WORKERS, chunk_size)
+            for info in chunk]
+
+
+def _packetfile_input(packets: list[Package]) -> list[Package]:
+    from packetfile import PacketFile, write_packets
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'packets.ftpk')
+        write_packets(path, packets)
+        with PacketFile(path) as packet_file:
+            return [(workout_type, list(data))
+                    for workout_type, data in packet_file]
+
+
+def _packetfile(packets: list[Package]) -> list[InfoMessage]:
+    from packetfile import PacketFile, write_packets
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'packets.ftpk')
+        write_packets(path, packets)
+        with PacketFile(path) as packet_file:
+            stored = list(packet_file)
+            result = packet_file.calculate()
+            return [InfoMessage(get_workout_type(workout_type).cls.__name__,
+                                data[1], distance, speed, calories)
+                    for (workout_type, data), distance, speed, calories
+                    in zip(stored, list(result.distance), list(result.speed),
+                           list(result.calories))]
+
+
+def _server(binary: bool) -> Callable[[list[Package]], list]:
+    def run(packets: list[Package]) -> list:
+        from server import ScoringClient, ScoringServer
+
+        async def scenario() -> list:
+            service = ScoringServer()
+            await service.start()
+            host, port = service.address[:2]
+            client = await ScoringClient.connect(host, port)
+            replies = []
+            try:
+                for start in range(0, len(packets), SERVER_WINDOW):
+                    replies += await client.score_many(
+                        packets[start:start + SERVER_WINDOW], binary)
+            finally:
+                await client.close()
+                await service.shutdown()
+            return replies
+
+        replies = asyncio.run(scenario())
+        if not binary:
+            return replies
+        return [InfoMessage(get_workout_type(reply.workout_type).cls.__name__,
+                            reply.duration, reply.distance, reply.speed,
+                            reply.calories)
+                for reply in replies]
+    return run
+
+
+def _coordinator(packets: list[Package]) -> list[str]:
+    from coordinator import Coordinator, start_worker
+
+    servers = [start_worker() for _ in range(COORDINATOR_WORKERS)]
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'packets.csv')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.writelines(_lines(packets))
+            partition_size = max(1, os.path.getsize(path)
+                                 // (COORDINATOR_WORKERS * 4))
+            coordinator = Coordinator(
+                path, os.path.join(directory, 'out'),
+                [server.server_address[:2] for server in servers],
+                partition_size)
+            coordinator.run()
+            text = b''.join(coordinator.iter_output()).decode('utf-8')
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+    return text.splitlines()
+
+
+def _columnar(packets: list[Package]) -> list[InfoMessage]:
+    from columnar import ResultsWriter, iter_results, write_results
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'results.ftrc')
+        with ResultsWriter(path, row_group_size=4096) as writer:
+            write_results(((i, *packet) for i, packet in enumerate(packets)),
+                          writer)
+        return [info for _, info in iter_results(path)]
+
+
+def _storage(packets: list[Package]) -> list[InfoMessage]:
+    from storage import WorkoutStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        with WorkoutStore(os.path.join(directory, 'workouts.db')) as store:
+            store.insert_many(('user', i, workout_type, data, None)
+                              for i, (workout_type, data)
+                              in enumerate(packets))
+            return [workout.info
+                    for workout in store.by_user('user', 0, len(packets))]
+
+
+def _timeseries(packets: list[Package]) -> list[InfoMessage]:
+    """Пакет подаётся TIMESERIES_SAMPLES отсчётами."""
+    from timeseries import SECONDS_IN_HOUR, LiveWorkout
+
+    infos = []
+    for workout_type, data in packets:
+        cls = get_workout_type(workout_type).cls
+        values = dict(zip(inspect.signature(cls).parameters, data))
+        seconds = values.pop('duration') * SECONDS_IN_HOUR
+        totals = [values.pop(name) for name in cls.SAMPLE_FIELDS]
+        workout = LiveWorkout(workout_type, **values)
+        shares = [total // TIMESERIES_SAMPLES for total in totals]
+        rest = [total - share * (TIMESERIES_SAMPLES - 1)
+                for total, share in zip(totals, shares)]
+        for _ in range(TIMESERIES_SAMPLES - 1):
+            workout.update(seconds / TIMESERIES_SAMPLES, *shares)
+        workout.update(seconds / TIMESERIES_SAMPLES, *rest)
+        infos.append(workout.info())
+    return infos
+
+
+ENGINES: dict[str, Engine] = {
+    'show_training_info': Engine(_show_training_info),
+    'kernel': Engine(_kernel),
+    'metric_cache': Engine(_metric_cache),
+    'batch_python': Engine(_batch(caloriescounter._calculate_batch_python)),
+    'batch_numpy': Engine(_batch(_numpy_batch), available=_has_numpy),
+    'format_messages': Engine(_format_messages),
+    'format_batch': Engine(_format_batch),
+    'streaming': Engine(_streaming),
+    'pipeline': Engine(_pipeline),
+    'result_cache_memory': Engine(_result_cache(None)),
+    'result_cache_sqlite': Engine(_result_cache('cache.db')),
+    'parallel': Engine(_parallel),
+    'packetfile': Engine(_packetfile, reference_input=_packetfile_input),
+    'server_binary': Engine(_server(binary=True)),
+    'server_text': Engine(_server(binary=False)),
+    'coordinator': Engine(_coordinator),
+    'columnar': Engine(_columnar),
+    'storage': Engine(_storage),
+    'timeseries': Engine(_timeseries, tolerance=TIMESERIES_TOLERANCE),
+}
+
+
+def _close(expected: float, actual: float, tolerance: float) -> bool:
+    if not tolerance:
+        return expected == actual
+    return math.isclose(expected, actual, rel_tol=tolerance,
+                        abs_tol=tolerance)
+
+
+def _message_matches(expected: InfoMessage,
+                     actual: str,
+                     tolerance: float) -> bool:
+    """Совпадает ли текст с эталоном с учётом допуска движка."""
+    if not tolerance:
+        return actual == expected.get_message()
+    bounds = [(value * (1 - tolerance) - tolerance,
+               value * (1 + tolerance) + tolerance)
+              for value in (expected.duration, expected.distance,
+                            expected.speed, expected.calories)]
+    candidates = {InfoMessage(expected.training_type,
+                              *(pair[pick >> i & 1]
+                                for i, pair in enumerate(bounds)))
+                  .get_message()
+                  for pick in range(16)}
+    return actual == expected.get_message() or actual in candidates
+
+
+def check(name: str,
+          expected: list[InfoMessage],
+          actual: list,
+          tolerance: float = 0.0) -> list[Mismatch]:
+    """Сверить результат движка name с эталоном expected."""
+    if len(actual) != len(expected):
+        return [Mismatch(name, -1, 'count', len(expected), len(actual))]
+    mismatches = []
+    for index, (reference_info, info) in enumerate(zip(expected, actual)):
+        if isinstance(info, str):
+            message = info
+        else:
+            message = info.get_message()
+            for field in FIELDS:
+                value = getattr(info, field)
+                reference_value = getattr(reference_info, field)
+                if field == 'training_type':
+                    same = value == reference_value
+                else:
+                    same = _close(reference_value, value, tolerance)
+                if not same:
+                    mismatches.append(Mismatch(name, index, field,
+                                               reference_value, value))
+        if not _message_matches(reference_info, message, tolerance):
+            mismatches.append(Mismatch(name, index, 'message',
+                                       reference_info.get_message(),
+                                       message))
+        if len(mismatches) >= MAX_MISMATCHES:
+            break
+    return mismatches[:MAX_MISMATCHES]
+
+
+def _timed(engine: Engine,
+           packets: list[Package],
+           min_seconds: float) -> tuple[list, dict]:
+    rounds = 0
+    elapsed = 0
+    result: list = []
+    while not rounds or elapsed < min_seconds * 1e9:
+        start = perf_counter_ns()
+        result = engine.run(packets)
+        elapsed += perf_counter_ns() - start
+        rounds += 1
+    return result, {
+        'packets': len(packets),
+        'rounds': rounds,
+        'seconds': elapsed / 1e9,
+        'throughput': (rounds * len(packets) / (elapsed / 1e9)
+                       if elapsed else 0.0),
+    }
+
+
+def run_harness(size: int = DEFAULT_SIZE,
+                seed: int = 0,
+                names: list[str] | None = None,
+                min_seconds: float = MIN_SECONDS) -> dict:
+    """Прогнать движки names на size пакетах и вернуть отчёт для JSON.
+
+    В отчёте results - пропускная способность в формате benchmark,
+    mismatches - расхождения с эталоном, skipped - движки, которые
+    здесь недоступны.
+    """
+    packets = generate_packets(size, seed)
+    expected = reference(packets)
+    results: dict[str, dict[str, dict]] = {}
+    mismatches: list[Mismatch] = []
+    skipped = []
+    for name in names or ENGINES:
+        engine = ENGINES[name]
+        if engine.available is not None and not engine.available():
+            skipped.append(name)
+            continue
+        actual, measured = _timed(engine, packets, min_seconds)
+        results[name] = {str(size): measured}
+        engine_expected = expected
+        if engine.reference_input is not None:
+            engine_expected = reference(engine.reference_input(packets))
+        mismatches += check(name, engine_expected, actual, engine.tolerance)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'seed': seed,
+        'size': size,
+        'results': results,
+        'mismatches': [mismatch._asdict() for mismatch in mismatches],
+        'skipped': skipped,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Сверка движков расчёта с эталонными классами и '
+                    'замер их скорости.')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE,
+                        help='сколько пакетов сгенерировать')
+    parser.add_argument('--seed', type=int,
+                        help='зерно случайности; по умолчанию случайное')
+    parser.add_argument('--only', nargs='+', choices=list(ENGINES),
+                        help='проверить только эти движки')
+    parser.add_argument('--min-seconds', type=float, default=MIN_SECONDS,
+                        help='повторять прогон движка, пока он не займёт '
+                             'столько секунд')
+    parser.add_argument('--output', help='куда записать JSON-отчёт')
+    parser.add_argument('--baseline', help='JSON-отчёт для сравнения '
+                                           'скорости')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='допустимое падение пропускной способности')
+    return parser
+
+
+def run(argv: list[str] | None = None) -> int:
+    """Точка входа командной строки; возвращает код выхода.
+
+    Код 1 - есть расхождения с эталоном или регрессии скорости.
+    """
+    args = build_parser().parse_args(argv)
+    seed = random.randrange(2 ** 32) if args.seed is None else args.seed
+    report = run_harness(args.size, seed, args.only, args.min_seconds)
+    text = json.dumps(report, indent=2, ensure_ascii=False, default=repr)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    failed = False
+    for mismatch in report['mismatches']:
+        failed = True
+        print(f'Расхождение {mismatch["engine"]} '
+              f'[пакет {mismatch["index"]}, {mismatch["field"]}]: '
+              f'ожидалось {mismatch["expected"]!r}, получено '
+              f'{mismatch["actual"]!r} (--seed {seed})', file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for line in regressions:
+            failed = True
+            print(f'Регрессия: {line}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(run())
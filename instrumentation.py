@@ -0,0 +1,189 @@
+"""Счётчики, таймеры и профилирование горячего пути расчёта.
+
+Recorder собирает по стадиям (parse, dispatch, calories, format,
+write) число пакетов и время в наносекундах по монотонным часам, а
+по виду тренировки - гистограммы времени на пакет. В режиме выборки
+(sample_every > 1) время замеряется только на каждом N-м пакете,
+счётчики же учитывают все пакеты.
+
+Recorder передаётся в функции расчёта явно; без него они идут по
+прежнему пути, и цена выключенных замеров - одна проверка на чанк.
+Итоги выгружаются в JSON или текстовый формат Prometheus.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from time import monotonic_ns
+from typing import Iterator
+
+# Верхние границы корзин гистограмм, наносекунды.
+BUCKETS: tuple[int, ...] = (
+    250, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000,
+    250_000, 1_000_000,
+)
+METRIC_PREFIX: str = 'fitness_tracker'
+
+clock = monotonic_ns
+
+
+class Histogram:
+    """Гистограмма времени с фиксированными корзинами BUCKETS."""
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, ns: int) -> None:
+        self.counts[bisect_left(BUCKETS, ns)] += 1
+        self.total += ns
+        self.count += 1
+
+    def as_dict(self) -> dict:
+        return {'buckets': list(BUCKETS), 'counts': list(self.counts),
+                'sum_ns': self.total, 'count': self.count}
+
+
+class Recorder:
+    """Накопитель замеров одного прогона."""
+
+    def __init__(self, sample_every: int = 1) -> None:
+        if sample_every < 1:
+            raise ValueError('Шаг выборки должен быть положительным.')
+        self.sample_every = sample_every
+        self.calls: Counter = Counter()
+        self.sampled: Counter = Counter()
+        self.nanoseconds: Counter = Counter()
+        self.histograms: dict[tuple[str, str], Histogram] = {}
+        self._countdown = 1
+
+    def should_sample(self) -> bool:
+        """Замерять ли время очередного пакета."""
+        self._countdown -= 1
+        if self._countdown:
+            return False
+        self._countdown = self.sample_every
+        return True
+
+    def add(self, stage: str, ns: int, count: int = 1) -> None:
+        """Учесть count замеренных пакетов стадии за ns наносекунд."""
+        self.calls[stage] += count
+        self.sampled[stage] += count
+        self.nanoseconds[stage] += ns
+
+    def count(self, stage: str, count: int = 1) -> None:
+        """Учесть пакеты стадии без замера времени."""
+        self.calls[stage] += count
+
+    def observe(self, stage: str, training_type: str, ns: int) -> None:
+        """Замер одного пакета: в итоги стадии и в гистограмму вида."""
+        self.add(stage, ns)
+        key = (stage, training_type)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(ns)
+
+    @contextmanager
+    def stage(self, stage: str, count: int = 1) -> Iterator[None]:
+        """Замерить блок кода как count пакетов стадии."""
+        start = clock()
+        try:
+            yield
+        finally:
+            self.add(stage, clock() - start, count)
+
+    def as_dict(self) -> dict:
+        return {
+            'sample_every': self.sample_every,
+            'stages': {stage: {'calls': self.calls[stage],
+                               'sampled': self.sampled[stage],
+                               'ns': self.nanoseconds[stage]}
+                       for stage in self.calls},
+            'histograms': [{'stage': stage, 'type': training_type,
+                            **histogram.as_dict()}
+                           for (stage, training_type), histogram
+                           in self.histograms.items()],
+        }
+
+    def prometheus(self) -> str:
+        """Итоги в текстовом формате Prometheus.
+
+        stage_seconds_total - время только замеренных пакетов, поэтому
+        время на пакет - это seconds_total / sampled_total, а не
+        / calls_total.
+        """
+        name = METRIC_PREFIX
+        lines = [f'# TYPE {name}_stage_calls_total counter']
+        lines += [f'{name}_stage_calls_total{{stage="{stage}"}} {count}'
+                  for stage, count in self.calls.items()]
+        lines.append(f'# TYPE {name}_stage_sampled_total counter')
+        lines += [f'{name}_stage_sampled_total{{stage="{stage}"}} '
+                  f'{self.sampled[stage]}'
+                  for stage in self.calls]
+        lines.append(f'# TYPE {name}_stage_seconds_total counter')
+        lines += [f'{name}_stage_seconds_total{{stage="{stage}"}} '
+                  f'{self.nanoseconds[stage] / 1e9!r}'
+                  for stage in self.calls]
+        lines.append(f'# TYPE {name}_packet_seconds histogram')
+        for (stage, training_type), histogram in self.histograms.items():
+            labels = f'stage="{stage}",type="{training_type}"'
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, None), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound is None else repr(bound / 1e9)
+                lines.append(f'{name}_packet_seconds_bucket'
+                             f'{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{name}_packet_seconds_sum{{{labels}}} '
+                         f'{histogram.total / 1e9!r}')
+            lines.append(f'{name}_packet_seconds_count{{{labels}}} '
+                         f'{histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """Атомарно записать итоги: *.json - JSON, иначе Prometheus."""
+        if path.endswith('.json'):
+            text = json.dumps(self.as_dict(), ensure_ascii=False)
+        else:
+            text = self.prometheus()
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(temporary, path)
+
+
+@contextmanager
+def profiling(profile_path: str | None = None,
+              tracemalloc_top: int = 0) -> Iterator[None]:
+    """Профилировать блок кода через cProfile и/или tracemalloc.
+
+    Статистика cProfile сохраняется в profile_path (для pstats или
+    snakeviz), tracemalloc_top самых затратных по памяти строк
+    выводятся в stderr.
+    """
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+    if tracemalloc_top:
+        import tracemalloc
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        if tracemalloc_top:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            for stat in snapshot.statistics('lineno')[:tracemalloc_top]:
+                print(stat, file=sys.stderr)
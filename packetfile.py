@@ -0,0 +1,184 @@
+"""Двоичный формат файла пакетов и чтение через mmap.
+
+Файл состоит из заголовка и колонок фиксированной ширины::
+
+    заголовок  <4sHHQ: магия b'FTPK', версия, резерв, число пакетов n
+    type_code  uint8[n]    код вида тренировки из TYPE_CODES,
+                           дополнен нулями до кратного 4 размера
+    action     int32[n]
+    duration   float32[n]
+    weight     float32[n]
+    extra1     int32[n]    height (WLK) или length_pool (SWM)
+    extra2     int32[n]    count_pool (SWM)
+
+Неиспользуемые поля пакета записываются нулями. Все числа в порядке
+little-endian. Колонки лежат подряд, поэтому читатель отдаёт их как
+типизированные memoryview поверх mmap без разбора и копирования
+записей. Значения duration и weight хранятся во float32 и при чтении
+округлены до этой точности.
+"""
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, Sequence
+
+from caloriescounter import (BatchResult, calculate_batch, get_workout_type,
+                             get_workout_type_by_id)
+
+MAGIC: bytes = b'FTPK'
+VERSION: int = 1
+HEADER = struct.Struct('<4sHHQ')
+MAX_TYPE_ID: int = 255
+
+_COLUMNS: tuple[tuple[str, str], ...] = (
+    ('action', 'i'),
+    ('duration', 'f'),
+    ('weight', 'f'),
+    ('extra1', 'i'),
+    ('extra2', 'i'),
+)
+_KINDS: dict[str, str] = {'i': 'целое int32', 'f': 'число float32'}
+
+
+def _padded(size: int) -> int:
+    return (size + 3) & ~3
+
+
+def _row(workout_type: str, data: list) -> tuple[int, list]:
+    """Числовой код вида и значения пакета, дополненные нулями."""
+    workout = get_workout_type(workout_type)
+    if workout.arity > len(_COLUMNS):
+        raise ValueError(f'{workout_type}: в двоичном формате не больше '
+                         f'{len(_COLUMNS)} значений пакета.')
+    if len(data) != workout.arity:
+        raise ValueError(f'Для {workout_type} нужно {workout.arity} '
+                         f'значений, получено {len(data)}.')
+    if not 0 <= workout.type_id <= MAX_TYPE_ID:
+        raise ValueError(f'{workout_type}: числовой код {workout.type_id} '
+                         f'больше {MAX_TYPE_ID} не помещается в двоичный '
+                         f'формат.')
+    return workout.type_id, list(data) + [0] * (len(_COLUMNS)
+                                                - workout.arity)
+
+
+def write_packets(path: str, packages: Iterable[tuple[str, list]]) -> int:
+    """Записать пакеты (workout_type, data) в двоичный файл.
+
+    Возвращает число записанных пакетов.
+    """
+    type_code = array('B')
+    columns = {name: array(typecode) for name, typecode in _COLUMNS}
+    for workout_type, data in packages:
+        type_id, row = _row(workout_type, data)
+        type_code.append(type_id)
+        for (name, typecode), value in zip(_COLUMNS, row):
+            try:
+                columns[name].append(value)
+            except (TypeError, OverflowError):
+                raise ValueError(f'{workout_type}: значение {value!r} '
+                                 f'колонки {name} должно быть '
+                                 f'{_KINDS[typecode]}.') from None
+    count = len(type_code)
+    if sys.byteorder != 'little':
+        for column in columns.values():
+            column.byteswap()
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, count))
+        file.write(type_code.tobytes())
+        file.write(bytes(_padded(count) - count))
+        for column in columns.values():
+            file.write(column.tobytes())
+    return count
+
+
+class PacketFile:
+    """Двоичный файл пакетов, открытый через mmap.
+
+    Колонки доступны как атрибуты type_code, action, duration, weight,
+    height, length_pool и count_pool; height и length_pool - это одна и
+    та же колонка extra1, которую разные виды тренировок трактуют
+    по-своему.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as file:
+            size = file.seek(0, 2)
+            if size < HEADER.size:
+                raise ValueError(f'{path}: файл слишком короткий.')
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f'{path}: неизвестный формат файла пакетов.')
+        expected = HEADER.size + _padded(count) + 4 * count * len(_COLUMNS)
+        if size < expected:
+            self._mmap.close()
+            raise ValueError(f'{path}: файл обрезан.')
+        self._count = count
+        self._buffer = memoryview(self._mmap)
+        offset = HEADER.size
+        self.type_code = self._buffer[offset:offset + count]
+        offset += _padded(count)
+        for name, typecode in _COLUMNS:
+            view = self._buffer[offset:offset + 4 * count]
+            if sys.byteorder == 'little':
+                view = view.cast(typecode)
+            else:
+                view = array(typecode, view.tobytes())
+                view.byteswap()
+            setattr(self, name, view)
+            offset += 4 * count
+        self.height = self.length_pool = self.extra1
+        self.count_pool = self.extra2
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[tuple[str, list]]:
+        """Пакеты в виде (workout_type, data) для read_package."""
+        workouts = {}
+        for i, type_id in enumerate(self.type_code):
+            workout = workouts.get(type_id)
+            if workout is None:
+                workout = workouts[type_id] = get_workout_type_by_id(type_id)
+            row = [self.action[i], self.duration[i], self.weight[i],
+                   self.extra1[i], self.extra2[i]]
+            yield workout.code, row[:workout.arity]
+
+    def calculate(self) -> BatchResult:
+        """Посчитать все пакеты файла пакетным калькулятором."""
+        return calculate_batch(self.type_code, self.action, self.duration,
+                               self.weight, self.height, self.length_pool,
+                               self.count_pool)
+
+    def check(self) -> Sequence[int]:
+        """Коды причин отказа (индексы validation.REASONS) по строкам.
+
+        Колонки проверяются целиком через validation.check_columns; 0 -
+        строка допустима.
+        """
+        from validation import check_columns
+
+        return check_columns(self.type_code, self.action, self.duration,
+                             self.weight, self.height, self.length_pool,
+                             self.count_pool)
+
+    def close(self) -> None:
+        if self._mmap.closed:
+            return
+        for name in ('type_code', 'height', 'length_pool', 'count_pool',
+                     *(name for name, _ in _COLUMNS)):
+            view = getattr(self, name)
+            if isinstance(view, memoryview):
+                view.release()
+        self._buffer.release()
+        self._mmap.close()
+
+    def __enter__(self) -> PacketFile:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
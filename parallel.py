@@ -0,0 +1,110 @@
+"""Параллельный расчёт пакетов в пуле процессов.
+
+Родительский процесс читает сырые строки входа и раздаёт их шардами
+воркерам. Воркер сам разбирает строки, строит тренировки и возвращает
+упакованный результат: таблицу названий тренировок, индексы в ней и
+плотный массив чисел. Объекты Training между процессами не передаются.
+"""
+from __future__ import annotations
+
+import os
+from array import array
+from concurrent.futures import (FIRST_COMPLETED, Future,
+                                ProcessPoolExecutor, wait)
+from typing import Iterable, Iterator, NamedTuple
+
+from caloriescounter import InfoMessage
+from streaming import (DEFAULT_CHUNK_SIZE, iter_chunks, iter_packets,
+                       score_packets)
+
+# Кэш результатов воркера; создаётся в _init_worker.
+_cache = None
+
+
+class PackedResults(NamedTuple):
+    """Результаты шарда в упакованном виде."""
+    training_types: tuple[str, ...]
+    type_index: bytes
+    values: bytes
+
+
+def pack_results(infos: Iterable[InfoMessage]) -> PackedResults:
+    """Упаковать InfoMessage в таблицу типов и массив float64."""
+    names: dict[str, int] = {}
+    type_index = array('H')
+    values = array('d')
+    for info in infos:
+        type_index.append(names.setdefault(info.training_type, len(names)))
+        values.extend((info.duration, info.distance,
+                       info.speed, info.calories))
+    return PackedResults(tuple(names), type_index.tobytes(), values.tobytes())
+
+
+def unpack_results(packed: PackedResults) -> list[InfoMessage]:
+    """Восстановить список InfoMessage из упакованного шарда."""
+    type_index = array('H')
+    type_index.frombytes(packed.type_index)
+    values = array('d')
+    values.frombytes(packed.values)
+    names = packed.training_types
+    return [InfoMessage(names[index], *values[i * 4:i * 4 + 4])
+            for i, index in enumerate(type_index)]
+
+
+def _init_worker(cache_options: dict | None) -> None:
+    global _cache
+    if cache_options is not None:
+        from resultcache import make_cache
+        _cache = make_cache(**cache_options)
+
+
+def score_lines(lines: list[str]) -> PackedResults:
+    """Посчитать шард сырых строк; выполняется в воркере."""
+    return pack_results(score_packets(iter_packets(lines), cache=_cache))
+
+
+def score_parallel(stream: Iterable[str],
+                   workers: int | None = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   ordered: bool = True,
+                   cache_options: dict | None = None
+                   ) -> Iterator[list[InfoMessage]]:
+    """Посчитать поток строк в пуле процессов и отдавать чанки.
+
+    Одновременно в работе или в ожидании выдачи не больше двух шардов
+    на воркер. При ordered=True чанки отдаются в порядке входа, иначе -
+    по мере готовности. С cache_options каждый воркер заводит кэш
+    результатов через make_cache; с общим файлом SQLite попадания
+    видны всем воркерам.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+    shards = iter_chunks(stream, chunk_size)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_options,)) as executor:
+        pending: dict[Future, int] = {}
+        ready: dict[int, PackedResults] = {}
+        next_index = 0
+        submitted = 0
+        exhausted = False
+        while True:
+            while (not exhausted
+                   and len(pending) + len(ready) < max_pending):
+                shard = next(shards, None)
+                if shard is None:
+                    exhausted = True
+                    break
+                pending[executor.submit(score_lines, shard)] = submitted
+                submitted += 1
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                if ordered:
+                    ready[index] = future.result()
+                else:
+                    yield unpack_results(future.result())
+            while next_index in ready:
+                yield unpack_results(ready.pop(next_index))
+                next_index += 1
@@ -0,0 +1,267 @@
+"""Конвейерный расчёт: чтение, расчёт и вывод одновременно.
+
+Обычный потоковый расчёт по очереди ждёт чтения, считает и ждёт
+вывода, и процессор простаивает, пока идёт ввод-вывод. Здесь три
+стадии связаны ограниченными очередями глубиной queue_depth пачек:
+
+    read   поток: чтение строк, разбор и проверка пакетов пачками
+           по batch_size
+    score  вызывающий поток: расчёт пачки через score_packets
+    write  поток: форматирование и вывод результатов
+
+Расчёт остаётся в вызывающем потоке, поэтому кэш результатов и
+замеры стадий работают как в streaming. Из-за GIL разбор и расчёт
+не идут параллельно - выигрыш даёт перекрытие ожидания ввода и
+вывода с расчётом.
+
+По каждой стадии считается время работы и время ожидания входной и
+выходной очереди; доля работы от общего времени показывает, какая
+стадия - узкое место.
+"""
+from __future__ import annotations
+
+import queue
+import threading
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Iterable, TextIO
+
+from caloriescounter import format_messages
+from instrumentation import Recorder, clock
+from streaming import (DEFAULT_CHUNK_SIZE, DEFAULT_QUEUE_DEPTH,
+                       iter_chunks, iter_packets, score_packets)
+
+if TYPE_CHECKING:
+    from resultcache import ResultCache
+    from validation import Validator
+
+# Как часто стадия, ждущая очередь, проверяет, не остановлен ли
+# конвейер, секунды.
+POLL_INTERVAL: float = 0.05
+STAGES: tuple[str, ...] = ('read', 'score', 'write')
+
+# Конец потока пачек.
+_END = object()
+
+
+class _Stopped(Exception):
+    """Конвейер остановлен из-за ошибки в другой стадии."""
+
+
+class StageStats:
+    """Счётчики одной стадии конвейера, наносекунды."""
+    __slots__ = ('name', 'items', 'batches', 'busy_ns', 'input_wait_ns',
+                 'output_wait_ns')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy_ns = 0
+        self.input_wait_ns = 0
+        self.output_wait_ns = 0
+
+    def add(self, ns: int, items: int) -> None:
+        """Учесть обработанную пачку из items элементов."""
+        self.busy_ns += ns
+        self.items += items
+        self.batches += 1
+
+    def as_dict(self, wall_ns: int) -> dict:
+        return {'items': self.items, 'batches': self.batches,
+                'busy_ns': self.busy_ns,
+                'input_wait_ns': self.input_wait_ns,
+                'output_wait_ns': self.output_wait_ns,
+                'utilization': self.busy_ns / wall_ns if wall_ns else 0.0}
+
+
+class PipelineStats:
+    """Итоги прогона конвейера."""
+
+    def __init__(self) -> None:
+        self.stages = {name: StageStats(name) for name in STAGES}
+        self.wall_ns = 0
+
+    def utilization(self, stage: str) -> float:
+        """Доля времени прогона, которую стадия была занята работой."""
+        if not self.wall_ns:
+            return 0.0
+        return self.stages[stage].busy_ns / self.wall_ns
+
+    @property
+    def bottleneck(self) -> str:
+        """Самая загруженная стадия."""
+        return max(STAGES, key=lambda name: self.stages[name].busy_ns)
+
+    def as_dict(self) -> dict:
+        return {'wall_ns': self.wall_ns, 'bottleneck': self.bottleneck,
+                'stages': {name: stats.as_dict(self.wall_ns)
+                           for name, stats in self.stages.items()}}
+
+    def format(self) -> str:
+        """Итоги в виде текста для stderr."""
+        wall = self.wall_ns or 1
+        lines = [f'Конвейер: {self.wall_ns / 1e9:.3f} с, узкое место - '
+                 f'{self.bottleneck}']
+        for name, stats in self.stages.items():
+            lines.append(
+                f'  {name:<5} пакетов {stats.items}, пачек '
+                f'{stats.batches}, занята {stats.busy_ns / wall:.0%}, '
+                f'ждала вход {stats.input_wait_ns / wall:.0%}, '
+                f'ждала выход {stats.output_wait_ns / wall:.0%}')
+        return '\n'.join(lines) + '\n'
+
+
+def _get(source: queue.Queue,
+         stop: threading.Event,
+         stats: StageStats):
+    start = clock()
+    while True:
+        try:
+            item = source.get(timeout=POLL_INTERVAL)
+            break
+        except queue.Empty:
+            if stop.is_set():
+                raise _Stopped
+    stats.input_wait_ns += clock() - start
+    return item
+
+
+def _put(target: queue.Queue,
+         item,
+         stop: threading.Event,
+         stats: StageStats) -> None:
+    start = clock()
+    while True:
+        try:
+            target.put(item, timeout=POLL_INTERVAL)
+            break
+        except queue.Full:
+            if stop.is_set():
+                raise _Stopped
+    stats.output_wait_ns += clock() - start
+
+
+def _read(stream: Iterable[str],
+          batch_size: int,
+          validator: Validator | None,
+          target: queue.Queue,
+          stop: threading.Event,
+          stats: StageStats) -> None:
+    if validator is None:
+        packets = iter_packets(stream)
+    else:
+        packets = validator.parse(stream)
+    batches = iter_chunks(packets, batch_size)
+    while True:
+        start = clock()
+        batch = next(batches, None)
+        if batch is None:
+            break
+        if validator is not None:
+            batch = validator.filter(batch)
+        stats.add(clock() - start, len(batch))
+        _put(target, batch, stop, stats)
+    _put(target, _END, stop, stats)
+
+
+def _score(source: queue.Queue,
+           target: queue.Queue,
+           unknown: Counter | None,
+           cache: ResultCache | None,
+           recorder: Recorder | None,
+           stop: threading.Event,
+           stats: StageStats) -> None:
+    while True:
+        batch = _get(source, stop, stats)
+        if batch is _END:
+            break
+        start = clock()
+        infos = score_packets(batch, unknown, cache, recorder)
+        stats.add(clock() - start, len(batch))
+        _put(target, infos, stop, stats)
+    _put(target, _END, stop, stats)
+
+
+def _write(output: TextIO,
+           source: queue.Queue,
+           stop: threading.Event,
+           stats: StageStats) -> None:
+    while True:
+        infos = _get(source, stop, stats)
+        if infos is _END:
+            return
+        start = clock()
+        output.write(format_messages(infos))
+        stats.add(clock() - start, len(infos))
+
+
+def _guard(target: Callable,
+           errors: list[BaseException],
+           stop: threading.Event) -> Callable[..., None]:
+    """Обёртка стадии-потока: ошибка останавливает весь конвейер."""
+    def stage(*args) -> None:
+        try:
+            target(*args)
+        except _Stopped:
+            pass
+        except BaseException as exc:
+            errors.append(exc)
+            stop.set()
+    return stage
+
+
+def run_pipeline(stream: Iterable[str],
+                 output: TextIO,
+                 batch_size: int = DEFAULT_CHUNK_SIZE,
+                 queue_depth: int = DEFAULT_QUEUE_DEPTH,
+                 unknown: Counter | None = None,
+                 cache: ResultCache | None = None,
+                 recorder: Recorder | None = None,
+                 validator: Validator | None = None) -> PipelineStats:
+    """Посчитать пакеты из stream и вывести результаты в output.
+
+    Результаты выводятся в порядке входа. unknown, cache, recorder и
+    validator - как у streaming.score_stream; recorder получает стадии
+    расчёта, а после прогона - parse и write (вместе с format) из
+    итогов конвейера. Ошибка любой стадии останавливает конвейер и
+    пробрасывается вызывающему.
+    """
+    if batch_size < 1:
+        raise ValueError('Размер пачки должен быть положительным.')
+    if queue_depth < 1:
+        raise ValueError('Глубина очереди должна быть положительной.')
+    stats = PipelineStats()
+    read, score, write = (stats.stages[name] for name in STAGES)
+    parsed: queue.Queue = queue.Queue(queue_depth)
+    scored: queue.Queue = queue.Queue(queue_depth)
+    stop = threading.Event()
+    errors: list[BaseException] = []
+    threads = [
+        threading.Thread(target=_guard(_read, errors, stop),
+                         args=(stream, batch_size, validator, parsed, stop,
+                               read),
+                         name='pipeline-read', daemon=True),
+        threading.Thread(target=_guard(_write, errors, stop),
+                         args=(output, scored, stop, write),
+                         name='pipeline-write', daemon=True),
+    ]
+    started = clock()
+    for thread in threads:
+        thread.start()
+    try:
+        _score(parsed, scored, unknown, cache, recorder, stop, score)
+    except _Stopped:
+        pass
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        stats.wall_ns = clock() - started
+    if errors:
+        raise errors[0]
+    if recorder is not None:
+        recorder.add('parse', read.busy_ns, read.items)
+        recorder.add('write', write.busy_ns, write.items)
+    return stats
@@ -0,0 +1,243 @@
+"""Кэш результатов расчёта по содержимому пакета.
+
+Повторно присланные пакеты (ретраи, дубли загрузок) дают тот же
+результат, поэтому его можно не пересчитывать. Хранилище - LRU в
+памяти процесса или общий для нескольких процессов файл SQLite; в
+обоих есть ограничение по числу записей и по времени жизни. В памяти
+ключ - сам кортеж из вида тренировки и значений пакета, а результат
+хранится готовым InfoMessage; в SQLite ключ - хэш packet_key, а
+результат - байты.
+
+Попадание в памяти дешевле пересчёта, попадание в SQLite - нет (см.
+замеры result_cache_* в benchmark.py): файл нужен, чтобы процессы
+делили результаты дорогих пакетов, а не ради скорости одного процесса.
+"""
+from __future__ import annotations
+
+import sqlite3
+import struct
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import NamedTuple
+
+from caloriescounter import InfoMessage, read_package
+
+_VALUES = struct.Struct('<4d')
+# Записи SQLite-хранилища вытесняются пачкой раз в столько вставок.
+EVICT_EVERY: int = 256
+# Время использования попавших записей пишется пачкой раз в столько
+# попаданий.
+USED_FLUSH_EVERY: int = 256
+
+
+class CacheStats(NamedTuple):
+    """Счётчики кэша результатов."""
+    hits: int
+    misses: int
+    evictions: int
+
+
+def packet_key(workout_type: str, data: list) -> bytes:
+    """Ключ пакета: хэш вида тренировки и repr значений."""
+    content = '\x1f'.join([workout_type, *map(repr, data)])
+    return blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+
+def _encode(info: InfoMessage) -> bytes:
+    return _VALUES.pack(info.duration, info.distance, info.speed,
+                        info.calories) + info.training_type.encode('utf-8')
+
+
+def _decode(value: bytes) -> InfoMessage:
+    return InfoMessage(value[_VALUES.size:].decode('utf-8'),
+                       *_VALUES.unpack_from(value))
+
+
+class MemoryBackend:
+    """LRU-хранилище в памяти процесса.
+
+    max_size - наибольшее число записей, ttl - время жизни записи в
+    секундах (None - без ограничения). Равные значения (1 и 1.0) дают
+    один ключ.
+    """
+
+    def __init__(self,
+                 max_size: int = 100_000,
+                 ttl: float | None = None) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._items: OrderedDict[tuple, tuple[InfoMessage, float]] = (
+            OrderedDict())
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @staticmethod
+    def key(workout_type: str, data: list) -> tuple:
+        return (workout_type, *data)
+
+    def get(self, key: tuple) -> InfoMessage | None:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        value, created = item
+        if self.ttl is not None and time.monotonic() - created > self.ttl:
+            del self._items[key]
+            self.evictions += 1
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: tuple, value: InfoMessage) -> None:
+        self._items[key] = (value, time.monotonic())
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def close(self) -> None:
+        self._items.clear()
+
+
+class SQLiteBackend:
+    """Хранилище в файле SQLite, общее для нескольких процессов.
+
+    Вытеснение по LRU приблизительное: время последнего использования
+    пишется одной транзакцией раз в USED_FLUSH_EVERY попаданий (и перед
+    вытеснением), а лишние записи удаляются пачкой раз в EVICT_EVERY
+    вставок.
+    """
+
+    def __init__(self,
+                 path: str,
+                 max_size: int = 1_000_000,
+                 ttl: float | None = None) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._inserts = 0
+        self._used: set[bytes] = set()
+        self._connection = sqlite3.connect(path, timeout=30,
+                                           isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key BLOB PRIMARY KEY, value BLOB NOT NULL, '
+            'created REAL NOT NULL, used REAL NOT NULL)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+
+    def __len__(self) -> int:
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM results').fetchone()[0]
+
+    key = staticmethod(packet_key)
+
+    def get(self, key: bytes) -> InfoMessage | None:
+        row = self._connection.execute(
+            'SELECT value, created FROM results WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        if self.ttl is not None and time.time() - created > self.ttl:
+            self._connection.execute('DELETE FROM results WHERE key = ?',
+                                     (key,))
+            self.evictions += 1
+            return None
+        used = self._used
+        used.add(key)
+        if len(used) >= USED_FLUSH_EVERY:
+            self.flush_used()
+        return _decode(value)
+
+    def flush_used(self) -> None:
+        """Записать время использования накопленных попаданий."""
+        if not self._used:
+            return
+        now = time.time()
+        connection = self._connection
+        connection.execute('BEGIN')
+        try:
+            connection.executemany(
+                'UPDATE results SET used = ? WHERE key = ?',
+                [(now, key) for key in self._used])
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._used.clear()
+
+    def set(self, key: bytes, value: InfoMessage) -> None:
+        now = time.time()
+        self._connection.execute(
+            'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+            (key, _encode(value), now, now))
+        self._inserts += 1
+        if self._inserts % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        """Удалить устаревшие записи и записи сверх max_size."""
+        self.flush_used()
+        connection = self._connection
+        if self.ttl is not None:
+            self.evictions += connection.execute(
+                'DELETE FROM results WHERE created < ?',
+                (time.time() - self.ttl,)).rowcount
+        excess = len(self) - self.max_size
+        if excess > 0:
+            self.evictions += connection.execute(
+                'DELETE FROM results WHERE key IN ('
+                'SELECT key FROM results ORDER BY used LIMIT ?)',
+                (excess,)).rowcount
+
+    def close(self) -> None:
+        self.flush_used()
+        self._connection.close()
+
+
+class ResultCache:
+    """Кэш перед read_package + show_training_info."""
+
+    def __init__(self, backend: MemoryBackend | SQLiteBackend) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def score(self, workout_type: str, data: list) -> InfoMessage:
+        """Результат пакета из кэша или посчитанный заново."""
+        backend = self.backend
+        key = backend.key(workout_type, data)
+        info = backend.get(key)
+        if info is not None:
+            self.hits += 1
+            return info
+        self.misses += 1
+        info = read_package(workout_type, data).show_training_info()
+        backend.set(key, info)
+        return info
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, self.backend.evictions)
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+def make_cache(size: int | None = None,
+               ttl: float | None = None,
+               path: str | None = None) -> ResultCache:
+    """Создать кэш: в памяти или, если задан path, в файле SQLite."""
+    backend: MemoryBackend | SQLiteBackend
+    if path is not None:
+        backend = SQLiteBackend(path, ttl=ttl)
+    else:
+        backend = MemoryBackend(ttl=ttl)
+    if size is not None:
+        backend.max_size = size
+    return ResultCache(backend)
@@ -0,0 +1,386 @@
+"""Asyncio-сервис для расчёта пакетов по мере их поступления.
+
+Протокол кадровый: каждый кадр - 4 байта длины (big-endian) и тело.
+Тело запроса - байт вида ответа (``T`` - текст, ``B`` - двоичный
+результат) и строка пакета в формате streaming.parse_line. Тело
+ответа начинается с байта вида:
+
+* ``T`` - текст InfoMessage.get_message() в UTF-8;
+* ``B`` - RESULT: код тренировки из TYPE_CODES и четыре float64
+  (длительность, дистанция, скорость, калории);
+* ``E`` - текст ошибки в UTF-8.
+
+Ответы в пределах соединения приходят в порядке запросов; клиент
+может отправлять запросы, не дожидаясь ответов. Пакеты всех
+соединений копятся в общей очереди и считаются пачками.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import signal
+import struct
+from typing import NamedTuple
+
+from caloriescounter import TYPE_CODES, InfoMessage, read_package
+from streaming import parse_line, score_packets
+
+LENGTH = struct.Struct('>I')
+RESULT = struct.Struct('<B4d')
+MAX_FRAME_SIZE: int = 64 * 1024
+
+REPLY_TEXT: bytes = b'T'
+REPLY_BINARY: bytes = b'B'
+REPLY_ERROR: bytes = b'E'
+
+_STOP = object()
+
+
+class BinaryResult(NamedTuple):
+    """Двоичный ответ сервиса."""
+    workout_type: str
+    duration: float
+    distance: float
+    speed: float
+    calories: float
+
+
+class ScoringError(Exception):
+    """Сервис вернул ошибку вместо результата."""
+
+
+def _frame(body: bytes) -> bytes:
+    return LENGTH.pack(len(body)) + body
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes | None:
+    try:
+        header = await reader.readexactly(LENGTH.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (size,) = LENGTH.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f'Кадр {size} байт больше {MAX_FRAME_SIZE}.')
+    return await reader.readexactly(size)
+
+
+def _parse_request(body: bytes) -> tuple[str, list]:
+    package = parse_line(body[1:].decode('utf-8'))
+    if package is None:
+        raise ValueError('Пустой пакет.')
+    return package
+
+
+def _error(exc: Exception) -> bytes:
+    return REPLY_ERROR + str(exc).encode('utf-8')
+
+
+def _reply(kind: bytes, workout_type: str, info: InfoMessage) -> bytes:
+    """Тело ответа; ошибка упаковки - ответ с ошибкой только для него."""
+    try:
+        if kind == REPLY_BINARY:
+            return REPLY_BINARY + RESULT.pack(
+                TYPE_CODES[workout_type], info.duration, info.distance,
+                info.speed, info.calories)
+        return REPLY_TEXT + info.get_message().encode('utf-8')
+    except Exception as exc:
+        return _error(exc)
+
+
+def score_request(body: bytes) -> bytes:
+    """Посчитать один запрос и вернуть тело ответа."""
+    try:
+        workout_type, data = _parse_request(body)
+        info = read_package(workout_type, data).show_training_info()
+    except Exception as exc:
+        return _error(exc)
+    return _reply(body[:1], workout_type, info)
+
+
+def score_requests(bodies: list[bytes]) -> list[bytes]:
+    """Посчитать пачку запросов одним вызовом score_packets.
+
+    Если какой-то запрос пачки не разбирается или не считается, пачка
+    считается по одному запросу, чтобы ошибку получил только он.
+    """
+    try:
+        packets = [_parse_request(body) for body in bodies]
+        infos = score_packets(packets)
+    except Exception:
+        return [score_request(body) for body in bodies]
+    return [_reply(body[:1], workout_type, info)
+            for body, (workout_type, _), info in zip(bodies, packets, infos)]
+
+
+async def _enqueue(replies: asyncio.Queue, item,
+                   sender: asyncio.Task) -> bool:
+    """Положить item в очередь ответов; False - отправитель остановился.
+
+    Если отправитель упал на записи, полная очередь больше не
+    освободится, поэтому ожидание места идёт наперегонки с ним.
+    """
+    if sender.done():
+        return False
+    if not replies.full():
+        replies.put_nowait(item)
+        return True
+    put = asyncio.ensure_future(replies.put(item))
+    try:
+        await asyncio.wait({put, sender},
+                           return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not put.done():
+            put.cancel()
+    return put.done() and not put.cancelled()
+
+
+class ScoringServer:
+    """Сервис расчёта пакетов с микро-пакетированием.
+
+    max_batch_size - сколько запросов считать за один проход,
+    max_latency - сколько секунд первый запрос пачки может ждать
+    остальные, max_connections - лимит одновременных соединений,
+    max_pending - сколько неотвеченных запросов соединения допускается,
+    прежде чем сервис перестанет читать из него.
+    """
+
+    def __init__(self,
+                 max_batch_size: int = 256,
+                 max_latency: float = 0.002,
+                 max_connections: int = 1024,
+                 max_pending: int = 1024
+                 ) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.max_connections = max_connections
+        self.max_pending = max_pending
+        self.batches = 0
+        self.requests = 0
+        self._queue: asyncio.Queue | None = None
+        self._batcher: asyncio.Task | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._handlers: set[asyncio.Task] = set()
+
+    async def start(self,
+                    host: str = '127.0.0.1',
+                    port: int = 0,
+                    path: str | None = None) -> None:
+        """Начать приём соединений по TCP или Unix-сокету path."""
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle,
+                                                           path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle,
+                                                      host, port)
+
+    @property
+    def address(self):
+        """Адрес, на котором слушает сервис."""
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def shutdown(self) -> None:
+        """Перестать принимать запросы и дождаться ответов на принятые."""
+        self._server.close()
+        # С Python 3.12 wait_closed ждёт закрытия всех соединений,
+        # поэтому обработчики останавливаются раньше.
+        for handler in list(self._handlers):
+            handler.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        await self._queue.put(_STOP)
+        await self._batcher
+
+    def _submit(self, body: bytes) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((body, future))
+        return future
+
+    async def _collect_batch(self, first) -> tuple[list, bool]:
+        """Добрать пачку до max_batch_size или до истечения max_latency.
+
+        Возвращает пачку и признак того, что пришёл сигнал остановки.
+        """
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        batch = [first]
+        deadline = loop.time() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            if queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = queue.get_nowait()
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run_batches(self) -> None:
+        stop = False
+        while not stop:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch, stop = await self._collect_batch(item)
+            self.batches += 1
+            self.requests += len(batch)
+            replies = score_requests([body for body, _ in batch])
+            for (_, future), reply in zip(batch, replies):
+                if not future.done():
+                    future.set_result(reply)
+
+    async def _handle(self,
+                      reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        if len(self._handlers) >= self.max_connections:
+            writer.write(_frame(REPLY_ERROR
+                                + 'Превышен лимит соединений.'.encode()))
+            await writer.drain()
+            writer.close()
+            return
+        self._handlers.add(asyncio.current_task())
+        replies: asyncio.Queue = asyncio.Queue(self.max_pending)
+        sender = asyncio.create_task(self._send_replies(replies, writer))
+        reset = False
+        try:
+            while True:
+                body = await _read_frame(reader)
+                if body is None:
+                    break
+                if not await _enqueue(replies, self._submit(body), sender):
+                    break
+        except asyncio.CancelledError:
+            pass
+        except ValueError as exc:
+            error = asyncio.get_running_loop().create_future()
+            error.set_result(_error(exc))
+            await _enqueue(replies, error, sender)
+        except ConnectionError:
+            sender.cancel()
+            reset = True
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            if not reset:
+                await _enqueue(replies, None, sender)
+            await asyncio.gather(sender, return_exceptions=True)
+            writer.close()
+
+    @staticmethod
+    async def _send_replies(replies: asyncio.Queue,
+                            writer: asyncio.StreamWriter) -> None:
+        while True:
+            future = await replies.get()
+            if future is None:
+                return
+            writer.write(_frame(await future))
+            await writer.drain()
+
+
+class ScoringClient:
+    """Клиент сервиса расчёта."""
+
+    def __init__(self,
+                 reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls,
+                      host: str = '127.0.0.1',
+                      port: int = 0,
+                      path: str | None = None) -> ScoringClient:
+        if path is not None:
+            return cls(*await asyncio.open_unix_connection(path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    @staticmethod
+    def _request(workout_type: str, data: list, binary: bool) -> bytes:
+        line = ','.join([workout_type, *map(str, data)])
+        kind = REPLY_BINARY if binary else REPLY_TEXT
+        return _frame(kind + line.encode('utf-8'))
+
+    async def _reply(self) -> str | BinaryResult:
+        body = await _read_frame(self._reader)
+        if body is None:
+            raise ConnectionError('Сервис закрыл соединение.')
+        kind, payload = body[:1], body[1:]
+        if kind == REPLY_BINARY:
+            code, *values = RESULT.unpack(payload)
+            names = {value: name for name, value in TYPE_CODES.items()}
+            return BinaryResult(names[code], *values)
+        if kind == REPLY_ERROR:
+            raise ScoringError(payload.decode('utf-8'))
+        return payload.decode('utf-8')
+
+    async def score(self,
+                    workout_type: str,
+                    data: list,
+                    binary: bool = False) -> str | BinaryResult:
+        """Посчитать один пакет."""
+        self._writer.write(self._request(workout_type, data, binary))
+        await self._writer.drain()
+        return await self._reply()
+
+    async def score_many(self,
+                         packages: list[tuple[str, list]],
+                         binary: bool = False) -> list[str | BinaryResult]:
+        """Отправить пакеты разом и получить ответы в том же порядке."""
+        self._writer.writelines(self._request(workout_type, data, binary)
+                                for workout_type, data in packages)
+        await self._writer.drain()
+        return [await self._reply() for _ in packages]
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+async def serve(host: str = '127.0.0.1',
+                port: int = 8765,
+                path: str | None = None,
+                **options) -> None:
+    """Запустить сервис и работать до SIGINT/SIGTERM."""
+    service = ScoringServer(**options)
+    await service.start(host, port, path)
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    await stopped.wait()
+    await service.shutdown()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Сервис расчёта пакетов.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', dest='path', help='путь к Unix-сокету')
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-latency', type=float, default=0.002,
+                        help='секунд ожидания добора пачки')
+    parser.add_argument('--max-connections', type=int, default=1024)
+    return parser
+
+
+def run(argv: list[str] | None = None) -> None:
+    """Точка входа командной строки."""
+    args = build_parser().parse_args(argv)
+    asyncio.run(serve(args.host, args.port, args.path,
+                      max_batch_size=args.max_batch_size,
+                      max_latency=args.max_latency,
+                      max_connections=args.max_connections))
+
+
+if __name__ == '__main__':
+    run()
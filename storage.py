@@ -0,0 +1,377 @@
+"""Хранилище посчитанных тренировок в SQLite.
+
+Каждая тренировка хранится строкой: пользователь, время (секунды
+Unix, UTC), код вида из пакета, сырые значения пакета по именам
+параметров конструктора и поля InfoMessage. Индексы (user_id, ts) и
+(training_type, ts) обслуживают выборки по пользователю и по виду за
+интервал времени.
+
+Вставка идёт пачками по batch_size строк в одной транзакции через
+executemany одного подготовленного запроса. В той же транзакции
+обновляются свёртки: итоги за день, неделю и месяц по пользователю и
+виду тренировки (и по всем видам - ALL), как в aggregation.
+
+База открывается в режиме WAL, поэтому чтение не ждёт записи.
+Соединения берутся из пула, общего для потоков; выборки отдают
+строки по мере чтения курсора.
+"""
+from __future__ import annotations
+
+import inspect
+import json
+import queue
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Hashable, Iterable, Iterator, NamedTuple
+
+from aggregation import ALL, PERIODS, Timestamp, buckets_of
+from caloriescounter import (InfoMessage, Training, get_workout_type,
+                             read_package)
+
+DEFAULT_BATCH_SIZE: int = 10000
+DEFAULT_POOL_SIZE: int = 4
+FETCH_SIZE: int = 1000
+# Значения пакета с этими именами параметров лежат в своих колонках,
+# остальные - в JSON-колонке extra.
+RAW_COLUMNS: tuple[str, ...] = ('action', 'duration', 'weight', 'height',
+                                'length_pool', 'count_pool')
+INFO_COLUMNS: tuple[str, ...] = ('training_type', 'info_duration',
+                                 'distance', 'speed', 'calories')
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS workouts (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    workout_type TEXT NOT NULL,
+    {', '.join(f'{name} REAL' for name in RAW_COLUMNS)},
+    extra TEXT,
+    training_type TEXT NOT NULL,
+    info_duration REAL NOT NULL,
+    distance REAL NOT NULL,
+    speed REAL NOT NULL,
+    calories REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS workouts_user_ts ON workouts (user_id, ts);
+CREATE INDEX IF NOT EXISTS workouts_type_ts
+    ON workouts (training_type, ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    user_id TEXT NOT NULL,
+    training_type TEXT NOT NULL,
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    distance REAL NOT NULL,
+    calories REAL NOT NULL,
+    speed_sum REAL NOT NULL,
+    speed_min REAL NOT NULL,
+    speed_max REAL NOT NULL,
+    PRIMARY KEY (user_id, training_type, period, bucket)
+) WITHOUT ROWID;
+'''
+
+_WORKOUT_FIELDS = ('user_id', 'ts', 'workout_type', *RAW_COLUMNS, 'extra',
+                   *INFO_COLUMNS)
+INSERT_WORKOUT = (f'INSERT INTO workouts ({", ".join(_WORKOUT_FIELDS)}) '
+                  f'VALUES ({", ".join("?" * len(_WORKOUT_FIELDS))})')
+UPSERT_ROLLUP = '''
+INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id, training_type, period, bucket) DO UPDATE SET
+    count = count + excluded.count,
+    duration = duration + excluded.duration,
+    distance = distance + excluded.distance,
+    calories = calories + excluded.calories,
+    speed_sum = speed_sum + excluded.speed_sum,
+    speed_min = min(speed_min, excluded.speed_min),
+    speed_max = max(speed_max, excluded.speed_max)
+'''
+SELECT_WORKOUTS = (f'SELECT id, {", ".join(_WORKOUT_FIELDS)} '
+                   f'FROM workouts')
+
+
+class StoredWorkout(NamedTuple):
+    """Тренировка, прочитанная из хранилища."""
+    id: int
+    user_id: str
+    timestamp: float
+    workout_type: str
+    data: list
+    info: InfoMessage
+
+
+class Rollup(NamedTuple):
+    """Итоги пользователя за один период."""
+    bucket: str
+    count: int
+    duration: float
+    distance: float
+    calories: float
+    speed_sum: float
+    speed_min: float
+    speed_max: float
+
+    @property
+    def mean_speed(self) -> float:
+        return self.speed_sum / self.count
+
+
+def _seconds(timestamp: Timestamp) -> float:
+    """Время в секундах Unix; datetime без пояса считается UTC."""
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.timestamp()
+    return float(timestamp)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                 isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+class ConnectionPool:
+    """Пул соединений SQLite, общий для потоков.
+
+    Соединения пула берутся на время одной операции. Потоковым
+    выборкам, которые держат соединение, пока вызывающий читает
+    строки, выдаётся отдельное соединение - dedicated, иначе
+    незакрытые выборки исчерпали бы пул и остальные операции ждали
+    бы вечно.
+    """
+
+    def __init__(self, path: str, size: int = DEFAULT_POOL_SIZE) -> None:
+        self.path = path
+        self._idle: queue.Queue = queue.Queue()
+        self._connections = [_connect(path) for _ in range(size)]
+        for connection in self._connections:
+            self._idle.put(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Взять соединение; ждёт, если все заняты."""
+        connection = self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    @contextmanager
+    def dedicated(self) -> Iterator[sqlite3.Connection]:
+        """Отдельное соединение вне пула, закрывается после блока."""
+        connection = _connect(self.path)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def close(self) -> None:
+        for connection in self._connections:
+            connection.close()
+
+
+class WorkoutStore:
+    """Хранилище тренировок со свёртками по периодам."""
+
+    def __init__(self,
+                 path: str,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        self.pool = ConnectionPool(path, pool_size)
+        self.batch_size = batch_size
+        self._params: dict[str, tuple[str, ...]] = {}
+        self._layouts: dict[str, tuple[tuple, tuple]] = {}
+        with self.pool.connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _param_names(self, workout_type: str) -> tuple[str, ...]:
+        names = self._params.get(workout_type)
+        if names is None:
+            cls: type[Training] = get_workout_type(workout_type).cls
+            names = self._params[workout_type] = tuple(
+                inspect.signature(cls).parameters)
+        return names
+
+    def _layout(self, workout_type: str) -> tuple[tuple, tuple]:
+        """Индексы значений пакета для RAW_COLUMNS и для extra."""
+        layout = self._layouts.get(workout_type)
+        if layout is None:
+            names = self._param_names(workout_type)
+            layout = self._layouts[workout_type] = (
+                tuple(names.index(column) if column in names else None
+                      for column in RAW_COLUMNS),
+                tuple((name, i) for i, name in enumerate(names)
+                      if name not in RAW_COLUMNS))
+        return layout
+
+    def _row(self,
+             user_id: Hashable,
+             timestamp: Timestamp,
+             workout_type: str,
+             data: list,
+             info: InfoMessage) -> tuple:
+        positions, extras = self._layout(workout_type)
+        extra = None
+        if extras:
+            extra = json.dumps({name: data[i] for name, i in extras})
+        return (str(user_id), _seconds(timestamp), workout_type,
+                *[None if i is None else data[i] for i in positions],
+                extra, info.training_type, info.duration, info.distance,
+                info.speed, info.calories)
+
+    def insert_many(self,
+                    records: Iterable[tuple[Hashable, Timestamp, str, list,
+                                            InfoMessage | None]]
+                    ) -> int:
+        """Сохранить записи (user_id, время, код вида, data, info).
+
+        Если info None, пакет считается здесь же. Возвращает число
+        сохранённых записей.
+        """
+        iterator = iter(records)
+        total = 0
+        while True:
+            batch = list(islice(iterator, self.batch_size))
+            if not batch:
+                return total
+            rows = []
+            days: dict[tuple, list] = {}
+            for user_id, timestamp, workout_type, data, info in batch:
+                if info is None:
+                    training = read_package(workout_type, data)
+                    info = training.show_training_info()
+                row = self._row(user_id, timestamp, workout_type, data, info)
+                rows.append(row)
+                _add_day(days, row[0], row[1], info)
+            rollups = _rollups(days)
+            with self.pool.connection() as connection:
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    connection.executemany(INSERT_WORKOUT, rows)
+                    connection.executemany(
+                        UPSERT_ROLLUP,
+                        (key + tuple(values)
+                         for key, values in rollups.items()))
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+                connection.execute('COMMIT')
+            total += len(rows)
+
+    def insert(self,
+               user_id: Hashable,
+               timestamp: Timestamp,
+               workout_type: str,
+               data: list,
+               info: InfoMessage | None = None) -> None:
+        self.insert_many([(user_id, timestamp, workout_type, data, info)])
+
+    def _select(self, where: str, params: tuple) -> Iterator[StoredWorkout]:
+        with self.pool.dedicated() as connection:
+            cursor = connection.execute(
+                f'{SELECT_WORKOUTS} WHERE {where} ORDER BY ts, id', params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(FETCH_SIZE)
+                    if not rows:
+                        return
+                    for row in rows:
+                        yield self._workout(row)
+            finally:
+                cursor.close()
+
+    def _workout(self, row: tuple) -> StoredWorkout:
+        id, user_id, ts, workout_type = row[:4]
+        raw = dict(zip(RAW_COLUMNS, row[4:4 + len(RAW_COLUMNS)]))
+        extra = row[4 + len(RAW_COLUMNS)]
+        if extra:
+            raw.update(json.loads(extra))
+        data = [raw[name] for name in self._param_names(workout_type)]
+        info = InfoMessage(*row[-len(INFO_COLUMNS):])
+        return StoredWorkout(id, user_id, ts, workout_type, data, info)
+
+    def by_user(self,
+                user_id: Hashable,
+                start: Timestamp,
+                end: Timestamp) -> Iterator[StoredWorkout]:
+        """Тренировки пользователя за [start, end) по порядку времени."""
+        return self._select('user_id = ? AND ts >= ? AND ts < ?',
+                            (str(user_id), _seconds(start), _seconds(end)))
+
+    def by_type(self,
+                training_type: str,
+                start: Timestamp,
+                end: Timestamp) -> Iterator[StoredWorkout]:
+        """Тренировки вида (название InfoMessage) за [start, end)."""
+        return self._select('training_type = ? AND ts >= ? AND ts < ?',
+                            (training_type, _seconds(start), _seconds(end)))
+
+    def rollups(self,
+                user_id: Hashable,
+                period: str,
+                training_type: str = ALL) -> list[Rollup]:
+        """Свёртки пользователя за все периоды period по порядку."""
+        if period not in PERIODS:
+            raise ValueError(f'Неизвестный период: {period}.')
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                'SELECT bucket, count, duration, distance, calories, '
+                'speed_sum, speed_min, speed_max FROM rollups '
+                'WHERE user_id = ? AND training_type = ? AND period = ? '
+                'ORDER BY bucket', (str(user_id), training_type, period))
+            return [Rollup(*row) for row in rows]
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def __enter__(self) -> WorkoutStore:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def _merge(rollups: dict[tuple, list], key: tuple, values: list) -> None:
+    current = rollups.get(key)
+    if current is None:
+        rollups[key] = list(values)
+        return
+    for i in range(5):
+        current[i] += values[i]
+    current[5] = min(current[5], values[5])
+    current[6] = max(current[6], values[6])
+
+
+def _add_day(days: dict[tuple, list],
+             user_id: str,
+             timestamp: float,
+             info: InfoMessage) -> None:
+    """Учесть тренировку в итогах (пользователь, вид, сутки UTC)."""
+    speed = info.speed
+    _merge(days, (user_id, info.training_type, int(timestamp // 86400)),
+           [1, info.duration, info.distance, info.calories, speed, speed,
+            speed])
+
+
+def _rollups(days: dict[tuple, list]) -> dict[tuple, list]:
+    """Развернуть суточные итоги пачки в свёртки всех периодов.
+
+    Тренировок в пачке обычно много больше, чем пар (пользователь,
+    сутки), поэтому ключи периодов считаются по суткам, а не по
+    каждой тренировке.
+    """
+    buckets: dict[int, tuple[str, ...]] = {}
+    rollups: dict[tuple, list] = {}
+    for (user_id, training_type, day), values in days.items():
+        day_buckets = buckets.get(day)
+        if day_buckets is None:
+            day_buckets = buckets[day] = buckets_of(day * 86400)
+        for period, bucket in zip(PERIODS, day_buckets):
+            _merge(rollups, (user_id, training_type, period, bucket), values)
+            _merge(rollups, (user_id, ALL, period, bucket), values)
+    return rollups
@@ -0,0 +1,356 @@
+"""Потоковая обработка пакетов из файла или stdin.
+
+Каждая строка входа - один пакет: CSV вида ``SWM,720,1,80,25,40``
+или NDJSON вида ``["SWM", [720, 1, 80, 25, 40]]`` /
+``{"type": "SWM", "data": [720, 1, 80, 25, 40]}``; в последней
+форме может быть и ``"id"`` записи. Пустые строки и строки,
+начинающиеся с ``#``, пропускаются.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import Counter
+from itertools import islice
+from typing import TYPE_CHECKING, Hashable, Iterable, Iterator, TextIO
+
+from caloriescounter import (InfoMessage, UnknownWorkoutTypeError,
+                             format_messages, read_package, write_messages)
+from instrumentation import Recorder, clock, profiling
+
+if TYPE_CHECKING:
+    from resultcache import ResultCache
+    from validation import Validator
+
+DEFAULT_CHUNK_SIZE: int = 10000
+DEFAULT_QUEUE_DEPTH: int = 4
+
+
+def _parse_number(value: str) -> int | float:
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def parse_line(line: str) -> tuple[str, list] | None:
+    """Разобрать строку входа в пакет (workout_type, data)."""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line[0] == '[':
+        workout_type, data = json.loads(line)
+        return workout_type, list(data)
+    if line[0] == '{':
+        record = json.loads(line)
+        return record['type'], list(record['data'])
+    workout_type, *values = line.split(',')
+    return workout_type.strip(), [_parse_number(value) for value in values]
+
+
+def parse_record(line: str) -> tuple[Hashable | None, str, list] | None:
+    """Разобрать строку входа в запись (id, workout_type, data).
+
+    id берётся из поля "id" NDJSON-объекта, в остальных формах - None.
+    """
+    line = line.strip()
+    if line[:1] == '{':
+        record = json.loads(line)
+        return record.get('id'), record['type'], list(record['data'])
+    package = parse_line(line)
+    return None if package is None else (None, *package)
+
+
+def iter_records(stream: Iterable[str]
+                 ) -> Iterator[tuple[Hashable | None, str, list]]:
+    """Лениво читать записи с id из потока строк."""
+    for line in stream:
+        record = parse_record(line)
+        if record is not None:
+            yield record
+
+
+def iter_packets(stream: Iterable[str]) -> Iterator[tuple[str, list]]:
+    """Лениво читать пакеты из потока строк."""
+    for line in stream:
+        package = parse_line(line)
+        if package is not None:
+            yield package
+
+
+def iter_chunks(iterable: Iterable, chunk_size: int) -> Iterator[list]:
+    """Разбить итератор на списки длиной не больше chunk_size."""
+    if chunk_size < 1:
+        raise ValueError('Размер чанка должен быть положительным.')
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _score(workout_type: str, data: list) -> InfoMessage:
+    return read_package(workout_type, data).show_training_info()
+
+
+def _score_recorded(workout_type: str,
+                    data: list,
+                    cache: ResultCache | None,
+                    recorder: Recorder) -> InfoMessage:
+    """Посчитать пакет, замеряя стадии dispatch и calories.
+
+    С кэшем обе стадии неразделимы и замеряются как одна - score.
+    """
+    if not recorder.should_sample():
+        if cache is not None:
+            recorder.count('score')
+            return cache.score(workout_type, data)
+        recorder.count('dispatch')
+        recorder.count('calories')
+        return _score(workout_type, data)
+    start = clock()
+    if cache is not None:
+        info = cache.score(workout_type, data)
+        recorder.observe('score', workout_type, clock() - start)
+        return info
+    training = read_package(workout_type, data)
+    dispatched = clock()
+    info = training.show_training_info()
+    recorder.observe('dispatch', workout_type, dispatched - start)
+    recorder.observe('calories', workout_type, clock() - dispatched)
+    return info
+
+
+def score_packets(packets: Iterable[tuple[str, list]],
+                  unknown: Counter | None = None,
+                  cache: ResultCache | None = None,
+                  recorder: Recorder | None = None) -> list[InfoMessage]:
+    """Посчитать пакеты; неизвестные виды считаются в unknown.
+
+    Без unknown пакет неизвестного вида прерывает расчёт. С cache
+    повторные пакеты берутся из кэша результатов, с recorder
+    замеряется время стадий.
+    """
+    if recorder is not None:
+        def score(workout_type: str, data: list) -> InfoMessage:
+            return _score_recorded(workout_type, data, cache, recorder)
+    else:
+        score = _score if cache is None else cache.score
+    infos = []
+    for workout_type, data in packets:
+        try:
+            info = score(workout_type, data)
+        except UnknownWorkoutTypeError:
+            if unknown is None:
+                raise
+            unknown[workout_type] += 1
+            continue
+        infos.append(info)
+    return infos
+
+
+def _recorded_chunks(chunks: Iterator[list],
+                     recorder: Recorder) -> Iterator[list]:
+    """Замерять чтение и разбор чанков как стадию parse."""
+    while True:
+        start = clock()
+        chunk = next(chunks, None)
+        if chunk is None:
+            return
+        recorder.add('parse', clock() - start, len(chunk))
+        yield chunk
+
+
+def score_stream(stream: Iterable[str],
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 unknown: Counter | None = None,
+                 cache: ResultCache | None = None,
+                 recorder: Recorder | None = None,
+                 validator: Validator | None = None
+                 ) -> Iterator[list[InfoMessage]]:
+    """Посчитать пакеты из потока и отдавать результаты чанками.
+
+    Следующий чанк читается только когда потребитель запросил его,
+    поэтому в памяти одновременно находится не больше chunk_size
+    пакетов, а медленный потребитель сам притормаживает чтение. С
+    validator неразборчивые и недопустимые пакеты уходят в его отказы,
+    а не прерывают расчёт.
+    """
+    if validator is None:
+        packets = iter_packets(stream)
+    else:
+        packets = validator.parse(stream)
+    chunks = iter_chunks(packets, chunk_size)
+    if recorder is not None:
+        chunks = _recorded_chunks(chunks, recorder)
+    for chunk in chunks:
+        if validator is not None:
+            chunk = validator.filter(chunk)
+        yield score_packets(chunk, unknown, cache, recorder)
+
+
+def write_chunks(chunks: Iterable[list[InfoMessage]],
+                 recorder: Recorder | None = None) -> None:
+    """Вывести чанки результатов; с recorder - замеряя format и write."""
+    if recorder is None:
+        for chunk in chunks:
+            write_messages(chunk)
+        return
+    for chunk in chunks:
+        start = clock()
+        text = format_messages(chunk)
+        formatted = clock()
+        sys.stdout.write(text)
+        recorder.add('format', formatted - start, len(chunk))
+        recorder.add('write', clock() - formatted, len(chunk))
+
+
+def open_input(path: str | None) -> TextIO:
+    """Открыть файл пакетов; '-' или None - стандартный ввод."""
+    if path is None or path == '-':
+        return sys.stdin
+    return open(path, encoding='utf-8')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Посчитать тренировки из файла пакетов или stdin.')
+    parser.add_argument('path', nargs='?', default='-',
+                        help='файл пакетов (CSV/NDJSON), по умолчанию stdin')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='сколько пакетов обрабатывать за раз')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='число процессов; 0 - по числу ядер')
+    parser.add_argument('--unordered', action='store_true',
+                        help='выводить результаты по мере готовности')
+    cache = parser.add_argument_group('кэш результатов')
+    cache.add_argument('--cache-size', type=int,
+                       help='включить кэш и ограничить число записей')
+    cache.add_argument('--cache-ttl', type=float,
+                       help='время жизни записи кэша, секунды')
+    cache.add_argument('--cache-db',
+                       help='файл SQLite, общий для всех процессов')
+    cache.add_argument('--cache-stats', action='store_true',
+                       help='вывести счётчики кэша в stderr')
+    pipeline = parser.add_argument_group('конвейер')
+    pipeline.add_argument('--pipeline', action='store_true',
+                          help='читать, считать и выводить одновременно '
+                               'в отдельных потоках')
+    pipeline.add_argument('--queue-depth', type=int,
+                          default=DEFAULT_QUEUE_DEPTH,
+                          help='сколько чанков ждут в очереди между '
+                               'стадиями конвейера')
+    pipeline.add_argument('--pipeline-stats', action='store_true',
+                          help='вывести загрузку стадий конвейера в '
+                               'stderr (включает --pipeline)')
+    validation = parser.add_argument_group('проверка пакетов')
+    validation.add_argument('--validate', action='store_true',
+                            help='отсеивать недопустимые пакеты вместо '
+                                 'остановки; итоги по причинам - в stderr')
+    validation.add_argument('--rejects',
+                            help='записать отказы в файл NDJSON '
+                                 '(включает --validate)')
+    metrics = parser.add_argument_group('замеры и профилирование')
+    metrics.add_argument('--metrics',
+                         help='записать замеры стадий: *.json - JSON, '
+                              'иначе формат Prometheus')
+    metrics.add_argument('--sample-every', type=int, default=1,
+                         help='замерять время каждого N-го пакета')
+    metrics.add_argument('--profile',
+                         help='сохранить статистику cProfile в файл')
+    metrics.add_argument('--tracemalloc', type=int, default=0, metavar='N',
+                         help='вывести в stderr N строк с наибольшим '
+                              'выделением памяти')
+    return parser
+
+
+def cache_options(args: argparse.Namespace) -> dict | None:
+    """Параметры make_cache из аргументов; None - кэш выключен."""
+    options = {'size': args.cache_size, 'ttl': args.cache_ttl,
+               'path': args.cache_db}
+    if all(value is None for value in options.values()):
+        return None
+    return options
+
+
+def _make_validator(args: argparse.Namespace) -> Validator | None:
+    if not (args.validate or args.rejects):
+        return None
+    from validation import Validator
+    rejects = None
+    if args.rejects:
+        rejects = open(args.rejects, 'w', encoding='utf-8')
+    return Validator(rejects)
+
+
+def _close(stream: TextIO,
+           cache: ResultCache | None,
+           validator: Validator | None,
+           cache_stats: bool) -> None:
+    if stream is not sys.stdin:
+        stream.close()
+    if cache is not None:
+        if cache_stats:
+            print(cache.stats(), file=sys.stderr)
+        cache.close()
+    if validator is not None:
+        if validator.rejects is not None:
+            validator.rejects.close()
+        for reason, count in sorted(validator.counts.items()):
+            print(f'Отклонено пакетов ({reason}): {count}', file=sys.stderr)
+
+
+def _run(args: argparse.Namespace, recorder: Recorder | None) -> None:
+    options = cache_options(args)
+    cache = None
+    validator = _make_validator(args)
+    stream = open_input(args.path)
+    if args.workers == 1:
+        if options is not None:
+            from resultcache import make_cache
+            cache = make_cache(**options)
+        if args.pipeline or args.pipeline_stats:
+            from pipeline import run_pipeline
+            try:
+                stats = run_pipeline(stream, sys.stdout, args.chunk_size,
+                                     args.queue_depth, cache=cache,
+                                     recorder=recorder,
+                                     validator=validator)
+            finally:
+                _close(stream, cache, validator, args.cache_stats)
+            if args.pipeline_stats:
+                sys.stderr.write(stats.format())
+            return
+        chunks = score_stream(stream, args.chunk_size, cache=cache,
+                              recorder=recorder, validator=validator)
+    else:
+        from parallel import score_parallel
+        chunks = score_parallel(stream, args.workers or None,
+                                args.chunk_size, not args.unordered,
+                                cache_options=options)
+    try:
+        write_chunks(chunks, recorder)
+    finally:
+        _close(stream, cache, validator, args.cache_stats)
+
+
+def run(argv: list[str] | None = None) -> None:
+    """Точка входа командной строки."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.workers != 1 and (args.validate or args.rejects):
+        parser.error('--validate и --rejects работают только с '
+                     '--workers 1.')
+    if args.workers != 1 and (args.pipeline or args.pipeline_stats):
+        parser.error('--pipeline работает только с --workers 1.')
+    recorder = Recorder(args.sample_every) if args.metrics else None
+    with profiling(args.profile, args.tracemalloc):
+        _run(args, recorder)
+    if recorder is not None:
+        recorder.write(args.metrics)
+
+
+if __name__ == '__main__':
+    run()
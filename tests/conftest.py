@@ -2,6 +2,8 @@ import sys
 from pathlib import Path
 from io import StringIO
 
+import pytest
+
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
 sys.path.append(str(BASE_DIR))
 
@@ -25,3 +27,15 @@ class Capturing(list):
         self.extend(self._stringio.getvalue().splitlines())
         del self._stringio
         sys.stdout = self._stdout
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def engine(request, monkeypatch):
+    """Пакетный расчёт через NumPy или построчно, если его нет."""
+    import caloriescounter
+    if request.param == 'numpy':
+        if caloriescounter._numpy() is None:
+            pytest.skip('NumPy не установлен')
+    else:
+        monkeypatch.setattr(caloriescounter, 'np', None)
+    return request.param
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import aggregation
+from caloriescounter import InfoMessage
+
+MONDAY = datetime(2026, 10, 12, 9, tzinfo=timezone.utc)
+TUESDAY = datetime(2026, 10, 13, 9, tzinfo=timezone.utc)
+NEXT_MONTH = datetime(2026, 11, 2, 9, tzinfo=timezone.utc)
+
+RUN = InfoMessage('Running', 1, 10, 10, 700)
+FAST_RUN = InfoMessage('Running', 0.5, 7, 14, 400)
+SWIM = InfoMessage('Swimming', 1, 1, 2, 300)
+
+
+@pytest.mark.parametrize('timestamp, period, expected', [
+    (TUESDAY, 'day', '2026-10-13'),
+    (TUESDAY, 'week', '2026-10-12'),
+    (TUESDAY, 'month', '2026-10'),
+    (TUESDAY.timestamp(), 'day', '2026-10-13'),
+])
+def test_bucket_of(timestamp, period, expected):
+    assert aggregation.bucket_of(timestamp, period) == expected
+
+
+def _filled():
+    aggregator = aggregation.Aggregator()
+    aggregator.add('u1', MONDAY, RUN)
+    aggregator.add('u1', TUESDAY, FAST_RUN)
+    aggregator.add('u1', TUESDAY, SWIM)
+    aggregator.add('u2', TUESDAY, RUN)
+    return aggregator
+
+
+def test_running_totals():
+    aggregator = _filled()
+    week = aggregator.totals('u1', 'week', TUESDAY)
+    assert week.count == 3
+    assert week.distance == 18
+    assert week.calories == 1400
+    assert (week.speed_min, week.speed_max) == (2, 14)
+    assert week.mean_speed == pytest.approx(26 / 3)
+    runs = aggregator.totals('u1', 'week', TUESDAY, 'Running')
+    assert runs.count == 2
+    day = aggregator.totals('u1', 'day', MONDAY)
+    assert day.count == 1
+    assert set(aggregator.buckets('u1', 'day')) == {'2026-10-12',
+                                                    '2026-10-13'}
+    assert aggregator.totals('u1', 'month', NEXT_MONTH) is None
+
+
+def test_retract_updates_extremes():
+    aggregator = _filled()
+    aggregator.retract('u1', TUESDAY, FAST_RUN)
+    week = aggregator.totals('u1', 'week', TUESDAY)
+    assert week.count == 2
+    assert (week.speed_min, week.speed_max) == (2, 10)
+    aggregator.retract('u1', TUESDAY, SWIM)
+    assert aggregator.totals('u1', 'day', TUESDAY) is None
+    with pytest.raises(ValueError):
+        aggregator.retract('u1', TUESDAY, SWIM)
+
+
+def test_correct_moves_late_record():
+    aggregator = _filled()
+    aggregator.correct('u1', TUESDAY, SWIM, NEXT_MONTH, SWIM)
+    assert aggregator.totals('u1', 'month', TUESDAY).count == 2
+    assert aggregator.totals('u1', 'month', NEXT_MONTH).count == 1
+
+
+def test_snapshot_restore(tmp_path):
+    aggregator = _filled()
+    path = str(tmp_path / 'state.json')
+    aggregator.snapshot(path)
+    restored = aggregation.Aggregator.restore(path)
+    assert len(restored) == len(aggregator)
+    original = aggregator.totals('u1', 'week', TUESDAY)
+    week = restored.totals('u1', 'week', TUESDAY)
+    assert week.as_dict() == original.as_dict()
+    restored.retract('u1', TUESDAY, FAST_RUN)
+    assert restored.totals('u1', 'week', TUESDAY).speed_max == 10
@@ -0,0 +1,102 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+import caloriescounter
+
+
+def _random_packages(size, seed=0):
+    rnd = random.Random(seed)
+    packages = []
+    for _ in range(size):
+        workout_type = rnd.choice(['SWM', 'RUN', 'WLK'])
+        data = [rnd.randint(1, 30000), rnd.uniform(0.1, 5),
+                rnd.uniform(40, 120)]
+        if workout_type == 'WLK':
+            data.append(rnd.randint(140, 210))
+        elif workout_type == 'SWM':
+            data.extend([rnd.randint(20, 50), rnd.randint(1, 80)])
+        packages.append((workout_type, data))
+    return packages
+
+
+def _columns(packages):
+    columns = {name: [] for name in ('action', 'duration', 'weight',
+                                     'height', 'length_pool', 'count_pool')}
+    for _, data in packages:
+        columns['action'].append(data[0])
+        columns['duration'].append(data[1])
+        columns['weight'].append(data[2])
+        columns['height'].append(data[3] if len(data) == 4 else 0)
+        columns['length_pool'].append(data[3] if len(data) == 5 else 0)
+        columns['count_pool'].append(data[4] if len(data) == 5 else 0)
+    type_code = caloriescounter.encode_types(
+        [workout_type for workout_type, _ in packages])
+    return type_code, columns
+
+
+def test_calculate_batch_matches_classes(engine):
+    # При зерне 1 на 20000 строках есть ходьба, где x * x != x ** 2.
+    packages = _random_packages(20000, seed=1)
+    type_code, columns = _columns(packages)
+    result = caloriescounter.calculate_batch(type_code, **columns)
+    for i, (workout_type, data) in enumerate(packages):
+        training = caloriescounter.read_package(workout_type, data)
+        assert result.distance[i] == training.get_distance()
+        assert result.speed[i] == training.get_mean_speed()
+        assert result.calories[i] == training.get_spent_calories()
+
+
+def test_calculate_batch_single_type_without_extra_columns(engine):
+    result = caloriescounter.calculate_batch(
+        [caloriescounter.TYPE_CODES['RUN']], [15000], [1], [75])
+    training = caloriescounter.Running(15000, 1, 75)
+    assert list(result.calories) == [training.get_spent_calories()]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'type_code': [7], 'action': [1], 'duration': [1], 'weight': [1]},
+    {'type_code': [2], 'action': [1], 'duration': [1], 'weight': [1]},
+    {'type_code': [1, 1], 'action': [1], 'duration': [1], 'weight': [1]},
+])
+def test_calculate_batch_rejects_bad_columns(engine, kwargs):
+    with pytest.raises(ValueError):
+        caloriescounter.calculate_batch(**kwargs)
+
+
+def test_encode_types_counts_unknown():
+    unknown = Counter()
+    codes = caloriescounter.encode_types(['RUN', 'XXX', 'WLK', 'XXX'],
+                                         unknown)
+    assert codes == [1, caloriescounter.UNKNOWN_TYPE_ID, 2,
+                     caloriescounter.UNKNOWN_TYPE_ID]
+    assert unknown == {'XXX': 2}
+    with pytest.raises(caloriescounter.UnknownWorkoutTypeError) as error:
+        caloriescounter.encode_types(['RUN', 'XXX'])
+    assert error.value.workout_type == 'XXX'
+    assert error.value.__context__ is None
+
+
+def test_calculate_batch_counts_unknown(engine):
+    unknown = Counter()
+    result = caloriescounter.calculate_batch(
+        [1, caloriescounter.UNKNOWN_TYPE_ID, 7, 1], [15000] * 4, [1] * 4,
+        [75] * 4, unknown=unknown)
+    training = caloriescounter.Running(15000, 1, 75)
+    assert unknown == {7: 1}
+    for i in (0, 3):
+        assert result.calories[i] == training.get_spent_calories()
+    for column in result:
+        assert math.isnan(column[1]) and math.isnan(column[2])
+
+
+def test_encode_then_calculate_counts_unknown_once(engine):
+    unknown = Counter()
+    type_code = caloriescounter.encode_types(['RUN', 'XYZ', 'RUN'], unknown)
+    result = caloriescounter.calculate_batch(
+        type_code, [15000] * 3, [1] * 3, [75] * 3, unknown=unknown)
+    assert unknown == {'XYZ': 1}
+    assert math.isnan(result.calories[1])
+    assert result.calories[0] == result.calories[2]
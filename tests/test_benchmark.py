@@ -0,0 +1,59 @@
+import json
+
+import benchmark
+import caloriescounter
+
+
+def test_generate_packages_is_reproducible():
+    packages = benchmark.generate_packages(300, seed=3)
+    assert packages == benchmark.generate_packages(300, seed=3)
+    assert {workout_type for workout_type, _ in packages} == {
+        'RUN', 'WLK', 'SWM'}
+    for package in packages:
+        caloriescounter.read_package(*package).show_training_info()
+
+
+def test_run_benchmarks_report():
+    report = benchmark.run_benchmarks(sizes=[1, 20], min_seconds=0)
+    assert set(report['results']) == set(benchmark.BENCHMARKS)
+    for sizes in report['results'].values():
+        assert set(sizes) == {'1', '20'}
+        result = sizes['20']
+        assert result['packets'] == 20
+        assert result['throughput'] > 0
+        assert result['p50_ns'] <= result['p99_ns']
+        assert 'peak_bytes' in result
+    json.dumps(report)
+
+
+def test_compare_detects_regression():
+    report = benchmark.run_benchmarks(sizes=[10], names=['get_message'],
+                                      memory=False, min_seconds=0)
+    result = report['results']['get_message']['10']
+    faster = json.loads(json.dumps(report))
+    faster['results']['get_message']['10']['throughput'] = (
+        result['throughput'] * 2)
+    assert benchmark.compare(report, report) == []
+    assert len(benchmark.compare(report, faster)) == 1
+    assert benchmark.compare(report, {'results': {}}) == []
+
+
+def test_cli_baseline(tmp_path, capsys):
+    baseline = tmp_path / 'baseline.json'
+    argv = ['--sizes', '5', '--only', 'read_package', '--no-memory',
+            '--startup-runs', '1']
+    assert benchmark.run(argv + ['--output', str(baseline)]) == 0
+    report = json.loads(baseline.read_text(encoding='utf-8'))
+    report['results']['read_package']['5']['throughput'] = 1e30
+    baseline.write_text(json.dumps(report), encoding='utf-8')
+    assert benchmark.run(argv + ['--baseline', str(baseline)]) == 1
+    assert 'Регрессия' in capsys.readouterr().err
+
+
+def test_measure_startup():
+    startup = benchmark.measure_startup(runs=1)
+    assert set(startup) == set(benchmark.STARTUP_COMMANDS)
+    for result in startup.values():
+        assert 0 < result['min_ms'] <= result['p50_ms']
+    slower = {'results': {}, 'startup': {'python': {'min_ms': 1e9}}}
+    assert len(benchmark.compare(slower, {'startup': startup})) == 1
@@ -0,0 +1,72 @@
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import cli
+from conftest import BASE_DIR, Capturing
+
+PACKETS = 'RUN,15000,1,75\nSWM,720,1,80,25,40\n'
+
+
+def test_usage_and_unknown_command(capsys):
+    assert cli.main(['--help']) == 0
+    assert 'score' in capsys.readouterr().out
+    assert cli.main(['fly']) == 2
+    assert 'Неизвестная команда' in capsys.readouterr().err
+
+
+def test_score_file(tmp_path):
+    path = tmp_path / 'packets.csv'
+    path.write_text(PACKETS, encoding='utf-8')
+    with Capturing() as output:
+        assert cli.main(['score', str(path)]) == 0
+    assert len(output) == 2
+    assert output[1].startswith('Тип тренировки: Swimming;')
+
+
+def test_help_does_not_import_scoring():
+    code = ('import sys, cli; cli.main(["--help"]); '
+            'print("caloriescounter" in sys.modules)')
+    result = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == 'False'
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'),
+                    reason='нужны Unix-сокеты')
+def test_daemon_jobs(tmp_path, monkeypatch):
+    path = tmp_path / 'packets.csv'
+    path.write_text(PACKETS, encoding='utf-8')
+    socket_path = str(tmp_path / 'daemon.sock')
+    daemon = subprocess.Popen(
+        [sys.executable, 'cli.py', 'daemon', '--socket', socket_path,
+         '--max-jobs', '3'], cwd=BASE_DIR)
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.05)
+        with Capturing() as expected:
+            cli.main(['score', str(path)])
+
+        monkeypatch.chdir(tmp_path)
+        output = io.BytesIO()
+        assert cli.submit(socket_path, ['packets.csv'], stdout=output) == 0
+        assert output.getvalue().decode('utf-8').splitlines() == expected
+
+        output = io.BytesIO()
+        stdin = io.BytesIO(PACKETS.encode('utf-8'))
+        assert cli.submit(socket_path, ['-'], stdin=stdin,
+                          stdout=output) == 0
+        assert output.getvalue().decode('utf-8').splitlines() == expected
+
+        assert cli.submit(socket_path, ['missing.csv'],
+                          stdout=io.BytesIO()) == 1
+        daemon.wait(timeout=10)
+    finally:
+        daemon.kill()
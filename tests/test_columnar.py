@@ -0,0 +1,82 @@
+import io
+from collections import Counter
+
+import pytest
+
+import caloriescounter
+import columnar
+import streaming
+
+RUN = caloriescounter.read_package('RUN', [15000, 1, 75]).show_training_info()
+SWM = caloriescounter.read_package(
+    'SWM', [720, 1, 80, 25, 40]).show_training_info()
+
+
+def _values(info):
+    return (info.training_type, info.duration, info.distance, info.speed,
+            info.calories)
+
+
+def test_roundtrip_in_row_groups(tmp_path):
+    path = str(tmp_path / 'results.ftrc')
+    infos = [RUN, SWM, RUN, RUN, SWM]
+    ids = ['a1', None, 'a3', 'a4', 'a5']
+    with columnar.ResultsWriter(path, row_group_size=2) as writer:
+        writer.write_many(infos, ids)
+    assert writer.rows == 5
+    groups = list(columnar.read_row_groups(path))
+    assert [len(group) for group in groups] == [2, 2, 1]
+    assert groups[0].training_types == ('Running', 'Swimming')
+    assert groups[1].training_types == ('Running',)
+    rows = list(columnar.iter_results(path))
+    assert [id for id, _ in rows] == ids
+    assert [_values(info) for _, info in rows] == [
+        _values(info) for info in infos]
+
+
+def test_without_ids(tmp_path):
+    path = str(tmp_path / 'results.ftrc')
+    with columnar.ResultsWriter(path) as writer:
+        writer.write_many([RUN, SWM])
+    group, = columnar.read_row_groups(path)
+    assert group.ids is None
+    assert [id for id, _ in columnar.iter_results(path)] == [None, None]
+
+
+def test_rejects_foreign_and_truncated_files(tmp_path):
+    path = tmp_path / 'results.ftrc'
+    path.write_bytes(b'not a results file')
+    with pytest.raises(ValueError):
+        list(columnar.read_row_groups(str(path)))
+    with columnar.ResultsWriter(str(path)) as writer:
+        writer.write(RUN)
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError):
+        list(columnar.read_row_groups(str(path)))
+
+
+def test_write_results_passes_ids_through(tmp_path):
+    lines = io.StringIO(
+        '{"id": 7, "type": "RUN", "data": [15000, 1, 75]}\n'
+        '{"id": 8, "type": "XXX", "data": [1, 2, 3]}\n'
+        'SWM,720,1,80,25,40\n')
+    path = str(tmp_path / 'results.ftrc')
+    unknown = Counter()
+    with columnar.ResultsWriter(path) as writer:
+        columnar.write_results(streaming.iter_records(lines), writer,
+                               unknown)
+    assert unknown == {'XXX': 1}
+    rows = list(columnar.iter_results(path))
+    assert [(id, info.get_message()) for id, info in rows] == [
+        ('7', RUN.get_message()), (None, SWM.get_message())]
+
+
+def test_parquet_roundtrip(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'results.parquet')
+    with columnar.ResultsWriter(path, row_group_size=2) as writer:
+        writer.write_many([RUN, SWM, RUN], ['1', '2', '3'])
+    rows = list(columnar.iter_results(path))
+    assert [id for id, _ in rows] == ['1', '2', '3']
+    assert [_values(info) for _, info in rows] == [
+        _values(RUN), _values(SWM), _values(RUN)]
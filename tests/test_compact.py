@@ -0,0 +1,42 @@
+import pytest
+
+import caloriescounter
+
+
+def test_info_message_has_no_dict():
+    info = caloriescounter.InfoMessage('Running', 1, 2, 3, 4)
+    assert not hasattr(info, '__dict__'), (
+        'У `InfoMessage` не должно быть `__dict__`.'
+    )
+
+
+@pytest.mark.parametrize('cls', [
+    caloriescounter.Training,
+    caloriescounter.Running,
+    caloriescounter.SportsWalking,
+    caloriescounter.Swimming,
+])
+def test_training_fields_in_slots(cls):
+    for klass in cls.__mro__[:-1]:
+        assert '__slots__' in vars(klass), (
+            f'Объявите `__slots__` в классе `{klass.__name__}`.'
+        )
+
+
+def test_info_message_batch():
+    packages = [('SWM', [720, 1, 80, 25, 40]),
+                ('RUN', [15000, 1, 75]),
+                ('WLK', [9000, 1, 75, 180]),
+                ('RUN', [1206, 12, 6])]
+    infos = [caloriescounter.read_package(*package).show_training_info()
+             for package in packages]
+    batch = caloriescounter.InfoMessageBatch()
+    for info in infos:
+        batch.append_info(info)
+    assert len(batch) == 4
+    assert batch.training_types == ['Swimming', 'Running', 'SportsWalking']
+    assert list(batch.type_index) == [0, 1, 2, 1]
+    for i, info in enumerate(infos):
+        assert batch.get_message(i) == info.get_message()
+    assert ([info.get_message() for info in batch]
+            == [info.get_message() for info in infos])
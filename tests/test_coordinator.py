@@ -0,0 +1,199 @@
+import json
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import coordinator
+import streaming
+from conftest import BASE_DIR, Capturing
+
+LINES = [f'RUN,{15000 + i},1,75\n' if i % 3 else
+         f'SWM,{700 + i},1,80,25,40\n' for i in range(60)]
+
+
+@pytest.fixture
+def packets(tmp_path):
+    path = tmp_path / 'packets.csv'
+    path.write_text(''.join(LINES) + 'WLK,9000,1,75,0\n', encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def workers():
+    servers = [coordinator.start_worker() for _ in range(3)]
+    yield [server.server_address[:2] for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _expected(path):
+    with Capturing() as output:
+        streaming.run([path, '--validate'])
+    return output
+
+
+def test_partition_file_aligns_to_lines(packets):
+    partitions = coordinator.partition_file(packets, 100)
+    with open(packets, 'rb') as file:
+        data = file.read()
+    assert partitions[0].start == 0
+    assert partitions[-1].end == len(data)
+    for previous, partition in zip(partitions, partitions[1:]):
+        assert previous.end == partition.start
+        assert data[partition.start - 1:partition.start] == b'\n'
+
+
+def test_run_matches_streaming(packets, workers, tmp_path, capsys):
+    output_dir = str(tmp_path / 'out')
+    job = coordinator.Coordinator(packets, output_dir, workers,
+                                  partition_size=200)
+    summary = job.run()
+    text = b''.join(job.iter_output()).decode('utf-8').splitlines()
+    assert text == _expected(packets)
+    assert summary['count'] == 60
+    assert summary['partitions'] > 3
+    assert summary['rejected'] == {'height_range': 1}
+    assert summary['totals']['*']['count'] == 60
+    assert summary['totals']['Swimming']['count'] == 20
+    totals = json.loads((tmp_path / 'out' / 'totals.json').read_text())
+    assert totals == json.loads(json.dumps(summary))
+
+
+def test_retry_and_resume(packets, workers, tmp_path, monkeypatch):
+    calls = []
+    score_partition = coordinator.score_partition
+
+    def flaky(data):
+        calls.append(data)
+        if b'SWM,715,' in data:
+            raise RuntimeError('сбой воркера')
+        return score_partition(data)
+
+    monkeypatch.setattr(coordinator, 'score_partition', flaky)
+    output_dir = str(tmp_path / 'out')
+    job = coordinator.Coordinator(packets, output_dir, workers,
+                                  partition_size=100, max_attempts=2)
+    with pytest.raises(coordinator.CoordinatorError, match='сбой воркера'):
+        job.run()
+    partitions = len(coordinator.partition_file(packets, 100))
+    assert len(calls) == partitions + 1
+    assert max(job.attempts.values()) == 2
+
+    monkeypatch.setattr(coordinator, 'score_partition', score_partition)
+    calls.clear()
+    monkeypatch.setattr(coordinator, 'score_partition',
+                        lambda data: calls.append(data)
+                        or score_partition(data))
+    resumed = coordinator.Coordinator(packets, output_dir, workers,
+                                      partition_size=100)
+    assert resumed.run()['count'] == 60
+    assert len(calls) == 1
+
+
+def test_checkpoint_from_other_source(packets, workers, tmp_path):
+    output_dir = str(tmp_path / 'out')
+    coordinator.Coordinator(packets, output_dir, workers, 200).run()
+    with pytest.raises(coordinator.CoordinatorError):
+        coordinator.Coordinator(packets, output_dir, workers, 300).run()
+
+
+def test_dead_worker_is_skipped(packets, workers, tmp_path):
+    dead = ('127.0.0.1', 9)
+    job = coordinator.Coordinator(packets, str(tmp_path / 'out'),
+                                  [dead, *workers], partition_size=200,
+                                  timeout=5)
+    assert job.run()['count'] == 60
+
+
+def _dead_addresses(count):
+    sockets = [socket.socket() for _ in range(count)]
+    for sock in sockets:
+        sock.bind(('127.0.0.1', 0))
+    addresses = [sock.getsockname() for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return addresses
+
+
+def test_dead_workers_do_not_use_attempts(packets, workers, tmp_path):
+    dead = _dead_addresses(3)
+    for _ in range(3):
+        job = coordinator.Coordinator(packets, str(tmp_path / 'out'),
+                                      [*dead, workers[0]],
+                                      partition_size=100, max_attempts=1,
+                                      timeout=5)
+        assert job.run()['count'] == 60
+        assert not job.attempts
+        assert set(job.retired) == set(dead)
+        shutil.rmtree(tmp_path / 'out')
+
+
+def test_all_workers_dead(packets, tmp_path):
+    job = coordinator.Coordinator(packets, str(tmp_path / 'out'),
+                                  _dead_addresses(2), partition_size=200,
+                                  timeout=5)
+    with pytest.raises(coordinator.CoordinatorError, match='выбыл'):
+        job.run()
+    assert not job.attempts
+
+
+def test_checkpoint_is_append_only_journal(packets, workers, tmp_path):
+    output_dir = tmp_path / 'out'
+    job = coordinator.Coordinator(packets, str(output_dir), workers, 200)
+    job.run()
+    journal = output_dir / coordinator.CHECKPOINT
+    lines = journal.read_bytes().splitlines(keepends=True)
+    assert len(lines) == len(coordinator.partition_file(packets, 200)) + 1
+    journal.write_bytes(b''.join(lines[:-1]) + lines[-1][:10])
+    resumed = coordinator.Coordinator(packets, str(output_dir), workers, 200)
+    assert resumed.run() == job.summary()
+    assert journal.read_bytes().splitlines(keepends=True)[:-1] == lines[:-1]
+
+
+def test_unexpected_errors_release_partition(packets, workers, tmp_path,
+                                             monkeypatch):
+    score_partition = coordinator.score_partition
+    complete = coordinator.Coordinator._complete
+    broken = []
+
+    def malformed(data):
+        text, summary = score_partition(data)
+        if b'SWM,715,' in data and 'reply' not in broken:
+            broken.append('reply')
+            del summary['totals']
+        return text, summary
+
+    def failing_write(self, partition, reply, text):
+        if partition.index == 0 and 'write' not in broken:
+            broken.append('write')
+            raise OSError('диск заполнен')
+        complete(self, partition, reply, text)
+
+    monkeypatch.setattr(coordinator, 'score_partition', malformed)
+    monkeypatch.setattr(coordinator.Coordinator, '_complete', failing_write)
+    job = coordinator.Coordinator(packets, str(tmp_path / 'out'), workers,
+                                  partition_size=100, max_attempts=2)
+    result = []
+    runner = threading.Thread(target=lambda: result.append(job.run()),
+                              daemon=True)
+    runner.start()
+    runner.join(30)
+    assert not runner.is_alive()
+    assert result[0]['count'] == 60
+    assert sorted(broken) == ['reply', 'write']
+    assert sorted(job.attempts.values()) == [1, 1]
+
+
+def test_cli_spawned_workers(packets, tmp_path):
+    result = subprocess.run(
+        [sys.executable, 'coordinator.py', 'run', packets,
+         str(tmp_path / 'out'), '--spawn', '2', '--partition-size', '300',
+         '--merge'],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines() == _expected(packets)
+    assert 'Посчитано пакетов: 60' in result.stderr
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import equivalence
+from caloriescounter import InfoMessage
+from validation import RANGES, check_packet
+
+PACKETS = equivalence.generate_packets(300, seed=7)
+EXPECTED = equivalence.reference(PACKETS)
+
+
+def test_generate_packets_is_reproducible_and_valid():
+    assert equivalence.generate_packets(300, seed=7) == PACKETS
+    assert equivalence.generate_packets(300, seed=8) != PACKETS
+    assert all(check_packet(*packet) is None for packet in PACKETS)
+    edges = {value for _, data in PACKETS for value in data
+             if any(value in bounds for bounds in RANGES.values())}
+    assert {1 / 3600, 48, 500} & edges
+
+
+@pytest.mark.parametrize('name', list(equivalence.ENGINES))
+def test_engine_matches_reference(name):
+    engine = equivalence.ENGINES[name]
+    if engine.available is not None and not engine.available():
+        pytest.skip(f'{name} здесь недоступен')
+    expected = EXPECTED
+    if engine.reference_input is not None:
+        expected = equivalence.reference(engine.reference_input(PACKETS))
+    actual = engine.run(PACKETS)
+    assert equivalence.check(name, expected, actual,
+                             engine.tolerance) == []
+
+
+def _shifted(info, delta):
+    return InfoMessage(info.training_type, info.duration, info.distance,
+                       info.speed, info.calories * (1 + delta))
+
+
+def test_check_reports_mismatches():
+    broken = [_shifted(info, 1e-15) for info in EXPECTED]
+    mismatches = equivalence.check('broken', EXPECTED, broken)
+    assert len(mismatches) == equivalence.MAX_MISMATCHES
+    assert mismatches[0].field == 'calories'
+    assert equivalence.check('broken', EXPECTED, broken, 1e-12) == []
+
+    count = equivalence.check('short', EXPECTED, EXPECTED[1:])
+    assert count == [equivalence.Mismatch('short', -1, 'count',
+                                          len(EXPECTED), len(EXPECTED) - 1)]
+
+
+def test_check_text_with_tolerance():
+    info = InfoMessage('Running', 1.0, 2.0, 2.0, 12.3455)
+    nearby = InfoMessage('Running', 1.0, 2.0, 2.0,
+                         12.3455 * (1 + 1e-10)).get_message()
+    assert equivalence.check('text', [info], [nearby]) != []
+    assert equivalence.check('text', [info], [nearby], 1e-9) == []
+    far = InfoMessage('Running', 1.0, 2.0, 2.0, 12.4).get_message()
+    assert equivalence.check('text', [info], [far], 1e-9) != []
+
+
+def test_run_reports_mismatch_and_regression(tmp_path, monkeypatch,
+                                             capsys):
+    monkeypatch.setitem(
+        equivalence.ENGINES, 'broken',
+        equivalence.Engine(lambda packets: [
+            _shifted(info, 1e-9) for info in equivalence.reference(packets)]))
+    output = tmp_path / 'report.json'
+    assert equivalence.run(['--size', '50', '--seed', '3', '--only',
+                            'kernel', 'broken', '--min-seconds', '0',
+                            '--output', str(output)]) == 1
+    assert 'Расхождение broken' in capsys.readouterr().err
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert report['seed'] == 3
+    assert set(report['results']) == {'kernel', 'broken'}
+    assert {mismatch['engine'] for mismatch in report['mismatches']} == {
+        'broken'}
+
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps(
+        {'results': {'kernel': {'50': {'throughput': 1e15}}}}),
+        encoding='utf-8')
+    assert equivalence.run(['--size', '50', '--only', 'kernel',
+                            '--min-seconds', '0', '--output',
+                            str(output), '--baseline',
+                            str(baseline)]) == 1
+    assert 'Регрессия: kernel[50]' in capsys.readouterr().err
@@ -0,0 +1,62 @@
+import io
+import random
+
+import pytest
+
+import caloriescounter
+from conftest import Capturing
+
+
+def _infos():
+    rnd = random.Random(1)
+    infos = [caloriescounter.InfoMessage('Swimming', 1, 75, 1, 80),
+             caloriescounter.InfoMessage('Running', 4, 20, 4, -20.0005),
+             caloriescounter.InfoMessage('100%', 0.0005, 1e9, 0, 1.5)]
+    for _ in range(200):
+        infos.append(caloriescounter.InfoMessage(
+            rnd.choice(['Running', 'SportsWalking', 'Swimming']),
+            *(rnd.uniform(-1000, 1000) for _ in range(4))))
+    return infos
+
+
+@pytest.mark.parametrize('per_type_templates', [True, False])
+def test_format_messages_matches_get_message(per_type_templates):
+    infos = _infos()
+    expected = ''.join(info.get_message() + '\n' for info in infos)
+    assert caloriescounter.format_messages(
+        infos, per_type_templates) == expected
+
+
+def test_format_messages_batch():
+    infos = _infos()
+    batch = caloriescounter.InfoMessageBatch()
+    for info in infos:
+        batch.append_info(info)
+    expected = ''.join(info.get_message() + '\n' for info in infos)
+    assert caloriescounter.format_messages(batch) == expected
+
+
+def test_write_messages_single_write():
+    class CountingWriter(io.StringIO):
+        writes = 0
+
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+
+    file = CountingWriter()
+    caloriescounter.write_messages(_infos(), file)
+    assert file.writes == 1
+    caloriescounter.write_messages([], file)
+    assert file.writes == 1
+
+
+def test_main_batch_output():
+    packages = [('SWM', [720, 1, 80, 25, 40]), ('RUN', [15000, 1, 75])]
+    with Capturing() as expected:
+        for package in packages:
+            caloriescounter.main(caloriescounter.read_package(*package))
+    with Capturing() as output:
+        caloriescounter.main_batch(caloriescounter.read_package(*package)
+                                   for package in packages)
+    assert output == expected
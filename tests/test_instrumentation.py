@@ -0,0 +1,86 @@
+import io
+import json
+
+import pytest
+
+import instrumentation
+import streaming
+from conftest import Capturing
+
+PACKETS = 'RUN,15000,1,75\nWLK,9000,1,75,180\nRUN,15000,1,75\n'
+
+
+def test_histogram_buckets():
+    histogram = instrumentation.Histogram()
+    for ns in (100, 250, 251, 10 ** 7):
+        histogram.observe(ns)
+    assert histogram.counts[0] == 2
+    assert histogram.counts[1] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.total == 100 + 250 + 251 + 10 ** 7
+
+
+def test_sampling():
+    recorder = instrumentation.Recorder(sample_every=3)
+    assert [recorder.should_sample() for _ in range(6)] == [
+        True, False, False, True, False, False]
+    with pytest.raises(ValueError):
+        instrumentation.Recorder(sample_every=0)
+
+
+@pytest.mark.parametrize('sample_every, sampled, sampled_runs', [
+    (1, 3, 2),
+    (3, 1, 1),
+])
+def test_score_stream_records_stages(sample_every, sampled, sampled_runs):
+    recorder = instrumentation.Recorder(sample_every)
+    plain = list(streaming.score_stream(io.StringIO(PACKETS)))
+    chunks = list(streaming.score_stream(io.StringIO(PACKETS),
+                                         recorder=recorder))
+    assert [[info.get_message() for info in chunk] for chunk in chunks] == [
+        [info.get_message() for info in chunk] for chunk in plain]
+    assert recorder.calls['parse'] == 3
+    assert recorder.calls['dispatch'] == recorder.calls['calories'] == 3
+    assert recorder.sampled['calories'] == sampled
+    assert recorder.histograms['calories', 'RUN'].count == sampled_runs
+
+
+def test_prometheus_export():
+    recorder = instrumentation.Recorder()
+    recorder.observe('calories', 'RUN', 300)
+    recorder.observe('calories', 'RUN', 5_000_000)
+    text = recorder.prometheus()
+    assert 'fitness_tracker_stage_calls_total{stage="calories"} 2' in text
+    assert ('fitness_tracker_packet_seconds_bucket{stage="calories",'
+            'type="RUN",le="5e-07"} 1') in text
+    assert ('fitness_tracker_packet_seconds_bucket{stage="calories",'
+            'type="RUN",le="+Inf"} 2') in text
+    assert ('fitness_tracker_packet_seconds_count{stage="calories",'
+            'type="RUN"} 2') in text
+
+
+def test_prometheus_exports_sampled():
+    recorder = instrumentation.Recorder(sample_every=3)
+    list(streaming.score_stream(io.StringIO(PACKETS), recorder=recorder))
+    text = recorder.prometheus()
+    assert 'fitness_tracker_stage_calls_total{stage="calories"} 3' in text
+    assert 'fitness_tracker_stage_sampled_total{stage="calories"} 1' in text
+
+
+def test_cli_metrics_and_profile(tmp_path, capsys):
+    path = tmp_path / 'packets.csv'
+    path.write_text(PACKETS, encoding='utf-8')
+    metrics = tmp_path / 'metrics.json'
+    profile = tmp_path / 'run.pstats'
+    with Capturing() as plain:
+        streaming.run([str(path)])
+    with Capturing() as output:
+        streaming.run([str(path), '--metrics', str(metrics),
+                       '--profile', str(profile), '--tracemalloc', '3'])
+    assert output == plain
+    report = json.loads(metrics.read_text(encoding='utf-8'))
+    assert set(report['stages']) == {'parse', 'dispatch', 'calories',
+                                     'format', 'write'}
+    assert report['stages']['write']['calls'] == 3
+    assert profile.stat().st_size > 0
+    assert capsys.readouterr().err.count('\n') == 3
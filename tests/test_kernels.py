@@ -0,0 +1,99 @@
+import pytest
+
+import caloriescounter
+from benchmark import generate_packages
+
+
+def _reference(training):
+    return (training.get_distance(), training.get_mean_speed(),
+            training.get_spent_calories())
+
+
+def test_kernels_registered():
+    assert set(caloriescounter.KERNELS) == {'Running', 'SportsWalking',
+                                            'Swimming'}
+    assert caloriescounter.Training.kernel is None
+
+
+def test_kernels_match_methods_bit_for_bit():
+    for workout_type, data in generate_packages(3000, seed=11):
+        training = caloriescounter.read_package(workout_type, data)
+        expected = _reference(training)
+        assert type(training).kernel(*data) == expected
+        info = training.show_training_info()
+        assert (info.training_type, info.duration) == (
+            type(training).__name__, data[1])
+        assert (info.distance, info.speed, info.calories) == expected
+
+
+def test_new_workout_type_gets_kernel():
+    class Cycling(caloriescounter.Training):
+        __slots__ = ()
+        LEN_STEP = 5.5
+        CALORIES_COEFF = 0.5
+        CALORIES_FORMULA = 'CALORIES_COEFF * speed * weight * duration'
+
+        def get_spent_calories(self):
+            return (self.CALORIES_COEFF * self.get_mean_speed()
+                    * self.weight * self.duration)
+
+    training = Cycling(1000, 2, 70)
+    assert caloriescounter.KERNELS['Cycling'] is Cycling.kernel
+    assert Cycling.kernel(1000, 2, 70) == _reference(training)
+    assert training.show_training_info().calories == (
+        training.get_spent_calories())
+    del caloriescounter.KERNELS['Cycling']
+
+
+def test_overridden_method_without_formula_disables_kernel():
+    class SlowRunning(caloriescounter.Running):
+        __slots__ = ()
+
+        def get_spent_calories(self):
+            return 1.0
+
+    assert SlowRunning.kernel is None
+    assert SlowRunning(15000, 1, 75).show_training_info().calories == 1.0
+
+
+def test_unknown_name_in_formula():
+    with pytest.raises(NameError):
+        class Broken(caloriescounter.Training):
+            CALORIES_FORMULA = 'weight * UNKNOWN'
+
+            def get_spent_calories(self):
+                return 0.0
+
+
+def test_subclass_with_own_constructor_uses_methods():
+    class NotedRunning(caloriescounter.Running):
+        __slots__ = ('note',)
+
+        def __init__(self, *args, note='', **kwargs):
+            super().__init__(*args, **kwargs)
+            self.note = note
+
+    class MetricRunning(caloriescounter.Running):
+        __slots__ = ()
+        CALORIES_FORMULA = caloriescounter.Running.CALORIES_FORMULA
+
+        def __init__(self, steps, hours, kg):
+            super().__init__(steps, hours, kg)
+
+    expected = _reference(caloriescounter.Running(15000, 1, 75))
+    for cls in (NotedRunning, MetricRunning):
+        assert cls.kernel is None
+        info = cls(15000, 1, 75).show_training_info()
+        assert info.training_type == cls.__name__
+        assert (info.distance, info.speed, info.calories) == expected
+
+
+def test_method_replaced_on_instance():
+    training = caloriescounter.Running(15000, 1, 75)
+    expected = training.show_training_info()
+    training.get_spent_calories = lambda: 0.0
+    info = training.show_training_info()
+    assert info.calories == 0.0
+    assert (info.distance, info.speed) == (expected.distance, expected.speed)
+    other = caloriescounter.Running(15000, 1, 75)
+    assert other.show_training_info().calories == expected.calories
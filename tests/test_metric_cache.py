@@ -0,0 +1,84 @@
+import copy
+import pickle
+
+import pytest
+
+import caloriescounter
+
+TRAININGS = [
+    (caloriescounter.Running, [15000, 1, 75], 'weight', 80),
+    (caloriescounter.SportsWalking, [9000, 1, 75, 180], 'height', 170),
+    (caloriescounter.Swimming, [720, 1, 80, 25, 40], 'count_pool', 50),
+]
+
+
+def _metrics(training):
+    return (training.get_distance(), training.get_mean_speed(),
+            training.get_spent_calories())
+
+
+@pytest.mark.parametrize('cls, data, field, value', TRAININGS)
+def test_cache_keeps_results(cls, data, field, value):
+    training = cls(*data).enable_metric_cache()
+    assert training.__class__.__name__ == cls.__name__
+    assert isinstance(training, cls)
+    assert _metrics(training) == _metrics(cls(*data))
+    assert (training.show_training_info().get_message()
+            == cls(*data).show_training_info().get_message())
+
+
+@pytest.mark.parametrize('cls, data, field, value', TRAININGS)
+def test_cache_counters(cls, data, field, value):
+    training = cls(*data).enable_metric_cache()
+    training.show_training_info()
+    info = training.cache_info()
+    assert info.misses == 3
+    assert info.currsize == 3
+    hits = info.hits
+    training.show_training_info()
+    assert training.cache_info().hits == hits + 3
+    assert training.cache_info().misses == 3
+
+
+@pytest.mark.parametrize('cls, data, field, value', TRAININGS)
+@pytest.mark.parametrize('mutated', ['action', 'duration', 'field'])
+def test_cache_invalidation(cls, data, field, value, mutated):
+    training = cls(*data).enable_metric_cache()
+    _metrics(training)
+    name = field if mutated == 'field' else mutated
+    setattr(training, name, value)
+    assert training.cache_info().currsize == 0
+    fresh = cls(*data)
+    setattr(fresh, name, value)
+    assert _metrics(training) == _metrics(fresh)
+
+
+def test_cache_disabled_by_default():
+    training = caloriescounter.Running(15000, 1, 75)
+    training.show_training_info()
+    assert training.cache_info() == (0, 0, 0)
+    assert type(training) is caloriescounter.Running
+
+
+def test_cache_enable_twice_and_clear():
+    training = caloriescounter.Running(15000, 1, 75)
+    training.enable_metric_cache().enable_metric_cache()
+    assert type(training).__mro__[1] is caloriescounter.Running
+    training.get_distance()
+    training.cache_clear()
+    assert training.cache_info() == (0, 0, 0)
+
+
+@pytest.mark.parametrize('clone', [copy.copy, copy.deepcopy,
+                                   lambda t: pickle.loads(pickle.dumps(t))])
+def test_copies_get_own_cache(clone):
+    training = caloriescounter.Running(15000, 1, 75).enable_metric_cache()
+    training.get_distance()
+    other = clone(training)
+    assert type(other) is type(training)
+    assert other.cache_info() == (0, 0, 0)
+    other.action = 1
+    assert training.get_distance() == 9.75
+    assert other.get_distance() == 1 * 0.65 / 1000
+    assert training.get_distance() == 9.75
+    assert training.cache_info().hits == 2
@@ -0,0 +1,93 @@
+import pytest
+
+import caloriescounter
+import packetfile
+import validation
+
+PACKAGES = [
+    ('SWM', [720, 1, 80, 25, 40]),
+    ('RUN', [15000, 1, 75]),
+    ('WLK', [9000, 1.5, 75.5, 180]),
+    ('RUN', [1206, 12, 6]),
+]
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'packets.bin')
+    assert packetfile.write_packets(path, PACKAGES) == len(PACKAGES)
+    return path
+
+
+def test_roundtrip(path):
+    with packetfile.PacketFile(path) as packets:
+        assert len(packets) == len(PACKAGES)
+        assert list(packets) == PACKAGES
+        assert packets.action.format == 'i'
+        assert packets.duration.format == 'f'
+
+
+def test_calculate_matches_classes(path):
+    with packetfile.PacketFile(path) as packets:
+        result = packets.calculate()
+        decoded = list(packets)
+    for i, package in enumerate(decoded):
+        training = caloriescounter.read_package(*package)
+        assert result.distance[i] == training.get_distance()
+        assert result.speed[i] == training.get_mean_speed()
+        assert result.calories[i] == training.get_spent_calories()
+
+
+def test_empty_file(tmp_path):
+    path = str(tmp_path / 'empty.bin')
+    packetfile.write_packets(path, [])
+    with packetfile.PacketFile(path) as packets:
+        assert len(packets) == 0
+        assert list(packets) == []
+
+
+@pytest.mark.parametrize('package', [
+    ('XXX', [1, 2, 3]),
+    ('SWM', [720, 1, 80]),
+    ('RUN', [15000.5, 1, 75]),
+    ('WLK', [9000, 1, 75, 180.5]),
+    ('RUN', [2 ** 31, 1, 75]),
+    ('RUN', [15000, '1', 75]),
+])
+def test_write_rejects_bad_packages(tmp_path, package):
+    with pytest.raises(ValueError):
+        packetfile.write_packets(str(tmp_path / 'bad.bin'), [package])
+
+
+def test_write_rejects_wide_type_id(tmp_path, monkeypatch):
+    for name in ('WORKOUT_TYPES', 'TYPE_CODES', '_DISPATCH', '_BY_TYPE_ID',
+                 'KERNELS'):
+        monkeypatch.setattr(caloriescounter, name,
+                            getattr(caloriescounter, name).copy())
+
+    @caloriescounter.register_workout('BIG', type_id=300)
+    class Big(caloriescounter.Running):
+        __slots__ = ()
+
+    with pytest.raises(ValueError, match='300'):
+        packetfile.write_packets(str(tmp_path / 'bad.bin'),
+                                 [('BIG', [1, 1, 1])])
+
+
+@pytest.mark.parametrize('content', [b'', b'XXXX' + bytes(12),
+                                     packetfile.HEADER.pack(b'FTPK', 1, 0, 9)])
+def test_reader_rejects_bad_files(tmp_path, content):
+    path = tmp_path / 'bad.bin'
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        packetfile.PacketFile(str(path))
+
+
+def test_check_rejects_bad_rows(tmp_path):
+    path = str(tmp_path / 'packets.bin')
+    packetfile.write_packets(path, PACKAGES + [('RUN', [15000, 0, 75]),
+                                               ('WLK', [9000, 1, 75, 0])])
+    with packetfile.PacketFile(path) as packets:
+        reasons = [validation.REASONS[code] for code in packets.check()]
+    assert reasons == ['ok'] * len(PACKAGES) + ['duration_range',
+                                                'height_range']
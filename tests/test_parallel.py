@@ -0,0 +1,34 @@
+import pytest
+
+import caloriescounter
+import parallel
+import streaming
+
+LINES = [f'RUN,{1000 + i},1,75\n' if i % 3 else f'SWM,{i},1,80,25,40\n'
+         for i in range(50)]
+
+
+def _expected():
+    return [caloriescounter.read_package(*package).show_training_info()
+            .get_message() for package in streaming.iter_packets(LINES)]
+
+
+def test_pack_roundtrip():
+    infos = [caloriescounter.read_package('RUN', [15000, 1, 75])
+             .show_training_info(),
+             caloriescounter.read_package('WLK', [9000, 1, 75, 180])
+             .show_training_info()]
+    unpacked = parallel.unpack_results(parallel.pack_results(infos))
+    assert ([info.get_message() for info in unpacked]
+            == [info.get_message() for info in infos])
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_score_parallel(ordered):
+    chunks = list(parallel.score_parallel(LINES, workers=2, chunk_size=7,
+                                          ordered=ordered))
+    messages = [info.get_message() for chunk in chunks for info in chunk]
+    if ordered:
+        assert messages == _expected()
+    else:
+        assert sorted(messages) == sorted(_expected())
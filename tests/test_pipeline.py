@@ -0,0 +1,111 @@
+import io
+import time
+
+import pytest
+
+import pipeline
+import streaming
+from caloriescounter import UnknownWorkoutTypeError, format_messages
+from conftest import Capturing
+from instrumentation import Recorder
+
+PACKETS = ['SWM,720,1,80,25,40\n', 'RUN,15000,1,75\n',
+           'WLK,9000,1,75,180\n'] * 20
+
+
+def expected(lines):
+    chunks = streaming.score_stream(lines)
+    return ''.join(format_messages(chunk) for chunk in chunks)
+
+
+@pytest.mark.parametrize('batch_size, queue_depth', [(1, 1), (7, 2),
+                                                     (1000, 4)])
+def test_pipeline_matches_streaming(batch_size, queue_depth):
+    output = io.StringIO()
+    stats = pipeline.run_pipeline(PACKETS, output, batch_size, queue_depth)
+    assert output.getvalue() == expected(PACKETS)
+    for name in pipeline.STAGES:
+        assert stats.stages[name].items == len(PACKETS)
+    assert stats.stages['read'].batches == -(-len(PACKETS) // batch_size)
+    assert stats.wall_ns > 0
+    assert stats.bottleneck in pipeline.STAGES
+
+
+def test_pipeline_finds_slow_writer():
+    class SlowOutput(io.StringIO):
+        def write(self, text):
+            time.sleep(0.02)
+            return super().write(text)
+
+    stats = pipeline.run_pipeline(PACKETS, SlowOutput(), batch_size=10)
+    assert stats.bottleneck == 'write'
+    assert stats.utilization('write') > 0.5
+    assert stats.stages['score'].output_wait_ns > 0
+    report = stats.as_dict()
+    assert report['bottleneck'] == 'write'
+    assert set(report['stages']) == set(pipeline.STAGES)
+    assert 'узкое место - write' in stats.format()
+
+
+def test_pipeline_scoring_error_stops_threads():
+    lines = PACKETS + ['XXX,1,2,3\n'] + PACKETS * 100
+    with pytest.raises(UnknownWorkoutTypeError):
+        pipeline.run_pipeline(lines, io.StringIO(), batch_size=5,
+                              queue_depth=1)
+
+
+def test_pipeline_reader_error_is_raised():
+    def lines():
+        yield from PACKETS
+        raise OSError('диск')
+
+    with pytest.raises(OSError, match='диск'):
+        pipeline.run_pipeline(lines(), io.StringIO(), batch_size=5)
+
+
+def test_pipeline_writer_error_is_raised():
+    class BrokenOutput(io.StringIO):
+        def write(self, text):
+            raise BrokenPipeError
+
+    with pytest.raises(BrokenPipeError):
+        pipeline.run_pipeline(PACKETS * 100, BrokenOutput(), batch_size=5,
+                              queue_depth=1)
+
+
+def test_pipeline_validator_and_recorder():
+    from validation import Validator
+
+    validator = Validator()
+    recorder = Recorder()
+    output = io.StringIO()
+    lines = PACKETS + ['RUN,15000,0,75\n', 'мусор\n']
+    pipeline.run_pipeline(lines, output, batch_size=4, recorder=recorder,
+                          validator=validator)
+    assert output.getvalue() == expected(PACKETS)
+    assert validator.counts == {'duration_range': 1, 'unknown_type': 1}
+    assert recorder.calls['parse'] == len(PACKETS)
+    assert recorder.calls['write'] == len(PACKETS)
+    assert recorder.calls['calories'] == len(PACKETS)
+
+
+@pytest.mark.parametrize('batch_size, queue_depth', [(0, 1), (1, 0)])
+def test_pipeline_rejects_bad_sizes(batch_size, queue_depth):
+    with pytest.raises(ValueError):
+        pipeline.run_pipeline(PACKETS, io.StringIO(), batch_size,
+                              queue_depth)
+
+
+def test_run_pipeline_flag(tmp_path, capsys):
+    path = tmp_path / 'packets.csv'
+    path.write_text(''.join(PACKETS), encoding='utf-8')
+    streaming.run([str(path), '--pipeline-stats', '--chunk-size', '8',
+                   '--queue-depth', '2'])
+    captured = capsys.readouterr()
+    assert captured.out == expected(PACKETS)
+    assert captured.err.startswith('Конвейер:')
+
+
+def test_run_pipeline_needs_one_worker():
+    with Capturing(), pytest.raises(SystemExit):
+        streaming.run(['-', '--pipeline', '--workers', '2'])
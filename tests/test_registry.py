@@ -0,0 +1,112 @@
+import sys
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+import caloriescounter
+import streaming
+
+PLUGIN = '''
+import caloriescounter
+
+
+class Rowing(caloriescounter.Training):
+    __slots__ = ()
+    LEN_STEP = 10
+    CALORIES_FORMULA = 'speed * weight'
+
+    def get_spent_calories(self):
+        return self.get_mean_speed() * self.weight
+'''
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Восстановить реестр после теста."""
+    for name in ('WORKOUT_TYPES', 'TYPE_CODES', '_DISPATCH',
+                 '_BY_TYPE_ID', '_LAZY', 'KERNELS'):
+        saved = getattr(caloriescounter, name).copy()
+        monkeypatch.setattr(caloriescounter, name, saved)
+    monkeypatch.setattr(caloriescounter, '_entry_points_loaded', False)
+    monkeypatch.setattr(caloriescounter, '_entry_points', lambda: [])
+    return caloriescounter
+
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch):
+    (tmp_path / 'rowing_plugin.py').write_text(PLUGIN, encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield 'rowing_plugin:Rowing'
+    sys.modules.pop('rowing_plugin', None)
+
+
+def test_builtin_types():
+    assert caloriescounter.TYPE_CODES == {'SWM': 0, 'RUN': 1, 'WLK': 2}
+    assert caloriescounter.get_workout_type('SWM') == (
+        'SWM', caloriescounter.Swimming, 5, 0)
+    assert caloriescounter.get_workout_type('RUN').arity == 3
+    assert caloriescounter.get_workout_type('WLK').arity == 4
+
+
+def test_unknown_type_error(registry):
+    with pytest.raises(caloriescounter.UnknownWorkoutTypeError) as error:
+        caloriescounter.read_package('XXX', [1, 2, 3])
+    assert error.value.workout_type == 'XXX'
+    assert isinstance(error.value, ValueError)
+
+
+def test_register_decorator(registry):
+    @registry.register_workout('ELL')
+    class Elliptical(caloriescounter.Running):
+        __slots__ = ()
+
+    assert registry.TYPE_CODES['ELL'] == 3
+    training = caloriescounter.read_package('ELL', [1000, 1, 70])
+    assert isinstance(training, Elliptical)
+
+
+@pytest.mark.parametrize('cls', [dict, None])
+def test_register_validates_once(registry, cls):
+    if cls is None:
+        class Variadic(caloriescounter.Training):
+            def __init__(self, *data):
+                super().__init__(*data)
+        cls = Variadic
+    with pytest.raises(TypeError):
+        registry.register_workout('BAD', cls)
+
+
+def test_register_rejects_taken_codes(registry):
+    with pytest.raises(ValueError):
+        registry.register_workout('RUN', caloriescounter.SportsWalking)
+    with pytest.raises(ValueError):
+        registry.register_workout('NEW', caloriescounter.Running, type_id=0)
+
+
+def test_lazy_registration(registry, plugin):
+    registry.register_lazy_workout('ROW', plugin)
+    assert 'rowing_plugin' not in sys.modules
+    assert registry.TYPE_CODES['ROW'] == 3
+    training = caloriescounter.read_package('ROW', [100, 1, 80])
+    assert type(training).__name__ == 'Rowing'
+    assert registry.get_workout_type('ROW').arity == 3
+    result = caloriescounter.calculate_batch([3], [100], [1], [80])
+    assert list(result.calories) == [training.get_spent_calories()]
+
+
+def test_entry_points(registry, plugin, monkeypatch):
+    entry_point = SimpleNamespace(name='ROW', value=plugin)
+    monkeypatch.setattr(registry, '_entry_points', lambda: [entry_point])
+    training = caloriescounter.read_package('ROW', [100, 1, 80])
+    assert type(training).__name__ == 'Rowing'
+
+
+def test_stream_counts_unknown_types(registry):
+    lines = ['RUN,15000,1,75', 'CYC,1,2,3', 'CYC,1,2,3', 'SWM,720,1,80,25,40']
+    unknown = Counter()
+    chunks = list(streaming.score_stream(lines, unknown=unknown))
+    assert len(chunks[0]) == 2
+    assert unknown == {'CYC': 2}
+    with pytest.raises(caloriescounter.UnknownWorkoutTypeError):
+        list(streaming.score_stream(lines))
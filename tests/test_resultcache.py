@@ -0,0 +1,111 @@
+import pytest
+
+import caloriescounter
+import resultcache
+import streaming
+from conftest import Capturing
+
+RUN = ('RUN', [15000, 1, 75])
+WLK = ('WLK', [9000, 1.5, 75, 180])
+SWM = ('SWM', [720, 1, 80, 25, 40])
+
+
+def _expected(package):
+    return caloriescounter.read_package(*package).show_training_info()
+
+
+def test_packet_key_depends_on_content():
+    key = resultcache.packet_key(*RUN)
+    assert key == resultcache.packet_key('RUN', [15000, 1, 75])
+    assert key != resultcache.packet_key('RUN', [15000, 1, 76])
+    assert key != resultcache.packet_key('WLK', [15000, 1, 75])
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmp_path):
+    path = str(tmp_path / 'cache.db') if request.param == 'sqlite' else None
+    cache = resultcache.make_cache(size=2, path=path)
+    yield cache
+    cache.close()
+
+
+def test_hit_returns_same_result(cache):
+    first = cache.score(*SWM)
+    second = cache.score(*SWM)
+    assert first.get_message() == second.get_message()
+    assert second.get_message() == _expected(SWM).get_message()
+    assert cache.stats() == (1, 1, 0)
+
+
+def test_lru_eviction(monkeypatch, cache):
+    monkeypatch.setattr(resultcache, 'EVICT_EVERY', 1)
+    cache.score(*RUN)
+    cache.score(*WLK)
+    cache.score(*RUN)
+    cache.score(*SWM)
+    assert len(cache.backend) == 2
+    assert cache.stats().evictions == 1
+    cache.score(*RUN)
+    assert cache.stats().hits == 2
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resultcache.time, 'monotonic', lambda: now[0])
+    cache = resultcache.make_cache(ttl=10)
+    cache.score(*RUN)
+    now[0] += 5
+    cache.score(*RUN)
+    now[0] += 11
+    cache.score(*RUN)
+    assert cache.stats() == (1, 2, 1)
+
+
+def test_sqlite_hits_record_use_in_batches(monkeypatch, tmp_path):
+    now = [1000.0]
+    monkeypatch.setattr(resultcache.time, 'time', lambda: now[0])
+    monkeypatch.setattr(resultcache, 'USED_FLUSH_EVERY', 2)
+    cache = resultcache.make_cache(path=str(tmp_path / 'cache.db'))
+    cache.score(*RUN)
+    cache.score(*WLK)
+
+    def used():
+        return sorted(row[0] for row in cache.backend._connection.execute(
+            'SELECT used FROM results'))
+
+    now[0] = 2000.0
+    cache.score(*RUN)
+    assert used() == [1000.0, 1000.0]
+    cache.score(*WLK)
+    assert used() == [2000.0, 2000.0]
+    assert cache.stats() == (2, 2, 0)
+    cache.close()
+
+
+def test_memory_hit_returns_stored_result():
+    cache = resultcache.make_cache()
+    first = cache.score(*RUN)
+    assert cache.score('RUN', [15000, 1, 75]) is first
+
+
+def test_sqlite_shared_between_caches(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    writer = resultcache.make_cache(path=path)
+    writer.score(*WLK)
+    reader = resultcache.make_cache(path=path)
+    assert reader.score(*WLK).get_message() == _expected(WLK).get_message()
+    assert reader.stats().hits == 1
+    writer.close()
+    reader.close()
+
+
+def test_run_output_unchanged(tmp_path, capsys):
+    path = tmp_path / 'packets.csv'
+    path.write_text('RUN,15000,1,75\nSWM,720,1,80,25,40\nRUN,15000,1,75\n',
+                    encoding='utf-8')
+    with Capturing() as plain:
+        streaming.run([str(path)])
+    with Capturing() as cached:
+        streaming.run([str(path), '--cache-size', '10', '--cache-stats'])
+    assert cached == plain
+    assert 'hits=1' in capsys.readouterr().err
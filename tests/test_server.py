@@ -0,0 +1,175 @@
+import asyncio
+import socket
+import struct
+
+import pytest
+
+import caloriescounter
+import server
+
+PACKAGES = [
+    ('SWM', [720, 1, 80, 25, 40]),
+    ('RUN', [15000, 1, 75]),
+    ('WLK', [9000, 1.5, 75, 180]),
+]
+
+
+def _message(package):
+    return (caloriescounter.read_package(*package).show_training_info()
+            .get_message())
+
+
+def _run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 10))
+
+
+async def _start(**kwargs):
+    service = server.ScoringServer(**kwargs)
+    await service.start()
+    host, port = service.address[:2]
+    return service, host, port
+
+
+def test_text_and_binary_replies():
+    async def scenario():
+        service, host, port = await _start()
+        client = await server.ScoringClient.connect(host, port)
+        text = await client.score(*PACKAGES[0])
+        binary = await client.score(*PACKAGES[1], binary=True)
+        await client.close()
+        await service.shutdown()
+        return text, binary
+
+    text, binary = _run(scenario())
+    assert text == _message(PACKAGES[0])
+    info = caloriescounter.read_package(*PACKAGES[1]).show_training_info()
+    assert binary == ('RUN', info.duration, info.distance,
+                      info.speed, info.calories)
+
+
+def test_concurrent_clients_are_batched():
+    async def scenario():
+        service, host, port = await _start(max_batch_size=64,
+                                           max_latency=0.05)
+        clients = [await server.ScoringClient.connect(host, port)
+                   for _ in range(10)]
+        replies = await asyncio.gather(*(client.score_many(PACKAGES * 5)
+                                         for client in clients))
+        for client in clients:
+            await client.close()
+        await service.shutdown()
+        return service, replies
+
+    service, replies = _run(scenario())
+    expected = [_message(package) for package in PACKAGES * 5]
+    assert all(reply == expected for reply in replies)
+    assert service.requests == 150
+    assert service.batches < 150
+
+
+def test_error_reply():
+    async def scenario():
+        service, host, port = await _start()
+        client = await server.ScoringClient.connect(host, port)
+        try:
+            with pytest.raises(server.ScoringError):
+                await client.score('XXX', [1, 2, 3])
+            return await client.score(*PACKAGES[0])
+        finally:
+            await client.close()
+            await service.shutdown()
+
+    assert _run(scenario()) == _message(PACKAGES[0])
+
+
+def test_connection_limit():
+    async def scenario():
+        service, host, port = await _start(max_connections=1)
+        first = await server.ScoringClient.connect(host, port)
+        await first.score(*PACKAGES[0])
+        second = await server.ScoringClient.connect(host, port)
+        try:
+            with pytest.raises(server.ScoringError):
+                await second.score(*PACKAGES[0])
+        finally:
+            await second.close()
+            await first.close()
+            await service.shutdown()
+
+    _run(scenario())
+
+
+def test_unix_socket_and_graceful_shutdown(tmp_path):
+    path = str(tmp_path / 'scoring.sock')
+
+    async def scenario():
+        service = server.ScoringServer(max_latency=0.01)
+        await service.start(path=path)
+        client = await server.ScoringClient.connect(path=path)
+        pending = asyncio.ensure_future(client.score_many(PACKAGES))
+        await asyncio.sleep(0.001)
+        await service.shutdown()
+        replies = await pending
+        await client.close()
+        return replies
+
+    assert _run(scenario()) == [_message(package) for package in PACKAGES]
+
+
+def test_score_requests_isolates_errors():
+    bodies = [server.REPLY_TEXT + b'RUN,15000,1,75',
+              server.REPLY_TEXT + b'XXX,1,2,3',
+              server.REPLY_BINARY + b'SWM,720,1,80,25,40']
+    replies = server.score_requests(bodies)
+    assert replies == [server.score_request(body) for body in bodies]
+    assert replies[1].startswith(server.REPLY_ERROR)
+    good = [bodies[0], bodies[2]]
+    assert server.score_requests(good) == [server.score_request(body)
+                                           for body in good]
+
+
+def test_shutdown_with_idle_client_connected():
+    async def scenario():
+        service, host, port = await _start()
+        client = await server.ScoringClient.connect(host, port)
+        await client.score(*PACKAGES[0])
+        await asyncio.wait_for(service.shutdown(), 2)
+        await client.close()
+
+    _run(scenario())
+
+
+def test_binary_reply_that_does_not_pack_is_an_error(monkeypatch):
+    monkeypatch.setitem(caloriescounter.TYPE_CODES, 'RUN', 300)
+    bodies = [server.REPLY_BINARY + b'RUN,15000,1,75',
+              server.REPLY_TEXT + b'RUN,15000,1,75']
+    replies = server.score_requests(bodies)
+    assert replies[0].startswith(server.REPLY_ERROR)
+    assert replies[1] == server.REPLY_TEXT + _message(PACKAGES[1]).encode()
+
+
+def test_reset_pipelining_clients_release_handlers():
+    request = server.ScoringClient._request(*PACKAGES[1], binary=False)
+
+    async def scenario():
+        service, host, port = await _start(max_connections=3,
+                                           max_pending=4)
+        for _ in range(3):
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request * 50000)
+            await asyncio.sleep(0.2)
+            writer.get_extra_info('socket').setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            writer.transport.abort()
+        for _ in range(100):
+            if not service._handlers:
+                break
+            await asyncio.sleep(0.05)
+        assert not service._handlers
+        client = await server.ScoringClient.connect(host, port)
+        reply = await client.score(*PACKAGES[0])
+        await client.close()
+        await service.shutdown()
+        return reply
+
+    assert _run(scenario()) == _message(PACKAGES[0])
@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import caloriescounter
+import storage
+
+MONDAY = datetime(2026, 10, 12, 9, tzinfo=timezone.utc)
+TUESDAY = datetime(2026, 10, 13, 9, tzinfo=timezone.utc)
+NEXT_MONTH = datetime(2026, 11, 2, 9, tzinfo=timezone.utc)
+
+RECORDS = [
+    ('u1', MONDAY, 'RUN', [15000, 1, 75]),
+    ('u1', TUESDAY, 'SWM', [720, 1, 80, 25, 40]),
+    ('u1', NEXT_MONTH, 'WLK', [9000, 1.5, 75, 180]),
+    ('u2', TUESDAY, 'RUN', [12000, 0.5, 60]),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    with storage.WorkoutStore(str(tmp_path / 'workouts.db'),
+                              batch_size=2) as store:
+        yield store
+
+
+def _info(workout_type, data):
+    return caloriescounter.read_package(workout_type, data) \
+        .show_training_info()
+
+
+def test_insert_and_range_queries(store):
+    assert store.insert_many(
+        (*record, None) for record in RECORDS) == len(RECORDS)
+    rows = list(store.by_user('u1', MONDAY, NEXT_MONTH))
+    assert [row.workout_type for row in rows] == ['RUN', 'SWM']
+    assert rows[1].data == [720, 1, 80, 25, 40]
+    assert rows[1].info.get_message() == _info(
+        'SWM', [720, 1, 80, 25, 40]).get_message()
+    assert rows[0].timestamp == MONDAY.timestamp()
+    runs = list(store.by_type('Running', MONDAY, NEXT_MONTH))
+    assert [row.user_id for row in runs] == ['u1', 'u2']
+
+
+def test_range_reads_stream(store, monkeypatch):
+    monkeypatch.setattr(storage, 'FETCH_SIZE', 2)
+    store.insert_many(('u1', MONDAY.timestamp() + i, 'RUN',
+                       [15000 + i, 1, 75], None) for i in range(5))
+    rows = store.by_user('u1', MONDAY, NEXT_MONTH)
+    assert next(rows).data == [15000, 1, 75]
+    assert len(list(rows)) == 4
+
+
+def test_rollups(store):
+    store.insert_many((*record, None) for record in RECORDS)
+    store.insert('u1', TUESDAY, 'RUN', [15000, 1, 75])
+    weeks = store.rollups('u1', 'week')
+    assert [(week.bucket, week.count) for week in weeks] == [
+        ('2026-10-12', 3), ('2026-11-02', 1)]
+    runs = store.rollups('u1', 'day', 'Running')
+    assert [(day.bucket, day.count) for day in runs] == [
+        ('2026-10-12', 1), ('2026-10-13', 1)]
+    month = store.rollups('u1', 'month')[0]
+    infos = [_info('RUN', [15000, 1, 75]),
+             _info('SWM', [720, 1, 80, 25, 40]),
+             _info('RUN', [15000, 1, 75])]
+    assert month.calories == pytest.approx(sum(i.calories for i in infos))
+    assert month.speed_max == max(i.speed for i in infos)
+    assert month.mean_speed == pytest.approx(
+        sum(i.speed for i in infos) / 3)
+    with pytest.raises(ValueError):
+        store.rollups('u1', 'year')
+
+
+def test_bad_packet_writes_nothing(store):
+    with pytest.raises(caloriescounter.UnknownWorkoutTypeError):
+        store.insert_many([('u1', MONDAY, 'RUN', [15000, 1, 75], None),
+                           ('u1', MONDAY, 'XXX', [1], None)])
+    assert list(store.by_user('u1', MONDAY, NEXT_MONTH)) == []
+
+
+def test_failed_batch_is_rolled_back(store):
+    broken = caloriescounter.InfoMessage(None, 1, 1, 1, 1)
+    with pytest.raises(sqlite3.IntegrityError):
+        store.insert_many([('u1', MONDAY, 'RUN', [15000, 1, 75], None),
+                           ('u1', MONDAY, 'RUN', [15000, 1, 75], broken)])
+    assert list(store.by_user('u1', MONDAY, NEXT_MONTH)) == []
+    assert store.rollups('u1', 'day') == []
+    store.insert('u1', MONDAY, 'RUN', [15000, 1, 75])
+    assert len(list(store.by_user('u1', MONDAY, NEXT_MONTH))) == 1
+
+
+def test_open_readers_do_not_block_pool(tmp_path):
+    with storage.WorkoutStore(str(tmp_path / 'small.db'),
+                              pool_size=2) as store:
+        for i in range(3):
+            store.insert('u1', MONDAY.timestamp() + i, 'RUN',
+                         [15000, 1, 75])
+        readers = [store.by_user('u1', MONDAY, NEXT_MONTH)
+                   for _ in range(3)]
+        for reader in readers:
+            next(reader)
+        store.insert('u1', MONDAY.timestamp() + 10, 'RUN', [15000, 1, 75])
+        assert store.rollups('u1', 'day')[0].count == 4
+        assert all(len(list(reader)) == 2 for reader in readers)
+
+
+def test_concurrent_ingest(store):
+    def ingest(user):
+        store.insert_many((user, MONDAY.timestamp() + i, 'RUN',
+                           [15000, 1, 75], None) for i in range(50))
+
+    threads = [threading.Thread(target=ingest, args=(f'u{n}',))
+               for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for n in range(4):
+        assert store.rollups(f'u{n}', 'day')[0].count == 50
@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+import caloriescounter
+import streaming
+from conftest import Capturing
+
+PACKETS = '''# тренировки за день
+SWM,720,1,80,25,40
+["RUN", [15000, 1, 75]]
+
+{"type": "WLK", "data": [9000, 1.5, 75, 180]}
+'''
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('SWM,720,1,80,25,40', ('SWM', [720, 1, 80, 25, 40])),
+    ('RUN, 15000, 0.5, 75.5', ('RUN', [15000, 0.5, 75.5])),
+    ('["WLK", [9000, 1, 75, 180]]', ('WLK', [9000, 1, 75, 180])),
+    ('{"type": "RUN", "data": [1, 2, 3]}', ('RUN', [1, 2, 3])),
+    ('   ', None),
+    ('# комментарий', None),
+])
+def test_parse_line(line, expected):
+    assert streaming.parse_line(line) == expected
+
+
+def test_score_stream_chunks():
+    chunks = list(streaming.score_stream(io.StringIO(PACKETS), chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    messages = [info.get_message() for chunk in chunks for info in chunk]
+    expected = [
+        caloriescounter.read_package(*package).show_training_info()
+        .get_message()
+        for package in [('SWM', [720, 1, 80, 25, 40]),
+                        ('RUN', [15000, 1, 75]),
+                        ('WLK', [9000, 1.5, 75, 180])]
+    ]
+    assert messages == expected
+
+
+def test_score_stream_is_lazy():
+    def lines():
+        yield 'RUN,15000,1,75\n'
+        yield 'RUN,15000,1,75\n'
+        raise AssertionError('Прочитано больше, чем один чанк')
+
+    chunks = streaming.score_stream(lines(), chunk_size=2)
+    assert len(next(chunks)) == 2
+
+
+def test_iter_chunks_rejects_bad_size():
+    with pytest.raises(ValueError):
+        list(streaming.iter_chunks([1], 0))
+
+
+def test_run_reads_file(tmp_path):
+    path = tmp_path / 'packets.csv'
+    path.write_text(PACKETS, encoding='utf-8')
+    with Capturing() as output:
+        streaming.run([str(path), '--chunk-size', '1'])
+    assert len(output) == 3
+    assert output[0].startswith('Тип тренировки: Swimming;')
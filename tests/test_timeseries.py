@@ -0,0 +1,81 @@
+import pytest
+
+import caloriescounter
+import timeseries
+
+
+def _expected(workout_type, data):
+    training = caloriescounter.read_package(workout_type, data)
+    return (training.get_distance(), training.get_mean_speed(),
+            training.get_spent_calories())
+
+
+def test_walking_cumulative_and_window():
+    workout = timeseries.LiveWorkout('WLK', window=3, weight=75, height=180)
+    for steps in [2, 3, 1, 4, 2]:
+        metrics = workout.update(1, steps)
+    assert metrics[:3] == _expected('WLK', [12, 5 / 3600, 75, 180])
+    assert metrics[3:] == _expected('WLK', [7, 3 / 3600, 75, 180])
+
+
+def test_swimming_accumulates_pools():
+    workout = timeseries.LiveWorkout('SWM', window=2, weight=80,
+                                     length_pool=25)
+    workout.update(30, 20, 1)
+    workout.update(30, 22, 0)
+    metrics = workout.update(60, 40, 2)
+    assert metrics[:3] == _expected('SWM', [82, 120 / 3600, 80, 25, 3])
+    assert metrics[3:] == _expected('SWM', [62, 90 / 3600, 80, 25, 2])
+
+
+def test_info_matches_single_packet():
+    workout = timeseries.LiveWorkout('RUN', weight=75)
+    for _ in range(100):
+        workout.update(1, 3)
+    info = workout.info()
+    expected = caloriescounter.read_package(
+        'RUN', [300, 100 / 3600, 75]).show_training_info()
+    assert info.get_message() == expected.get_message()
+
+
+def test_window_sums_stay_exact():
+    workout = timeseries.LiveWorkout('RUN', window=4, weight=70)
+    for i in range(1000):
+        metrics = workout.update(0.1, i % 7)
+    steps = sum(i % 7 for i in range(996, 1000))
+    assert metrics.window_distance == _expected(
+        'RUN', [steps, 0.4 / 3600, 70])[0]
+
+
+@pytest.mark.parametrize('args, kwargs, error', [
+    (('RUN',), {'window': 0, 'weight': 70}, ValueError),
+    (('WLK',), {'weight': 70}, TypeError),
+    (('XXX',), {'weight': 70}, caloriescounter.UnknownWorkoutTypeError),
+])
+def test_bad_workouts(args, kwargs, error):
+    with pytest.raises(error):
+        timeseries.LiveWorkout(*args, **kwargs)
+
+
+def test_bad_samples():
+    workout = timeseries.LiveWorkout('SWM', weight=80, length_pool=25)
+    with pytest.raises(ValueError):
+        workout.metrics()
+    with pytest.raises(ValueError):
+        workout.update(0, 10, 1)
+    with pytest.raises(TypeError):
+        workout.update(1, 10)
+
+
+def test_sessions():
+    sessions = timeseries.LiveSessions(window=10)
+    for workout_id in range(1000):
+        sessions.start(workout_id, 'RUN', weight=70)
+    for workout_id in range(1000):
+        sessions.update(workout_id, 1, workout_id % 5)
+    assert len(sessions) == 1000
+    info = sessions.finish(7)
+    assert info.training_type == 'Running'
+    assert 7 not in sessions
+    with pytest.raises(ValueError):
+        sessions.start(8, 'RUN', weight=70)
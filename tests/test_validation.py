@@ -0,0 +1,95 @@
+import io
+import json
+from collections import Counter
+
+import pytest
+
+import caloriescounter
+import streaming
+import validation
+
+BAD_PACKETS = [
+    (('RUN', [15000, 0, 75]), 'duration_range'),
+    (('WLK', [9000, 1, 75, 0]), 'height_range'),
+    (('SWM', [720, 1, 80, 25]), 'arity'),
+    (('XXX', [1, 2, 3]), 'unknown_type'),
+    (('RUN', [15000, '1', 75]), 'not_number'),
+    (('RUN', [15000, float('nan'), 75]), 'duration_range'),
+    (('RUN', [True, 1, 75]), 'not_number'),
+    ((['RUN'], [15000, 1, 75]), 'unknown_type'),
+    ((None, [15000, 1, 75]), 'unknown_type'),
+]
+
+
+@pytest.mark.parametrize('package, reason', BAD_PACKETS)
+def test_check_packet_rejects(package, reason):
+    assert validation.check_packet(*package) == reason
+
+
+@pytest.mark.parametrize('package', [
+    ('RUN', [15000, 1, 75]),
+    ('WLK', [9000, 1.5, 75, 180]),
+    ('SWM', [720, 1, 80, 25, 40]),
+])
+def test_check_packet_accepts(package):
+    assert validation.check_packet(*package) is None
+    caloriescounter.read_package(*package).show_training_info()
+
+
+def test_check_columns(engine):
+    reasons = validation.check_columns(
+        type_code=[1, 1, 2, 0, 9, 0],
+        action=[15000, 15000, 9000, 720, 1, 720],
+        duration=[1, 0, 1, 1, 1, 1],
+        weight=[75, 75, 75, 80, 80, 80],
+        height=[0, 0, 0, 0, 0, 0],
+        length_pool=[0, 0, 0, 25, 0, 0],
+        count_pool=[0, 0, 0, 40, 0, 40])
+    assert [validation.REASONS[code] for code in reasons] == [
+        'ok', 'duration_range', 'height_range', 'ok', 'unknown_type',
+        'length_pool_range']
+    reasons = validation.check_columns([2], [9000], [1], [75])
+    assert validation.REASONS[reasons[0]] == 'arity'
+
+
+def test_validator_routes_rejects():
+    rejects = io.StringIO()
+    validator = validation.Validator(rejects)
+    lines = io.StringIO('RUN,15000,1,75\n'
+                        'RUN,15000,0,75\n'
+                        'RUN,abc,1,75\n'
+                        '{"type": "SWM"}\n'
+                        'XXX,1,2,3\n'
+                        'SWM,720,1,80,25,40\n')
+    chunks = list(streaming.score_stream(lines, chunk_size=2,
+                                         validator=validator))
+    assert [info.training_type for chunk in chunks for info in chunk] == [
+        'Running', 'Swimming']
+    assert validator.counts == Counter(
+        {'duration_range': 1, 'parse': 2, 'unknown_type': 1})
+    records = [json.loads(line) for line in rejects.getvalue().splitlines()]
+    assert {record['reason'] for record in records} == set(validator.counts)
+    assert {'reason': 'parse', 'line': 'RUN,abc,1,75'} in records
+
+
+def test_cli_rejects(tmp_path, capsys):
+    path = tmp_path / 'packets.csv'
+    path.write_text('RUN,15000,1,75\nWLK,9000,1,75,0\n', encoding='utf-8')
+    rejects = tmp_path / 'rejects.ndjson'
+    streaming.run([str(path), '--rejects', str(rejects)])
+    out, err = capsys.readouterr()
+    assert out.count('\n') == 1
+    assert 'height_range' in err
+    assert json.loads(rejects.read_text(encoding='utf-8'))['data'] == [
+        9000, 1, 75, 0]
+
+
+def test_cli_rejects_unhashable_type(tmp_path, capsys):
+    path = tmp_path / 'packets.ndjson'
+    path.write_text('{"type": ["RUN"], "data": [1, 1, 1]}\n'
+                    '{"type": "RUN", "data": [15000, 1, 75]}\n',
+                    encoding='utf-8')
+    streaming.run([str(path), '--validate'])
+    out, err = capsys.readouterr()
+    assert out.startswith('Тип тренировки: Running;')
+    assert 'Отклонено пакетов (unknown_type): 1' in err
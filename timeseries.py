@@ -0,0 +1,154 @@
+"""Расчёт тренировок по потоку отсчётов датчика.
+
+Отсчёт - прирост полей пакета за короткий интервал: шаги или гребки
+(action), для плавания ещё и пройденные бассейны (count_pool). Для
+каждой тренировки поддерживаются накопленные с начала и скользящие по
+последним window отсчётам дистанция, скорость и калории. Считаются они
+теми же формулами (kernel), что и Running/SportsWalking/Swimming, как
+если бы суммы отсчётов пришли одним пакетом. Обновление - O(1): окно
+хранится в кольцевых буферах с текущими суммами.
+"""
+from __future__ import annotations
+
+import inspect
+from array import array
+from typing import Hashable, NamedTuple
+
+from caloriescounter import InfoMessage, Training, get_workout_type
+
+SECONDS_IN_HOUR: int = 3600
+DEFAULT_WINDOW: int = 60
+
+
+class LiveMetrics(NamedTuple):
+    """Метрики тренировки после очередного отсчёта."""
+    distance: float
+    speed: float
+    calories: float
+    window_distance: float
+    window_speed: float
+    window_calories: float
+
+
+def _training_metrics(cls: type[Training], args: list) -> tuple:
+    if cls.kernel is not None:
+        return cls.kernel(*args)
+    training = cls(*args)
+    return (training.get_distance(), training.get_mean_speed(),
+            training.get_spent_calories())
+
+
+class LiveWorkout:
+    """Одна тренировка, собираемая из отсчётов.
+
+    static - неизменные поля пакета (weight, height, length_pool);
+    window - число последних отсчётов в скользящем окне.
+    """
+    __slots__ = ('cls', 'window', '_sample_index', '_args',
+                 '_window_args', '_totals', '_ring', '_window_sums',
+                 '_position', '_filled', '_since_resum')
+
+    def __init__(self,
+                 workout_type: str,
+                 window: int = DEFAULT_WINDOW,
+                 **static: float) -> None:
+        if window < 1:
+            raise ValueError('Окно должно содержать хотя бы один отсчёт.')
+        self.cls = get_workout_type(workout_type).cls
+        self.window = window
+        params = list(inspect.signature(self.cls).parameters)
+        sample_fields = ('duration', *self.cls.SAMPLE_FIELDS)
+        missing = (set(params) - set(sample_fields)) - set(static)
+        if missing:
+            raise TypeError(f'Не заданы поля {", ".join(sorted(missing))}.')
+        self._sample_index = [params.index(name) for name in sample_fields]
+        self._args = [static.get(name, 0) for name in params]
+        self._window_args = list(self._args)
+        # Нулевой элемент каждой колонки - секунды, остальные - поля
+        # SAMPLE_FIELDS.
+        self._totals = [0] * len(sample_fields)
+        self._window_sums = [0] * len(sample_fields)
+        self._ring = [array('d', bytes(8 * window)) for _ in sample_fields]
+        self._position = 0
+        self._filled = 0
+        self._since_resum = 0
+
+    def update(self, seconds: float, *increments: float) -> LiveMetrics:
+        """Добавить отсчёт длительностью seconds с приростами полей."""
+        if seconds <= 0:
+            raise ValueError('Длительность отсчёта должна быть больше 0.')
+        values = (seconds, *increments)
+        if len(values) != len(self._totals):
+            raise TypeError(f'Ожидались приросты полей '
+                            f'{", ".join(self.cls.SAMPLE_FIELDS)}.')
+        position = self._position
+        for column, value in enumerate(values):
+            ring = self._ring[column]
+            self._totals[column] += value
+            self._window_sums[column] += value - ring[position]
+            ring[position] = value
+        self._position = (position + 1) % self.window
+        self._filled = min(self._filled + 1, self.window)
+        self._since_resum += 1
+        if self._since_resum >= self.window:
+            # Пересчёт сумм окна раз в window отсчётов (амортизированно
+            # O(1)) убирает накопление ошибки округления.
+            self._window_sums = [sum(ring) for ring in self._ring]
+            self._since_resum = 0
+        return self.metrics()
+
+    def _calculate(self, args: list, sums: list) -> tuple:
+        duration_index, *field_indexes = self._sample_index
+        args[duration_index] = sums[0] / SECONDS_IN_HOUR
+        for index, value in zip(field_indexes, sums[1:]):
+            args[index] = value
+        return _training_metrics(self.cls, args)
+
+    def metrics(self) -> LiveMetrics:
+        """Накопленные и скользящие метрики."""
+        if not self._filled:
+            raise ValueError('Нет ни одного отсчёта.')
+        return LiveMetrics(*self._calculate(self._args, self._totals),
+                           *self._calculate(self._window_args,
+                                            self._window_sums))
+
+    def info(self) -> InfoMessage:
+        """Итог тренировки в виде InfoMessage."""
+        distance, speed, calories = self._calculate(self._args, self._totals)
+        return InfoMessage(self.cls.__name__,
+                           self._totals[0] / SECONDS_IN_HOUR,
+                           distance, speed, calories)
+
+
+class LiveSessions:
+    """Много одновременных тренировок по их идентификаторам."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW) -> None:
+        self.window = window
+        self._workouts: dict[Hashable, LiveWorkout] = {}
+
+    def __len__(self) -> int:
+        return len(self._workouts)
+
+    def __contains__(self, workout_id: Hashable) -> bool:
+        return workout_id in self._workouts
+
+    def start(self,
+              workout_id: Hashable,
+              workout_type: str,
+              **static: float) -> LiveWorkout:
+        if workout_id in self._workouts:
+            raise ValueError(f'Тренировка {workout_id} уже идёт.')
+        workout = self._workouts[workout_id] = LiveWorkout(
+            workout_type, self.window, **static)
+        return workout
+
+    def update(self,
+               workout_id: Hashable,
+               seconds: float,
+               *increments: float) -> LiveMetrics:
+        return self._workouts[workout_id].update(seconds, *increments)
+
+    def finish(self, workout_id: Hashable) -> InfoMessage:
+        """Завершить тренировку и вернуть её итог."""
+        return self._workouts.pop(workout_id).info()
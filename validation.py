@@ -0,0 +1,212 @@
+"""Проверка пакетов перед расчётом.
+
+Плохой пакет (нулевая длительность, нулевой рост, лишнее значение у
+плавания, неизвестный вид) роняет расчёт исключением. Проверка
+отсеивает такие пакеты заранее: допустимые идут в расчёт, остальные -
+в поток отказов с кодом причины, а по каждой причине ведётся счётчик.
+
+Коды причин - REASONS: parse (строку не удалось разобрать),
+unknown_type, arity (число значений не совпадает с конструктором),
+not_number и <поле>_range (значение вне физически допустимого
+диапазона RANGES). Поля, которых нет в RANGES, проверяются только на
+то, что это число.
+
+check_packet проверяет пакеты по одному: в потоке строк пакет
+приходит строкой, и число значений и их типы можно проверить только
+у каждого пакета отдельно. check_columns проверяет целые колонки
+сразу, с NumPy масками по виду тренировки, - для данных, которые уже
+лежат колонками (PacketFile.check).
+"""
+from __future__ import annotations
+
+import inspect
+import json
+import math
+from array import array
+from collections import Counter
+from typing import Iterable, Iterator, Sequence, TextIO, Type
+
+from caloriescounter import (_DISPATCH, Training, UnknownWorkoutTypeError,
+                             _numpy, get_workout_type,
+                             get_workout_type_by_id)
+from streaming import parse_line
+
+# Допустимые значения полей пакета, включая границы.
+RANGES: dict[str, tuple[float, float]] = {
+    'action': (0, 10 ** 7),
+    'duration': (1 / 3600, 48),
+    'weight': (1, 500),
+    'height': (50, 300),
+    'length_pool': (1, 1000),
+    'count_pool': (0, 10 ** 5),
+}
+
+OK: str = 'ok'
+PARSE: str = 'parse'
+UNKNOWN_TYPE: str = 'unknown_type'
+ARITY: str = 'arity'
+NOT_A_NUMBER: str = 'not_number'
+REASONS: tuple[str, ...] = (OK, PARSE, UNKNOWN_TYPE, ARITY, NOT_A_NUMBER,
+                            *(f'{name}_range' for name in RANGES))
+REASON_CODES: dict[str, int] = {reason: code
+                                for code, reason in enumerate(REASONS)}
+
+# Проверки полей: (имя, нижняя граница, верхняя, причина отказа).
+Field = tuple[str, float, float, str]
+
+_FIELDS: dict[Type[Training], tuple[Field, ...]] = {}
+
+
+def _fields(cls: Type[Training]) -> tuple[Field, ...]:
+    """Проверки значений пакета для класса тренировки."""
+    fields = _FIELDS.get(cls)
+    if fields is None:
+        fields = _FIELDS[cls] = tuple(
+            (name, *RANGES.get(name, (-math.inf, math.inf)),
+             f'{name}_range' if name in RANGES else NOT_A_NUMBER)
+            for name in inspect.signature(cls).parameters)
+    return fields
+
+
+def _class_of(workout_type: str) -> Type[Training] | None:
+    cls = _DISPATCH.get(workout_type)
+    if cls is None:
+        try:
+            cls = get_workout_type(workout_type).cls
+        except UnknownWorkoutTypeError:
+            return None
+    return cls
+
+
+def check_packet(workout_type: str, data: Sequence) -> str | None:
+    """Причина отказа для пакета или None, если пакет допустим."""
+    if type(workout_type) is not str:
+        return UNKNOWN_TYPE
+    fields = _FIELDS.get(_DISPATCH.get(workout_type))
+    if fields is None:
+        cls = _class_of(workout_type)
+        if cls is None:
+            return UNKNOWN_TYPE
+        fields = _fields(cls)
+    if len(data) != len(fields):
+        return ARITY
+    for value, (_, low, high, reason) in zip(data, fields):
+        if type(value) is not int and type(value) is not float:
+            return NOT_A_NUMBER
+        if not low <= value <= high:
+            return reason
+    return None
+
+
+def _check_columns_numpy(type_code, columns: dict):
+    np = _numpy()
+    codes = np.asarray(type_code)
+    reasons = np.zeros(len(codes), dtype=np.uint8)
+    for type_id in np.unique(codes):
+        rows = codes == type_id
+        try:
+            cls = get_workout_type_by_id(type_id.item()).cls
+        except UnknownWorkoutTypeError:
+            reasons[rows] = REASON_CODES[UNKNOWN_TYPE]
+            continue
+        for name, low, high, reason in _fields(cls):
+            column = columns.get(name)
+            if column is None:
+                reasons[rows] = REASON_CODES[ARITY]
+                break
+            values = np.asarray(column, dtype=np.float64)
+            bad = rows & (reasons == 0) & ~((values >= low)
+                                            & (values <= high))
+            reasons[bad] = REASON_CODES[reason]
+    return reasons
+
+
+def _check_columns_python(type_code, columns: dict) -> array:
+    reasons = array('B', bytes(len(type_code)))
+    checks: dict[int, list | None] = {}
+    for i, type_id in enumerate(type_code):
+        if type_id not in checks:
+            try:
+                cls = get_workout_type_by_id(type_id).cls
+            except UnknownWorkoutTypeError:
+                checks[type_id] = None
+            else:
+                checks[type_id] = [(columns.get(name), low, high, reason)
+                                   for name, low, high, reason
+                                   in _fields(cls)]
+        fields = checks[type_id]
+        if fields is None:
+            reasons[i] = REASON_CODES[UNKNOWN_TYPE]
+            continue
+        for column, low, high, reason in fields:
+            if column is None:
+                reasons[i] = REASON_CODES[ARITY]
+                break
+            if not low <= column[i] <= high:
+                reasons[i] = REASON_CODES[reason]
+                break
+    return reasons
+
+
+def check_columns(type_code: Sequence[int],
+                  action: Sequence[float],
+                  duration: Sequence[float],
+                  weight: Sequence[float],
+                  height: Sequence[float] | None = None,
+                  length_pool: Sequence[float] | None = None,
+                  count_pool: Sequence[float] | None = None
+                  ) -> Sequence[int]:
+    """Коды причин (индексы в REASONS) для колонок пакетов.
+
+    Колонки - как у calculate_batch; 0 означает допустимую строку.
+    Отсутствующая колонка, нужная виду тренировки, даёт arity.
+    """
+    columns = {'action': action, 'duration': duration, 'weight': weight,
+               'height': height, 'length_pool': length_pool,
+               'count_pool': count_pool}
+    if _numpy() is not None:
+        return _check_columns_numpy(type_code, columns)
+    return _check_columns_python(type_code, columns)
+
+
+class Validator:
+    """Стадия проверки потока пакетов.
+
+    Отказы считаются в counts по причинам и, если задан rejects,
+    пишутся в него строками NDJSON с полем reason. Пакеты проверяются
+    check_packet по одному.
+    """
+
+    def __init__(self, rejects: TextIO | None = None) -> None:
+        self.rejects = rejects
+        self.counts: Counter = Counter()
+
+    def reject(self, reason: str, record: dict) -> None:
+        self.counts[reason] += 1
+        if self.rejects is not None:
+            self.rejects.write(json.dumps({'reason': reason, **record},
+                                          ensure_ascii=False) + '\n')
+
+    def parse(self, stream: Iterable[str]) -> Iterator[tuple[str, list]]:
+        """Разобрать строки; неразборчивые уходят в отказы."""
+        for line in stream:
+            try:
+                package = parse_line(line)
+            except (ValueError, KeyError, TypeError):
+                self.reject(PARSE, {'line': line.rstrip('\n')})
+                continue
+            if package is not None:
+                yield package
+
+    def filter(self,
+               packets: Iterable[tuple[str, list]]
+               ) -> list[tuple[str, list]]:
+        """Допустимые пакеты; остальные уходят в отказы."""
+        valid = []
+        for workout_type, data in packets:
+            reason = check_packet(workout_type, data)
+            if reason is None:
+                valid.append((workout_type, data))
+            else:
+                self.reject(reason, {'type': workout_type, 'data': data})
+        return valid